@@ -0,0 +1,119 @@
+"""
+AFTN (ICAO) 报文编组项切分。
+报文按编组项分隔符 '-' 切开，再按报文类型的编组项顺序对位，得到结构化记录：
+    {'type': 'FPL',
+     'fields': {'7': 'CSC2353', '8': 'IS', '9': 'B789/M', '10': ..., '13': 'ZLXY1110', '15': ..., '16': ..., '18': ...},
+     'item18': {'PBN': 'A1B2', 'REG': 'B9420', 'DOF': '250826', 'EET': 'ZSHA0120'},
+     'amendments': [('15', 'N0460F1010 DCT'), ...]}   # 仅 CHG：按出现顺序的 "编组项号/新内容"
+替代对 CHG/DLA/CPL 报文反复执行的多个正则 (变更编组项、REG、STS、DLA 的 EOBT、CPL 的起降机场与机型等)。
+内容中也可能出现 '-' (航路、编组项 18 的 RMK/OPR 等)，只有开始新编组项的 '-' 才作为分隔符，见 _tokenize。
+
+同一份报文常经多个地址重复转发，tokenize_aftn 带 LRU 缓存 (AFTN_TOKEN_CACHE_SIZE 为 0 时不缓存)，
+缓存返回的是同一个字典对象，调用方不应修改。
+"""
+import re
+from functools import lru_cache
+
+AFTN_TOKEN_CACHE_SIZE = 65536
+
+# 各报文类型中编组项 3 (报文类型) 之后的编组项顺序
+AFTN_FIELD_LAYOUTS = {
+    'FPL': ('7', '8', '9', '10', '13', '15', '16', '18', '19'),
+    'CPL': ('7', '8', '9', '10', '13', '14', '15', '16', '18'),
+    'CHG': ('7', '13', '16', '18'),
+    'DLA': ('7', '13', '16', '18'),
+    'CNL': ('7', '13', '16', '18'),
+    'DEP': ('7', '13', '16', '18'),
+    'ARR': ('7', '13', '17'),
+}
+AFTN_DEFAULT_LAYOUT = ('7',)
+# 编组项 18 的标识符，值延续到下一个标识符之前
+AFTN_ITEM18_KEYS = ['STS', 'PBN', 'NAV', 'COM', 'DAT', 'SUR', 'DEP', 'DEST', 'DOF', 'REG', 'EET', 'SEL', 'TYP',
+                    'CODE', 'DLE', 'OPR', 'ORGN', 'PER', 'ALTN', 'RALT', 'TALT', 'RIF', 'RMK']
+AFTN_ITEM18_KEY_SET = frozenset(AFTN_ITEM18_KEYS)
+AMENDMENT_PATTERN = re.compile(r'(\d{1,2})\s*/\s*(.*)', re.DOTALL)
+# 开始新编组项的 '-'：CHG 的变更内容 "-编组项号/"，编组项 18 的 "-标识符/"，FPL 编组项 19 的 "-E/" 等
+AMENDMENT_START_PATTERN = re.compile(r'-(?=\s*\d{1,2}\s*/)')
+ITEM18_START_PATTERN = re.compile(r'-(?=\s*(?:%s)/)' % '|'.join(AFTN_ITEM18_KEYS))
+ITEM19_START_PATTERN = re.compile(r'-(?=\s*[EPRSJDANC]/)')
+# CPL 的编组项 14 可省略：对位到 14 的内容若形如巡航速度/高度 (编组项 15 的开头)，则视为缺省
+CRUISE_SPEED_PATTERN = re.compile(r'[NKM]\d{3,4}(?:[FASM]\d{3,4}|VFR)')
+CPL_LAYOUT_WITHOUT_14 = tuple(item for item in AFTN_FIELD_LAYOUTS['CPL'] if item != '14')
+CPL_ITEM14_POSITION = AFTN_FIELD_LAYOUTS['CPL'].index('14')
+
+
+def parse_item18(content):
+    """
+    把编组项 18 拆为 {标识符: 内容}：按空白分词，以 "标识符/" 开头的词开始一个新条目，其余词接在当前条目后
+    (多个空白、换行规整为一个空格)。同一标识符出现多次时取第一次。
+    """
+    entries = []
+    for word in content.split():
+        key, slash, value = word.partition('/')
+        if slash and key in AFTN_ITEM18_KEY_SET:
+            entries.append((key, [value] if value else []))
+        elif entries:
+            entries[-1][1].append(word)
+    item18 = {}
+    for key, words in entries:
+        if key not in item18: item18[key] = ' '.join(words)
+    return item18
+
+
+def _split_items(text, layout):
+    """
+    报文类型之后的部分按 layout 对位，返回 (报文类型, {编组项号: 内容})。
+    编组项 18 (及 FPL 的 19) 按标识符定位，其内容中的 '-' 不切开；之前的部分按 '-' 切开，
+    段数多于编组项数时多出的 '-' 属于编组项 15 (航路)，拼回编组项 15。
+    """
+    tail = {}
+    start18 = ITEM18_START_PATTERN.search(text) if '18' in layout else None
+    if start18:
+        text, rest = text[:start18.start()], text[start18.end():]
+        tail = dict(zip(('18', '19'), ITEM19_START_PATTERN.split(rest, 1) if '19' in layout else [rest]))
+        layout = layout[:layout.index('18')]
+    tokens = text.split('-')
+    msg_type, values = tokens[0].strip()[:3], tokens[1:]
+    if msg_type == 'CPL' and len(values) > CPL_ITEM14_POSITION \
+            and CRUISE_SPEED_PATTERN.match(values[CPL_ITEM14_POSITION].lstrip()):
+        layout = tuple(item for item in layout if item != '14')
+    if '15' in layout and len(values) > len(layout):
+        route, after = layout.index('15'), len(layout) - layout.index('15') - 1
+        values = values[:route] + ['-'.join(values[route:len(values) - after])] + values[len(values) - after:]
+    fields = {item: value.strip() for item, value in zip(layout, values)}
+    fields.update((item, value.strip()) for item, value in tail.items())
+    return msg_type, fields
+
+
+def _tokenize(body):
+    """
+    去掉首尾括号后切分各编组项，再按报文类型对位。
+    CHG 的变更内容从 "-编组项号/" 处切开 (与原正则的先行断言一致)，按出现顺序记入 amendments，
+    内容中其余的 '-' 保留；第一处变更内容之前为报文的原编组项。
+    """
+    text = body.strip()
+    if text[:1] == '(': text = text[1:]
+    end = text.rfind(')')
+    if end >= 0: text = text[:end]
+    msg_type = text.split('-', 1)[0].strip()[:3]
+    amendments = []
+    if msg_type == 'CHG':
+        parts = AMENDMENT_START_PATTERN.split(text)
+        text = parts[0]
+        amendments = [AMENDMENT_PATTERN.match(part.strip()).groups() for part in parts[1:]]
+    msg_type, fields = _split_items(text, AFTN_FIELD_LAYOUTS.get(msg_type, AFTN_DEFAULT_LAYOUT))
+    return {'type': msg_type, 'fields': fields, 'item18': parse_item18(fields['18']) if '18' in fields else {},
+            'amendments': amendments}
+
+
+_tokenize_cached = lru_cache(maxsize=AFTN_TOKEN_CACHE_SIZE)(_tokenize) if AFTN_TOKEN_CACHE_SIZE else _tokenize
+
+
+def tokenize_aftn(body, use_cache=True):
+    """切分一份报文为结构化记录 (见模块说明)。非字符串输入按空报文处理。"""
+    if not isinstance(body, str): body = ''
+    return _tokenize_cached(body) if use_cache else _tokenize(body)
+
+
+def clear_token_cache():
+    if hasattr(_tokenize_cached, 'cache_clear'): _tokenize_cached.cache_clear()
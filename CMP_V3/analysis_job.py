@@ -0,0 +1,268 @@
+"""
+CMP_V3 对比主流程及其后台任务。
+run_analysis_and_generate_report 可在任意进程中直接调用；GUI (main_app.py) 通过 AnalysisJob 把它放到独立子进程中运行，
+解析、对比等 CPU 密集阶段不与 Tk 事件循环争用同一个解释器 (GIL)，界面保持响应。
+
+子进程经队列回传三类事件:
+    ('log', 日志文本)
+    ('progress', 百分比, 阶段名)          # 每个阶段开始/结束时，按 STAGE_WEIGHTS 估算的总体进度
+    ('done', 状态, 结果)                  # 状态: 成功 (结果为报告路径) / 未完成 / 失败 (结果为 (标题, 提示)) / 已取消
+GUI 定时调用 poll() 一次取走当前积压的全部事件，日志合并后一次写入日志窗格。
+取消时子进程在下一个阶段开始前退出；超过 CANCEL_GRACE_SECONDS 仍未退出 (正处于某个长阶段中) 则直接终止子进程。
+"""
+import os
+import queue
+import time
+import traceback
+from datetime import datetime
+from multiprocessing import get_context
+
+from core import (FPLA_COLUMN_MAP, read_aftn_for_analysis, process_fpla_for_analysis, process_fodc_for_analysis,
+                  run_comparison_reports, write_report_workbook, aftn_duplicates_dropped)
+from excel_cache import read_excel_cached
+from stage_profiler import StageProfiler, RUN_LOG_NAME
+
+# 各阶段在总体进度中的权重 (按典型运行的耗时占比估计)，未列出的阶段权重为 0
+STAGE_WEIGHTS = {'读取AFTN': 25, '读取FPLA': 10, '预处理FPLA': 5, '读取FODC': 10, '预处理FODC': 5,
+                 '计划对比': 10, '动态对比': 20, '准确率统计': 3, '写出Excel': 12}
+CANCEL_GRACE_SECONDS = 5
+# spawn 在各平台行为一致，子进程不继承 GUI 进程中的 Tk 状态
+JOB_START_METHOD = 'spawn'
+
+
+class JobCancelled(BaseException):
+    """任务被取消。继承 BaseException，不会被流水线各步骤的 except Exception 当作普通错误吞掉。"""
+    run_status = '已取消'
+
+
+class ReportWriteError(Exception):
+    """写出 Excel 报告失败 (多为文件被其他程序占用)，消息为给用户的提示。"""
+
+
+# ==============================================================================
+# --- 1. 主流程 ---
+# ==============================================================================
+def run_analysis_and_generate_report(aftn_path, fpla_path, fodc_path, output_path, airport_icao, target_date_str,
+                                     log_callback, refresh_cache=False, stage_callback=None):
+    """
+    主执行函数，协调数据预处理和对比分析的全过程，返回生成的报告路径；输入无效或预处理失败时返回 None。
+    FPLA/FODC 的 Excel 经 excel_cache 读取，refresh_cache=True 时忽略缓存重新解析。
+    各阶段的耗时、CPU时间、行数与峰值内存实时输出到日志，并追加到输出目录下的运行日志 (cmp_run_log.jsonl)。
+    stage_callback 见 StageProfiler；写报告失败时抛出 ReportWriteError。
+    """
+    try:
+        target_date_obj = datetime.strptime(target_date_str, "%Y-%m-%d").date()
+    except (ValueError, TypeError):
+        log_callback(f"错误: 日期格式无效 ({target_date_str})。请使用 YYYY-MM-DD。")
+        return None
+
+    log_callback(f"===== 开始为日期 {target_date_str} (机场: {airport_icao}) 生成对比报告 =====")
+    run_log_path = os.path.join(output_path, RUN_LOG_NAME)
+    try:
+        with StageProfiler(log_callback, run_log_path, stage_callback=stage_callback, airport=airport_icao,
+                           target_date=target_date_str) as profiler:
+            output_file = _run_pipeline(aftn_path, fpla_path, fodc_path, output_path, airport_icao, target_date_str,
+                                        target_date_obj, log_callback, refresh_cache, profiler)
+            # 预处理失败时 _run_pipeline 记录错误后返回 None，运行日志中记为 未完成 (与 'done' 事件的状态一致)
+            if output_file is None: profiler.status = '未完成'
+            return output_file
+    finally:
+        log_callback(f"各阶段耗时已追加到运行日志: {run_log_path}")
+
+
+def _run_pipeline(aftn_path, fpla_path, fodc_path, output_path, airport_icao, target_date_str, target_date_obj,
+                  log_callback, refresh_cache, profiler):
+    """预处理 -> 对比 -> 写报告，每个阶段经 profiler 记录耗时、行数与峰值内存。"""
+    # --- 步骤 1: 数据预处理 ---
+    log_callback("\n--- [阶段 1/3] 开始数据预处理 ---")
+
+    try:
+        log_callback(f"--- 正在读取原始AFTN文件: {os.path.basename(aftn_path)} ---")
+        with profiler.stage('读取AFTN') as stage:
+            aftn_df = read_aftn_for_analysis(aftn_path, target_date_obj)
+            stage['rows_out'] = len(aftn_df)
+            stage['duplicates_dropped'] = aftn_duplicates_dropped(aftn_df)
+        if aftn_df.empty:
+            log_callback(f"警告: 在AFTN文件中未找到日期为 {target_date_str} 的有效AFTN数据。")
+        else:
+            log_callback(f"√ AFTN数据预处理完成，共 {len(aftn_df)} 条有效记录 "
+                         f"(已剔除重复转发 {aftn_duplicates_dropped(aftn_df)} 条)。")
+    except Exception as e:
+        log_callback(f"错误: 处理AFTN文件时发生错误: {e}")
+        return None
+
+    try:
+        log_callback(f"--- 正在读取原始FPLA文件: {os.path.basename(fpla_path)} ---")
+        with profiler.stage('读取FPLA') as stage:
+            fpla_raw_df = read_excel_cached(fpla_path, refresh=refresh_cache, log_callback=log_callback)
+            stage['rows_out'] = len(fpla_raw_df)
+        fpla_raw_df.rename(columns=lambda c: FPLA_COLUMN_MAP.get(c, c), inplace=True)
+        fpla_filtered_df = fpla_raw_df[fpla_raw_df['PSCHEDULESTATUS'] != 'CNL'].copy()
+        log_callback(f"FPLA数据过滤: 原始记录数 {len(fpla_raw_df)}, 过滤'CNL'状态后剩余 {len(fpla_filtered_df)} 条。")
+        with profiler.stage('预处理FPLA', len(fpla_filtered_df)) as stage:
+            fpla_plan_df, fpla_dynamic_df = process_fpla_for_analysis(fpla_filtered_df, target_date_obj)
+            stage['rows_out'] = len(fpla_plan_df) + len(fpla_dynamic_df)
+        if fpla_plan_df.empty:
+            log_callback(f"警告: 在FPLA文件中未找到指定日期的FPLA数据。")
+        else:
+            log_callback(f"√ FPLA数据预处理完成，共 {len(fpla_plan_df)} 条有效记录。")
+    except Exception as e:
+        log_callback(f"错误: 处理FPLA文件时发生错误: {e}")
+        return None
+
+    try:
+        log_callback(f"--- 正在读取原始FODC文件: {os.path.basename(fodc_path)} ---")
+        with profiler.stage('读取FODC') as stage:
+            fodc_raw_df = read_excel_cached(fodc_path, refresh=refresh_cache, log_callback=log_callback,
+                                            engine='openpyxl')
+            stage['rows_out'] = len(fodc_raw_df)
+        with profiler.stage('预处理FODC', len(fodc_raw_df)) as stage:
+            fodc_plan_df, fodc_dynamic_df = process_fodc_for_analysis(fodc_raw_df, target_date_obj)
+            stage['rows_out'] = len(fodc_plan_df) + len(fodc_dynamic_df)
+        if fodc_plan_df.empty and fodc_dynamic_df.empty:
+            log_callback("警告: 未找到指定日期的FODC数据。")
+        else:
+            log_callback(f"√ FODC数据预处理完成，计划 {len(fodc_plan_df)} 条，动态 {len(fodc_dynamic_df)} 条。")
+    except Exception as e:
+        log_callback(f"错误: 处理FODC文件时发生错误: {e}")
+        return None
+
+    # --- 步骤 2: 执行对比分析 ---
+    log_callback("\n--- [阶段 2/3] 开始执行对比分析 ---")
+    reports = run_comparison_reports(aftn_df, fpla_plan_df, fpla_dynamic_df, fodc_plan_df, fodc_dynamic_df,
+                                     target_date_obj, profiler=profiler)
+    log_callback("√ 对比分析和准确率统计完成。")
+
+    # --- 步骤 3: 生成最终报告 ---
+    log_callback("\n--- [阶段 3/3] 开始生成Excel报告 ---")
+    output_filename = os.path.join(output_path, f"{airport_icao}对比结果_{target_date_str}.xlsx")
+    try:
+        with profiler.stage('写出Excel', sum(len(df) for df in reports.values())) as stage:
+            write_report_workbook(output_filename, reports, log_callback)
+            stage['rows_out'] = stage['rows_in']
+            stage['output_mb'] = round(os.path.getsize(output_filename) / (1024 * 1024), 2)
+    except Exception as e:
+        log_callback(f"\n错误：生成Excel报告时发生错误: {e}")
+        raise ReportWriteError(f"生成Excel报告时发生错误:\n{e}\n\n请检查文件是否被其他程序占用。") from e
+
+    log_callback(f"\n===== 任务成功完成！ =====")
+    log_callback(f"对比分析报告已生成: {output_filename}")
+    return output_filename
+
+
+# ==============================================================================
+# --- 2. 后台任务 (子进程) ---
+# ==============================================================================
+class _StageProgress:
+    """子进程中的 stage_callback：上报进度，并在每个阶段开始前检查取消标志。"""
+
+    def __init__(self, events, cancel_event):
+        self.events = events
+        self.cancel_event = cancel_event
+        self.total = sum(STAGE_WEIGHTS.values())
+        self.done = 0
+
+    def __call__(self, event, name):
+        if event == 'start' and self.cancel_event.is_set(): raise JobCancelled()
+        if event == 'end': self.done += STAGE_WEIGHTS.get(name, 0)
+        self.events.put(('progress', min(100, round(self.done * 100 / self.total)), name))
+
+
+def _job_worker(params, events, cancel_event):
+    """子进程入口：运行主流程，结束时总是发出一条 'done' 事件。"""
+    def log(message):
+        events.put(('log', message))
+
+    try:
+        output_file = run_analysis_and_generate_report(log_callback=log,
+                                                       stage_callback=_StageProgress(events, cancel_event), **params)
+        events.put(('done', '成功', output_file) if output_file else ('done', '未完成', None))
+    except JobCancelled:
+        log("\n===== 任务已取消 =====")
+        events.put(('done', '已取消', None))
+    except ReportWriteError as e:
+        events.put(('done', '失败', ('报告生成错误', str(e))))
+    except Exception:
+        log(f"\n发生严重错误:\n{traceback.format_exc()}")
+        events.put(('done', '失败', ('严重错误', "程序运行中发生未知错误，请查看日志详情。")))
+
+
+class AnalysisJob:
+    """
+    在子进程中运行一次对比。params 为 run_analysis_and_generate_report 除回调外的参数。
+    用法 (GUI 中由 after() 定时调用 poll):
+        job = AnalysisJob(aftn_path=..., fpla_path=..., ...).start()
+        for event in job.poll(): ...
+        job.cancel()
+    status 在收到 'done' 事件后为最终状态，此前为 None。
+    """
+
+    def __init__(self, **params):
+        context = get_context(JOB_START_METHOD)
+        self.params = params
+        self.events = context.Queue()
+        self.cancel_event = context.Event()
+        self.process = context.Process(target=_job_worker, args=(params, self.events, self.cancel_event),
+                                       daemon=True)
+        self.status = None
+        self.result = None
+        self._cancel_deadline = None
+
+    def start(self):
+        self.process.start()
+        return self
+
+    @property
+    def finished(self):
+        return self.status is not None
+
+    @property
+    def cancelling(self):
+        return self._cancel_deadline is not None and not self.finished
+
+    def cancel(self):
+        """请求取消：子进程在下一个阶段开始前退出，超时未退出时由 poll() 终止。"""
+        if self.finished or self._cancel_deadline is not None: return
+        self.cancel_event.set()
+        self._cancel_deadline = time.monotonic() + CANCEL_GRACE_SECONDS
+
+    def poll(self):
+        """非阻塞地取走当前积压的全部事件；子进程异常退出或取消超时时补发 'done' 事件。"""
+        events = self._drain()
+        if self.finished: return events
+        if not self.process.is_alive():
+            # 子进程退出前会把队列中的数据写完，这里再等一小会儿以免漏掉最后的事件
+            events += self._drain(timeout=0.5)
+            if not self.finished:
+                events.append(self._finish('失败', ('严重错误', f"后台进程异常退出 (退出码 {self.process.exitcode})，"
+                                                               f"请查看日志详情。")))
+        elif self._cancel_deadline is not None and time.monotonic() > self._cancel_deadline:
+            self.process.terminate()
+            self.process.join()
+            events += [('log', f"\n后台进程在 {CANCEL_GRACE_SECONDS}s 内未响应取消，已强制终止。"),
+                       self._finish('已取消', None)]
+        return events
+
+    def terminate(self):
+        """立即结束子进程 (如关闭窗口时)。"""
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        if not self.finished: self._finish('已取消', None)
+
+    def _drain(self, timeout=None):
+        events = []
+        while not self.finished:
+            try:
+                event = self.events.get(timeout=timeout) if timeout else self.events.get_nowait()
+            except queue.Empty:
+                break
+            events.append(event)
+            if event[0] == 'done':
+                self.status, self.result = event[1], event[2]
+                self.process.join()
+        return events
+
+    def _finish(self, status, result):
+        self.status, self.result = status, result
+        return 'done', status, result
@@ -0,0 +1,199 @@
+"""
+CMP_V3 基准测试用的合成数据生成器。
+按航班生成一套自洽的 AFTN 报文 (FPL/CHG/DLA/CPL/DEP/ARR，含 DOF 与 REG)、FPLA 修订记录和 FODC 记录：
+部分航班在 CHG/DLA 中变更时刻、机号、目的地，FPLA 的后续修订与 FODC 以一定比例跟进这些变更，
+使对比结果中同时出现一致/不一致/无数据等各种情况。全部用 numpy/pandas 整列生成，百万行规模约十几秒。
+
+单独运行时输出与真实导出文件同名、同格式的原始文件，可直接交给 generate_analysis_files.py / 批量对比使用:
+    cd CMP_V3
+    python -m benchmarks.generate_data --rows 10000 --date 2025-08-26 --airport ZLXY --output-dir raw_data_synth
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+AIRLINES = np.array(['CES', 'CCA', 'CSN', 'CHH', 'CXA', 'CSC', 'CDG', 'CQH'])
+AIRPORTS = np.array(['ZLXY', 'ZSSS', 'ZSPD', 'ZBAA', 'ZGGG', 'ZUUU', 'ZSHC', 'ZGSZ', 'ZPPP', 'ZWWW'])
+CRAFT_TYPES = np.array(['A320', 'B738', 'A321', 'A333', 'B789', 'A319'])
+MESSAGE_TYPES = np.array(['FPL', 'CHG', 'DLA', 'CPL', 'DEP', 'ARR'])
+MESSAGE_WEIGHTS = [0.3, 0.25, 0.15, 0.1, 0.12, 0.08]
+AFTN_ROWS_PER_FLIGHT = 5  # 平均每个航班的AFTN报文数
+MAX_FPLA_ROWS = 1000000  # Excel 单个Sheet的行数上限约为104万
+
+
+def _hhmm(minutes):
+    minutes = pd.Series(minutes) % 1440
+    return (minutes // 60).astype(str).str.zfill(2) + (minutes % 60).astype(str).str.zfill(2)
+
+
+def _format_times(times, fmt):
+    """strftime 只对去重后的时间做一次 (时间取值远少于行数)，再按编码展开。"""
+    codes, uniques = pd.factorize(times)
+    return pd.Series(np.asarray(uniques.strftime(fmt), dtype=object)[codes])
+
+
+def _bjt_strings(target_date, utc_minutes, fmt):
+    """UTC 分钟偏移 (相对目标日0点) -> 北京时间字符串。"""
+    return _format_times(pd.Timestamp(target_date) + pd.to_timedelta(np.asarray(utc_minutes) + 8 * 60, unit='min'),
+                         fmt)
+
+
+def _pick(rng, values, size):
+    return values[rng.integers(0, len(values), size)]
+
+
+def generate_flights(n_flights, target_date, airport='ZLXY', seed=0):
+    """
+    航班基础表：计划值 (EOBT/机号/目的地) 与变更后的值。约30%的航班会发生时刻变更，
+    10%变更机号，5%变更目的地。EOBT 为相对目标日0点的 UTC 分钟数。
+    """
+    rng = np.random.default_rng(seed)
+    at_airport = rng.random(n_flights) < 0.5
+    others = AIRPORTS[AIRPORTS != airport]
+    dep = np.where(at_airport, airport, _pick(rng, others, n_flights))
+    arr = np.where(at_airport, _pick(rng, others, n_flights), airport)
+    eobt = rng.integers(-8 * 60, 16 * 60, n_flights)
+    reg = pd.Series(rng.integers(1000, 9999, n_flights)).astype(str).radd('B').to_numpy()
+    flights = pd.DataFrame({
+        'CallSign': pd.Series(_pick(rng, AIRLINES, n_flights)) + pd.Series(rng.integers(1, 9999, n_flights)).astype(str),
+        'Dep': dep, 'Arr': arr, 'Reg': reg, 'Craft': _pick(rng, CRAFT_TYPES, n_flights), 'EOBT': eobt,
+    })
+    delayed = rng.random(n_flights) < 0.3
+    flights['NewEOBT'] = np.where(delayed, eobt + rng.integers(1, 24, n_flights) * 15, eobt)
+    swapped = rng.random(n_flights) < 0.1
+    new_reg = pd.Series(rng.integers(1000, 9999, n_flights)).astype(str).radd('B')
+    flights['NewReg'] = np.where(swapped, new_reg, reg)
+    diverted = rng.random(n_flights) < 0.05
+    flights['NewArr'] = np.where(diverted, _pick(rng, AIRPORTS, n_flights), arr)
+    flights['DOF'] = pd.Timestamp(target_date).strftime('%y%m%d')
+    return flights
+
+
+def generate_aftn(flights, n_rows, target_date, seed=1):
+    """AFTN导出表，列与数据库导出的CSV一致：ID, JSON_DATA, ADDR, TELE_BODY, RECEIVE_TIME。"""
+    rng = np.random.default_rng(seed)
+    f = flights.iloc[rng.integers(0, len(flights), n_rows)].reset_index(drop=True)
+    msg_type = pd.Series(rng.choice(MESSAGE_TYPES, n_rows, p=MESSAGE_WEIGHTS))
+    body = pd.Series('', index=f.index, dtype=object)
+
+    def fill(message_type, build):
+        """只对该类报文的行拼接正文。"""
+        rows = f[msg_type == message_type]
+        eobt, new_eobt = _hhmm(rows['EOBT']).values, _hhmm(rows['NewEOBT']).values
+        body[rows.index] = build(rows, '(' + message_type + '-' + rows['CallSign'], eobt, new_eobt).values
+
+    fill('FPL', lambda r, head, eobt, new_eobt: (
+        head + '-IS\n-' + r['Craft'] + '/M-SDE2E3FGHIJ1RWY/LB1\n-' + r['Dep'] + eobt + '\n-N0450F0980 DCT\n-' +
+        r['Arr'] + '0150 ZSPD\n-PBN/A1B2 REG/' + r['Reg'] + ' DOF/' + r['DOF'] + ' EET/ZSHA0120)'))
+    fill('DLA', lambda r, head, eobt, new_eobt: (
+        head + '-' + r['Dep'] + new_eobt + '-' + r['Arr'] + '-DOF/' + r['DOF'] + ')'))
+    fill('CPL', lambda r, head, eobt, new_eobt: (
+        head + '-IS\n-' + r['Craft'] + '/M-SDE2E3/LB1\n-' + r['Dep'] + new_eobt + '\n-N0450F0980 DCT\n-' +
+        r['NewArr'] + '\n-REG/' + r['NewReg'] + ' DOF/' + r['DOF'] + ')'))
+    for message_type in ['DEP', 'ARR']:
+        fill(message_type, lambda r, head, eobt, new_eobt: (
+            head + '-' + r['Dep'] + eobt + '-' + r['Arr'] + '-DOF/' + r['DOF'] + ')'))
+
+    def chg_body(r, head, eobt, new_eobt):
+        """CHG：按航班实际发生的变更组合编组项13/18/16，没有变更的航班改航路 (编组项15)。"""
+        items = pd.Series('', index=r.index)
+        items = items.where(r['NewEOBT'] == r['EOBT'], items + '-13/' + r['Dep'] + new_eobt)
+        items = items.where(r['NewReg'] == r['Reg'], items + '-18/REG/' + r['NewReg'] + ' DOF/' + r['DOF'])
+        items = items.where(r['NewArr'] == r['Arr'], items + '-16/' + r['NewArr'] + '0200 ZSSS')
+        items = items.where(items != '', '-15/N0460F1010 DCT')
+        return head + '-' + r['Dep'] + eobt + '-' + r['Arr'] + '-DOF/' + r['DOF'] + items + ')'
+
+    fill('CHG', chg_body)
+
+    receive_minutes = np.clip(f['EOBT'].to_numpy() - rng.integers(0, 180, n_rows), -8 * 60 + 1, 16 * 60 - 1)
+    receive_time = _format_times(pd.Timestamp(target_date) + pd.to_timedelta(receive_minutes + 8 * 60, unit='min') +
+                                 pd.to_timedelta(rng.integers(0, 60, n_rows), unit='s'), '%Y-%m-%d %H:%M:%S')
+    airline = f['CallSign'].str[:3]
+    json_data = ('{"airlineIcaoCode": "' + airline + '", "flightNo": "' + f['CallSign'].str[3:].str.zfill(4) +
+                 '", "regNo": "' + f['Reg'] + '", "aerocraftTypeIcaoCode": "' + f['Craft'] +
+                 '", "depAirportIcaoCode": "' + f['Dep'] + '", "arrAirportIcaoCode": "' + f['Arr'] + '"}')
+    return pd.DataFrame({'ID': np.arange(n_rows), 'JSON_DATA': json_data, 'ADDR': 'ZLXYZPZX', 'TELE_BODY': body,
+                         'RECEIVE_TIME': receive_time})
+
+
+def generate_fpla(flights, target_date, seed=2):
+    """
+    FPLA导出表 (中文列名，与导出Excel一致)。每个航班 1~4 个修订版本，
+    首版为计划值，后续版本以70%的比例跟进变更后的时刻/机号/目的地；约5%的版本为CNL。
+    """
+    rng = np.random.default_rng(seed)
+    revisions = rng.integers(1, 5, len(flights))
+    f = flights.loc[flights.index.repeat(revisions)].reset_index(drop=True)
+    version = pd.Series(np.arange(len(f)) - np.repeat(np.cumsum(revisions) - revisions, revisions))
+    follows = (version > 0) & (rng.random(len(f)) < 0.7)
+    apt_eobt = np.where(follows, f['NewEOBT'], f['EOBT'])
+    sobt = _bjt_strings(target_date, f['EOBT'], '%Y%m%d%H%M').astype(np.int64)
+    send_minutes = f['EOBT'].to_numpy() - 240 + version.to_numpy() * 30
+    return pd.DataFrame({
+        '航空器识别标志': f['CallSign'], '航空器注册号': f['Reg'], '计划离港时间': sobt,
+        '计划到港时间': sobt + 200, '计划起飞机场': f['Dep'], '计划目的地机场': f['Arr'],
+        '机场保障计划离港时间': _bjt_strings(target_date, apt_eobt, '%Y%m%d%H%M%S').astype(np.int64),
+        '机场保障计划到港时间': None, '机场保障计划起飞机场': f['Dep'],
+        '机场保障计划目的地机场': np.where(follows, f['NewArr'], f['Arr']),
+        '执飞航空器注册号': np.where(follows, f['NewReg'], None), '预执行计划机型': f['Craft'],
+        '预执行计划状态': np.where(rng.random(len(f)) < 0.05, 'CNL', np.where(version == 0, 'ADD', 'UPD')),
+        '计划航路': 'DCT', '消息发送时间': _bjt_strings(target_date, send_minutes, '%Y-%m-%d %H:%M:%S'),
+    })
+
+
+def generate_fodc(flights, target_date, seed=3):
+    """FODC导出表：约90%的航班有记录，其中已起飞的航班带实际起飞时间/机场，90%与最终变更一致。"""
+    rng = np.random.default_rng(seed)
+    f = flights[rng.random(len(flights)) < 0.9].reset_index(drop=True)
+    accurate = rng.random(len(f)) < 0.9
+    departed = rng.random(len(f)) < 0.7
+    actual_eobt = np.where(accurate, f['NewEOBT'], f['NewEOBT'] + 30)
+    atot = _bjt_strings(target_date, actual_eobt, '%Y%m%d%H%M%S').astype(np.int64)
+    return pd.DataFrame({
+        '航空器识别标志': f['CallSign'], '计划起飞机场': f['Dep'], '计划降落机场': f['Arr'],
+        '计划离港时间': _bjt_strings(target_date, f['EOBT'], '%Y%m%d%H%M%S').astype(np.int64),
+        '航空器注册号': np.where(accurate, f['NewReg'], f['Reg']), '航空器机型': f['Craft'],
+        '实际起飞时间': pd.Series(atot).where(departed), '实际起飞机场': np.where(departed, f['Dep'], None),
+        '实际降落机场': np.where(departed, f['NewArr'], None),
+        '消息发送时间': _bjt_strings(target_date, f['NewEOBT'], '%Y-%m-%d %H:%M:%S'),
+    })
+
+
+def generate_dataset(n_aftn_rows, target_date, airport='ZLXY', seed=0):
+    """返回 (aftn_raw_df, fpla_raw_df, fodc_raw_df)，规模以AFTN报文行数计，FPLA/FODC按航班数随之缩放。"""
+    n_flights = max(10, n_aftn_rows // AFTN_ROWS_PER_FLIGHT)
+    flights = generate_flights(n_flights, target_date, airport, seed)
+    return (generate_aftn(flights, n_aftn_rows, target_date, seed + 1),
+            generate_fpla(flights, target_date, seed + 2), generate_fodc(flights, target_date, seed + 3))
+
+
+def write_raw_files(output_dir, n_aftn_rows, target_date, airport='ZLXY', seed=0):
+    """按真实导出文件的命名写出 AFTN CSV 与 FPLA/FODC Excel。"""
+    aftn_df, fpla_df, fodc_df = generate_dataset(n_aftn_rows, target_date, airport, seed)
+    if len(fpla_df) > MAX_FPLA_ROWS:
+        raise ValueError(f"FPLA 共 {len(fpla_df)} 行，超出Excel单Sheet上限，请减小规模。")
+    os.makedirs(output_dir, exist_ok=True)
+    start_str = target_date.strftime('%Y%m%d')
+    end_str = (target_date + timedelta(days=1)).strftime('%Y%m%d')
+    aftn_df.to_csv(os.path.join(output_dir, 'sqlResult_9 1.csv'), index=False)
+    fpla_df.to_excel(os.path.join(output_dir, f'FPLA-Details-{airport}-{start_str}000000-{end_str}000000.xlsx'),
+                     index=False)
+    fodc_df.to_excel(os.path.join(output_dir, f'FODC-Details-{airport}-{start_str}000000-{end_str}000000.xlsx'),
+                     index=False)
+    return len(aftn_df), len(fpla_df), len(fodc_df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成 CMP_V3 合成原始数据")
+    parser.add_argument('--rows', type=int, default=10000, help="AFTN报文行数")
+    parser.add_argument('--date', default='2025-08-26', help="目标日期 YYYY-MM-DD")
+    parser.add_argument('--airport', default='ZLXY', help="机场ICAO代码")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default='raw_data_synth')
+    args = parser.parse_args()
+    counts = write_raw_files(args.output_dir, args.rows, datetime.strptime(args.date, "%Y-%m-%d").date(),
+                             args.airport.upper(), args.seed)
+    print(f"√ 已生成 AFTN {counts[0]} 行、FPLA {counts[1]} 行、FODC {counts[2]} 行: {args.output_dir}")
@@ -0,0 +1,215 @@
+"""
+CMP_V3 流水线基准测试。
+对每个规模先用合成数据跑一遍完整流水线，把各阶段的输入落盘；
+再为每个 (规模, 阶段) 启动一个全新的子进程，只加载该阶段的输入并计时，
+输入加载完成后重置子进程的峰值内存计数 (Linux 的 VmHWM)，记录的峰值常驻内存只反映被测阶段，
+不受其他阶段、父进程或加载输入的影响。
+结果写成 JSON (含 git 提交号)，可用 --compare 与之前的结果对比，跟踪各次提交之间的性能回退。
+
+用法 (在 CMP_V3 目录下):
+    python -m benchmarks.run_benchmarks --scales 1000 10000 100000
+    python -m benchmarks.run_benchmarks --scales 1000000 --stages process_aftn run_dynamic_comparison --repeat 1
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<上一次结果>.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from multiprocessing import get_context
+
+import pandas as pd
+
+from benchmarks.generate_data import generate_dataset
+from core import (FPLA_COLUMN_MAP, process_aftn_for_analysis, process_fpla_for_analysis, process_fodc_for_analysis,
+                  run_plan_comparison, run_dynamic_comparison, calculate_accuracy, REPORT_SHEETS,
+                  write_report_workbook)
+from stage_profiler import reset_peak_rss, current_rss_mb, peak_rss_mb
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+DEFAULT_SCALES = [1000, 10000, 100000]
+TARGET_DATE = date(2025, 8, 26)
+REGRESSION_THRESHOLD = 1.2  # 耗时超过基准结果的 1.2 倍时标记为回退
+REGRESSION_MIN_SECONDS = 0.05  # 且绝对差值超过该秒数，避免毫秒级阶段的计时抖动误报
+
+
+# ==============================================================================
+# --- 1. 各阶段 (输入文件 -> 被测函数) ---
+# ==============================================================================
+def _stage_process_aftn(inputs):
+    return process_aftn_for_analysis(inputs['aftn_raw'], TARGET_DATE)
+
+
+def _stage_process_fpla(inputs):
+    fpla_raw_df = inputs['fpla_raw'].rename(columns=FPLA_COLUMN_MAP)
+    return process_fpla_for_analysis(fpla_raw_df[fpla_raw_df['PSCHEDULESTATUS'] != 'CNL'].copy(), TARGET_DATE)[0]
+
+
+def _stage_process_fodc(inputs):
+    return process_fodc_for_analysis(inputs['fodc_raw'].copy(), TARGET_DATE)[0]
+
+
+def _stage_plan_comparison(inputs):
+    return run_plan_comparison(inputs['aftn'], inputs['fpla_plan'], inputs['fodc_plan'], TARGET_DATE)
+
+
+def _stage_dynamic_comparison(inputs):
+    return run_dynamic_comparison(inputs['aftn'], inputs['fpla_dynamic'], inputs['fodc_dynamic'], TARGET_DATE)
+
+
+def _stage_calculate_accuracy(inputs):
+    return calculate_accuracy(inputs['plan_report'], inputs['dynamic_report'])[0]
+
+
+def _stage_write_report(inputs):
+    output_file = os.path.join(inputs['work_dir'], 'report.xlsx')
+    write_report_workbook(output_file, inputs['reports'], log_callback=lambda message: None)
+    return inputs['reports']['动态对比详情']
+
+
+# 阶段名 -> (被测函数, 所需输入)
+STAGES = {
+    'process_aftn': (_stage_process_aftn, ['aftn_raw']),
+    'process_fpla': (_stage_process_fpla, ['fpla_raw']),
+    'process_fodc': (_stage_process_fodc, ['fodc_raw']),
+    'run_plan_comparison': (_stage_plan_comparison, ['aftn', 'fpla_plan', 'fodc_plan']),
+    'run_dynamic_comparison': (_stage_dynamic_comparison, ['aftn', 'fpla_dynamic', 'fodc_dynamic']),
+    'calculate_accuracy': (_stage_calculate_accuracy, ['plan_report', 'dynamic_report']),
+    'write_report': (_stage_write_report, ['reports']),
+}
+
+
+def prepare_inputs(scale, data_dir):
+    """生成该规模的合成数据并依次跑完流水线，把每个阶段的输入保存为 pickle。"""
+    aftn_raw, fpla_raw, fodc_raw = generate_dataset(scale, TARGET_DATE)
+    fpla_raw_df = fpla_raw.rename(columns=FPLA_COLUMN_MAP)
+    aftn = process_aftn_for_analysis(aftn_raw, TARGET_DATE)
+    fpla_plan, fpla_dynamic = process_fpla_for_analysis(
+        fpla_raw_df[fpla_raw_df['PSCHEDULESTATUS'] != 'CNL'].copy(), TARGET_DATE)
+    fodc_plan, fodc_dynamic = process_fodc_for_analysis(fodc_raw.copy(), TARGET_DATE)
+    for df in [aftn, fpla_plan, fpla_dynamic, fodc_plan, fodc_dynamic]:
+        df['ReceiveTime'] = pd.to_datetime(df['ReceiveTime'], errors='coerce')
+    plan_report = run_plan_comparison(aftn, fpla_plan, fodc_plan, TARGET_DATE)
+    dynamic_report = run_dynamic_comparison(aftn, fpla_dynamic, fodc_dynamic, TARGET_DATE)
+    stats = calculate_accuracy(plan_report, dynamic_report)
+    reports = {sheet_name: df for (sheet_name, _), df in
+               zip(REPORT_SHEETS, [plan_report, dynamic_report] + list(stats))}
+
+    inputs = {'aftn_raw': aftn_raw, 'fpla_raw': fpla_raw, 'fodc_raw': fodc_raw, 'aftn': aftn,
+              'fpla_plan': fpla_plan, 'fpla_dynamic': fpla_dynamic, 'fodc_plan': fodc_plan,
+              'fodc_dynamic': fodc_dynamic, 'plan_report': plan_report, 'dynamic_report': dynamic_report,
+              'reports': reports}
+    os.makedirs(data_dir, exist_ok=True)
+    for name, value in inputs.items():
+        pd.to_pickle(value, os.path.join(data_dir, f'{name}.pkl'))
+    return {name: len(value) for name, value in inputs.items() if isinstance(value, pd.DataFrame)}
+
+
+def _run_stage(stage, data_dir, repeat):
+    """在独立子进程中执行：加载输入 -> 重复执行 repeat 次，取最短耗时。"""
+    func, input_names = STAGES[stage]
+    inputs = {name: pd.read_pickle(os.path.join(data_dir, f'{name}.pkl')) for name in input_names}
+    inputs['work_dir'] = data_dir
+    rss_before = current_rss_mb()
+    peak_reset = reset_peak_rss()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func(inputs)
+        timings.append(time.perf_counter() - start)
+    peak = peak_rss_mb()
+    frames = [df for name in input_names for df in
+              (inputs[name].values() if isinstance(inputs[name], dict) else [inputs[name]])]
+    rows_in = sum(len(df) for df in frames)
+    return {'wall_s': round(min(timings), 4), 'wall_s_all': [round(t, 4) for t in timings], 'rows_in': rows_in,
+            'rows_out': len(output), 'peak_rss_mb': round(peak, 1), 'peak_rss_stage_only': peak_reset,
+            'rss_growth_mb': round(peak - rss_before, 1) if rss_before is not None else None}
+
+
+# ==============================================================================
+# --- 2. 结果记录与对比 ---
+# ==============================================================================
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare_results(current, baseline_path):
+    """按 (规模, 阶段) 对比当前结果与基准结果的耗时，返回超过阈值的回退项。"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['scale'], r['stage']): r for r in json.load(f)['results']}
+    print(f"\n--- 与基准 {os.path.basename(baseline_path)} 对比 (耗时比 = 当前 / 基准) ---")
+    regressions = []
+    for result in current['results']:
+        base = baseline.get((result['scale'], result['stage']))
+        if not base or not base['wall_s']: continue
+        ratio = result['wall_s'] / base['wall_s']
+        slower = result['wall_s'] - base['wall_s'] > REGRESSION_MIN_SECONDS
+        flag = '  <-- 回退' if ratio > REGRESSION_THRESHOLD and slower else ''
+        print(f"{result['scale']:>9} {result['stage']:<24} {base['wall_s']:>9.3f}s -> {result['wall_s']:>9.3f}s "
+              f"x{ratio:.2f}{flag}")
+        if flag: regressions.append(result)
+    return regressions
+
+
+# ==============================================================================
+# --- 3. 主程序入口 ---
+# ==============================================================================
+def run_benchmarks(scales, stages, repeat=3, results_dir=DEFAULT_RESULTS_DIR, keep_data=None):
+    work_dir = keep_data or tempfile.mkdtemp(prefix='cmp_bench_')
+    results = []
+    try:
+        for scale in scales:
+            data_dir = os.path.join(work_dir, str(scale))
+            print(f"\n===== 规模 {scale} 行AFTN报文: 生成数据并准备各阶段输入 =====")
+            sizes = prepare_inputs(scale, data_dir)
+            print(f"输入行数: {sizes}")
+            for stage in stages:
+                # 每个阶段一个全新的 spawn 子进程，峰值内存互不干扰
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                    result = pool.submit(_run_stage, stage, data_dir, repeat).result()
+                result.update({'scale': scale, 'stage': stage})
+                results.append(result)
+                print(f"{scale:>9} {stage:<24} {result['wall_s']:>9.3f}s  峰值内存 {result['peak_rss_mb']:>8.1f}MB "
+                      f"(+{result['rss_growth_mb']}MB)  {result['rows_in']} -> {result['rows_out']} 行")
+    finally:
+        if not keep_data: shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {'commit': _git_commit(), 'timestamp': datetime.now().isoformat(timespec='seconds'),
+              'python': platform.python_version(), 'pandas': pd.__version__, 'platform': platform.platform(),
+              'cpu_count': os.cpu_count(), 'repeat': repeat, 'results': results}
+    os.makedirs(results_dir, exist_ok=True)
+    output_file = os.path.join(results_dir, f"bench_{report['commit']}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n√ 基准结果已保存: {output_file}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CMP_V3 流水线基准测试")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help="AFTN报文行数规模，如 1000 10000 100000 1000000")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES), help="要测试的阶段")
+    parser.add_argument('--repeat', type=int, default=3, help="每个阶段重复次数，取最短耗时")
+    parser.add_argument('--results-dir', default=DEFAULT_RESULTS_DIR, help="JSON 结果输出目录")
+    parser.add_argument('--keep-data', help="把生成的各阶段输入保存到该目录 (默认用完即删)")
+    parser.add_argument('--compare', help="与之前的基准结果 JSON 对比，有回退时以非零状态退出")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.scales, args.stages, args.repeat, args.results_dir, args.keep_data)
+    if args.compare and compare_results(report, args.compare): sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
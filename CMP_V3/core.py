@@ -0,0 +1,1019 @@
+"""
+CMP_V3 公共核心：报文解析、预处理、对比与准确率统计。
+analysis_job.py (GUI 的主流程)、generate_analysis_files.py、run_semiauto_comparison.py 均从此处导入，
+解析或对比逻辑的优化只需在这里修改一次，批处理与 GUI 两条路径同时生效。
+"""
+# ==============================================================================
+# --- 0. 导入所需库 ---
+# ==============================================================================
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from aftn_tokenizer import tokenize_aftn, parse_item18
+from report_writer import estimate_column_widths, write_workbook, write_sidecars
+from stage_profiler import profile_stage
+from time_normalize import to_datetime_coerce, parse_fpla_time_series, format_time_series, convert_utc_series_to_bjt
+
+
+# ==============================================================================
+# --- 1. 辅助函数 ---
+# ==============================================================================
+def generate_flight_key(exec_date, flight_no, dep_icao, arr_icao):
+    if not all([exec_date, flight_no, dep_icao, arr_icao]): return "KEY_GENERATION_FAILED"
+    flight_no = str(flight_no).strip();
+    dep_icao = str(dep_icao).strip();
+    arr_icao = str(arr_icao).strip()
+    if isinstance(exec_date, datetime): exec_date = exec_date.date()
+    return f"{exec_date.strftime('%Y-%m-%d')}_{flight_no}_{dep_icao}_{arr_icao}"
+
+
+def parse_core_business_info(body):
+    """CHG报文的变更编组项 (7/9/13/15/16/18) -> New_* 字段。编组项13内容为空时抛出 IndexError。"""
+    return _amendment_changes(tokenize_aftn(body)['amendments'])
+
+
+def _amendment_changes(amendments):
+    """按出现顺序应用各变更编组项，同一编组项出现多次时以最后一次有效值为准。"""
+    changes = {}
+    for item_num_str, content in amendments:
+        content = content.replace('\r\n', ' ').replace('\n', ' ')
+        if item_num_str == '7':
+            changes['New_FlightNo'] = content.split('/')[0].strip()
+        elif item_num_str == '9':
+            changes['New_CraftType'] = content.split('/')[0].strip()
+        elif item_num_str == '13' and len(content.split()[0]) >= 8:
+            changes['New_Departure_Time'] = content.split()[0][-4:]
+        elif item_num_str == '15':
+            changes['New_Route'] = content
+        elif item_num_str == '16':
+            parts = content.split()
+            if parts:
+                dest_eet = parts[0];
+                changes['New_Destination'] = dest_eet[:-4] if len(dest_eet) >= 8 else dest_eet
+                if len(parts) > 1: changes['New_Alternate_1'] = parts[1]
+                if len(parts) > 2: changes['New_Alternate_2'] = parts[2]
+        elif item_num_str == '18':
+            item18 = parse_item18(content)
+            if item18.get('REG'): changes['New_RegNo'] = item18['REG'].split()[0].strip(')')
+            if item18.get('STS'): changes['New_Mission_STS'] = item18['STS'].split()[0]
+    return changes
+
+
+def auto_set_column_width(df, writer, sheet_name):
+    worksheet = writer.sheets[sheet_name]
+    for i, width in enumerate(estimate_column_widths(df)):
+        worksheet.set_column(i, i, width)
+
+
+def safe_strip(val):
+    return str(val).strip() if pd.notna(val) else ""
+
+
+# ==============================================================================
+# --- 1.1 AFTN 列式解析辅助 (编组项由 aftn_tokenizer 一次切分，按报文去重后取值) ---
+# ==============================================================================
+AFTN_DOF_PATTERN = re.compile(r'DOF/(?P<dof>\d{6})')  # 仅用于切分前按日期预筛
+AFTN_FLIGHT_NO_PATTERN = re.compile(r'^\(\w{3}-(?P<flight_no>[A-Z0-9]+)')  # 锚定报文开头，全部报文通用
+# 以下正则只作用于单个编组项的内容
+FIELD7_FLIGHT_NO_PATTERN = re.compile(r'[A-Z0-9]+')
+FIELD9_CRAFT_PATTERN = re.compile(r'([A-Z0-9]{3,4})/[LMHJ]')
+FIELD13_EOBT_PATTERN = re.compile(r'\w{4}\s*(\d{4})')
+AIRPORT_PATTERN = re.compile(r'[A-Z]{4}')
+AFTN_CATEGORY_COLS = ['MessageType', 'DepAirport', 'ArrAirport', 'CraftType', 'RegNo', 'RawMessage']
+AFTN_TOKEN_COLS = ['FlightNo', 'EOBT', 'DOF', 'RegNo', 'CraftType', 'DepAirport', 'ArrAirport']
+AFTN_JSON_FIELDS = ['depAirportIcaoCode', 'arrAirportIcaoCode', 'actlArrAirportIcaoCode', 'orgArrAirportIcaoCode',
+                    'regNo', 'aerocraftTypeIcaoCode']
+AFTN_CHANGE_COLS = ['New_FlightNo', 'New_CraftType', 'New_Departure_Time', 'New_Route', 'New_Destination',
+                    'New_Alternate_1', 'New_Alternate_2', 'New_RegNo', 'New_Mission_STS']
+AFTN_RESULT_COLS = ['ReceiveTime', 'MessageType', 'FlightNo', 'RegNo', 'DepAirport', 'ArrAirport', 'CraftType',
+                    'RawMessage'] + AFTN_CHANGE_COLS + ['FlightKey']
+AFTN_CSV_CHUNKSIZE = 100000
+# 重复转发去重：解析过程中暂存的报文摘要列，以及结果 DataFrame.attrs 中记录去除条数的键
+AFTN_HASH_COL = '_TelegramHash'
+AFTN_KEYS_COL = '_RecordKeys'  # 每行逐行版本记录中的 New_* 键 (按写入顺序，逗号分隔)，仅用于确定输出列顺序
+AFTN_DUPLICATES_ATTR = 'aftn_duplicates_dropped'
+
+
+def _truthy(series):
+    """逐元素等价于 Python 的 bool(val)，缺失值 (None/NaN) 视为 False。"""
+    return series.notna() & series.astype(bool)
+
+
+def _first_truthy(*series_list):
+    """逐元素等价于 `a or b or c`。"""
+    result = series_list[-1]
+    for series in reversed(series_list[:-1]):
+        result = series.where(_truthy(series), result)
+    return result
+
+
+def _bulk_json_loads(values):
+    """一次性解码整列JSON；整体解码失败时退回逐条解码，无效值返回 None。"""
+    values = list(values)
+    if all(isinstance(v, str) for v in values):
+        try:
+            decoded = json.loads('[' + ','.join(values) + ']')
+            if len(decoded) == len(values): return decoded
+        except ValueError:
+            pass
+    decoded = []
+    for v in values:
+        try:
+            decoded.append(json.loads(v))
+        except Exception:
+            decoded.append(None)
+    return decoded
+
+
+def _telegram_values(telegram):
+    """
+    从切分结果中取出 DLA/CPL/FPL 用到的字段 (缺失为 NaN)：编组项7的航班号、13的EOBT与起飞机场、9的机型、16的目的地，
+    以及编组项18中的 DOF / REG。
+    """
+    fields, item18 = telegram['fields'], telegram['item18']
+    flight_no = FIELD7_FLIGHT_NO_PATTERN.match(fields.get('7', ''))
+    field13 = fields.get('13', '')
+    eobt, dep = FIELD13_EOBT_PATTERN.match(field13), AIRPORT_PATTERN.match(field13)
+    craft = FIELD9_CRAFT_PATTERN.match(fields.get('9', ''))
+    arr = AIRPORT_PATTERN.match(fields.get('16', ''))
+    dof = item18.get('DOF', '')[:6]
+    reg = item18.get('REG', '').split()
+    return (flight_no.group() if flight_no else np.nan, eobt.group(1) if eobt else np.nan,
+            dof if len(dof) == 6 and dof.isdigit() else np.nan, reg[0].strip(')') if reg else np.nan,
+            craft.group(1) if craft else np.nan, dep.group() if dep else np.nan, arr.group() if arr else np.nan)
+
+
+def _factorize_bodies(bodies):
+    """报文列 -> (每行编号, 去重报文)。分类列直接按编号取出用到的报文，不再对原文重新哈希。"""
+    if isinstance(bodies.dtype, pd.CategoricalDtype):
+        codes = bodies.cat.codes.to_numpy()
+        if (codes >= 0).all():
+            used, codes = np.unique(codes, return_inverse=True)
+            return codes, bodies.cat.categories[used]
+    return pd.factorize(bodies, use_na_sentinel=False)
+
+
+def _per_unique_body(bodies, func, columns):
+    """相同报文只处理一次 (tokenize_aftn 另有跨分块的 LRU 缓存)，结果按原索引展开。"""
+    codes, uniques = _factorize_bodies(bodies)
+    values = pd.DataFrame.from_records([func(body) for body in uniques], columns=columns)
+    return values.take(codes).set_axis(bodies.index)
+
+
+def _extract_per_unique_body(bodies, pattern, group):
+    """等价于 bodies.str.extract(pattern)[group]，重复转发的相同报文只匹配一次。"""
+    codes, uniques = _factorize_bodies(bodies)
+    return pd.Series(uniques, dtype=object).str.extract(pattern)[group].take(codes).set_axis(bodies.index)
+
+
+def _telegram_digest(body):
+    """规整后的报文正文 (去掉首尾空白，连续的空白与换行合并为一个空格) 的内容摘要。"""
+    return hashlib.blake2b(' '.join(body.split()).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def telegram_hashes(bodies):
+    """报文列 -> 同索引的内容摘要列。同一报文的转发副本 (含仅空白、换行不同的副本) 摘要相同，按去重报文计算。"""
+    codes, uniques = _factorize_bodies(bodies)
+    digests = np.array([_telegram_digest(str(body)) for body in uniques], dtype=object)
+    return pd.Series(digests[codes], index=bodies.index)
+
+
+def earliest_telegram_copies(hashes, receive_times):
+    """每个摘要只保留接收时间最早的一条 (接收时间相同时保留先出现的)，返回与原索引对齐的保留掩码。"""
+    order = np.argsort(receive_times.to_numpy(), kind='stable')
+    keep = np.empty(len(order), dtype=bool)
+    keep[order] = ~pd.Series(hashes.to_numpy()[order]).duplicated().to_numpy()
+    return pd.Series(keep, index=hashes.index)
+
+
+def _aftn_token_frame(bodies):
+    """报文列 -> 与之同索引的编组项字段表 (列见 AFTN_TOKEN_COLS)。"""
+    return _per_unique_body(bodies, lambda body: _telegram_values(tokenize_aftn(body)), AFTN_TOKEN_COLS)
+
+
+def _chg_body_changes(body):
+    has_items = bool(tokenize_aftn(body)['amendments'])
+    try:
+        changes = parse_core_business_info(body)
+        return {'_valid': True, '_has_items': has_items, AFTN_KEYS_COL: ','.join(changes), **changes}
+    except IndexError:
+        return {'_valid': False, '_has_items': has_items}
+
+
+def _extract_chg_changes(bodies):
+    """
+    CHG报文的变更字段表，语义与 parse_core_business_info 一致。返回 (变更字段DataFrame, 需丢弃的行索引)，
+    变更字段表另含 AFTN_KEYS_COL 列 (各报文变更字段的出现顺序)。
+    编组项13内容为空时原逐行解析会抛出异常并跳过整条报文，这类报文列入需丢弃的行。
+    含变更编组项的报文中未出现的字段为 None (与按编组项分组取值的结果一致)，不含变更编组项的报文为 NaN。
+    """
+    changes = _per_unique_body(bodies, _chg_body_changes, ['_valid', '_has_items', AFTN_KEYS_COL] + AFTN_CHANGE_COLS)
+    dropped = changes.index[~changes.pop('_valid').astype(bool)]
+    has_items = changes.pop('_has_items').astype(bool)
+    record_keys = changes.pop(AFTN_KEYS_COL)
+    changes = changes.astype(object)
+    changes[has_items] = changes[has_items].where(changes[has_items].notna(), None)
+    changes = changes.drop(index=dropped).dropna(axis=1, how='all')
+    changes[AFTN_KEYS_COL] = record_keys.drop(index=dropped)
+    return changes, dropped
+
+
+# ==============================================================================
+# --- 1.2 对比阶段列式辅助 (机号规整与按航班索引；时间规整见 time_normalize) ---
+# ==============================================================================
+
+
+def safe_strip_series(series):
+    """整列版 safe_strip。"""
+    return series.astype(str).str.strip().where(series.notna(), '')
+
+
+def build_latest_record_index(df, key_col='FlightKey', time_col='ReceiveTime'):
+    """
+    一次排序 + 去重构建 "每个 FlightKey 的最新记录" 索引表 (以 FlightKey 为索引)。
+    稳定排序保证接收时间相同的记录取原始顺序中的第一条，与逐航班过滤后 iloc[0] 的结果一致。
+    """
+    if df.empty or key_col not in df.columns: return pd.DataFrame(index=pd.Index([], name=key_col))
+    latest = df.sort_values(time_col, ascending=False, kind='mergesort').drop_duplicates(key_col, keep='first')
+    return latest.dropna(subset=[key_col]).set_index(key_col)
+
+
+# 动态对比字段规则：(AFTN列, 变更类型, 明细前缀, FPLA列, FODC列, FPLA佐证前缀, FODC佐证前缀, 是否时刻)
+DLA_CHG_FIELD_RULES = [
+    ('New_Departure_Time', '时刻变更', '新离港时刻: ', 'APTSOBT', 'FODC_ATOT', 'FPLA保障时刻: ', 'FODC实际起飞: ', True),
+    ('New_RegNo', '机号变更', '新机号: ', 'RegNo', 'RegNo', 'FPLA机号: ', 'FODC机号: ', False),
+    ('New_Destination', '航站变更', '新目的地: ', 'APTARRAP', 'ArrAirport', 'FPLA保障目的地: ', 'FODC目的地: ', False),
+    ('New_CraftType', '机型变更', '新机型: ', 'CraftType', 'CraftType', 'FPLA机型: ', 'FODC机型: ', False),
+    ('New_FlightNo', '航班号变更', '新航班号: ', 'FlightNo', 'FlightNo', 'FPLA航班号: ', 'FODC航班号: ', False),
+]
+CPL_FIELD_RULES = [
+    ('New_FlightNo', '航班号变更', '新数据: ', 'FlightNo', 'FlightNo', 'FPLA数据: ', 'FODC数据: ', False),
+    ('New_CraftType', '机型变更', '新数据: ', 'CraftType', 'CraftType', 'FPLA数据: ', 'FODC数据: ', False),
+    ('New_RegNo', '机号变更', '新数据: ', 'RegNo', 'RegNo', 'FPLA数据: ', 'FODC数据: ', False),
+    ('New_Destination', '航站变更', '新数据: ', 'APTARRAP', 'ArrAirport', 'FPLA数据: ', 'FODC数据: ', False),
+]
+DYNAMIC_REPORT_COLS = ['FlightKey', 'AFTN_Event_Time', 'AFTN_Event_Type', 'AFTN_Change_Detail',
+                       'FPLA_vs_AFTN_Status', 'FPLA_vs_FODC_Status', 'Evidence']
+
+
+def normalize_timeline(df, time_cols, text_cols):
+    """
+    对 FPLA/FODC 动态时间线做一次性规整：时刻列解析并格式化为 '%m-%d %H:%M'，文本列 safe_strip。
+    同时保留每列原始值是否缺失 (列名加 '_isna' 后缀)，供 "无FODC数据" 判断使用。
+    """
+    df = df.reindex(columns=['FlightKey', 'ReceiveTime'] + time_cols + text_cols)
+    normalized = df[['FlightKey', 'ReceiveTime']].copy()
+    for col in time_cols: normalized[col] = format_time_series(parse_fpla_time_series(df[col]))
+    for col in text_cols: normalized[col] = safe_strip_series(df[col])
+    for col in time_cols + text_cols: normalized[col + '_isna'] = df[col].isna()
+    return normalized
+
+
+def _melt_fields(df, fields, value_name):
+    """把按航班索引的宽表展开为 (FlightKey, Field, 值) 长表，便于与事件检查表合并。"""
+    if df.empty: return pd.DataFrame(columns=['FlightKey', 'Field', value_name])
+    return df[fields].rename_axis('FlightKey').reset_index().melt(id_vars='FlightKey', var_name='Field',
+                                                                  value_name=value_name)
+
+
+def generate_flight_key_series(exec_date, flight_no, dep_icao, arr_icao, key_ok=None):
+    """
+    整列版 generate_flight_key。key_ok 缺省按 Python 真值判断，与逐行版 all([...]) 一致 (NaN 视为真)。
+    """
+    if key_ok is None: key_ok = flight_no.astype(bool) & dep_icao.astype(bool) & arr_icao.astype(bool)
+    flight_key = (exec_date.strftime('%Y-%m-%d') + '_' + flight_no.astype(str).str.strip() + '_' +
+                  dep_icao.astype(str).str.strip() + '_' + arr_icao.astype(str).str.strip())
+    return flight_key.where(key_ok, 'KEY_GENERATION_FAILED')
+
+
+# ==============================================================================
+# --- 2. 预处理函数 (AFTN / FPLA / FODC) ---
+# ==============================================================================
+def process_aftn_for_analysis(df, target_date, dedupe=True):
+    """
+    列式解析AFTN报文：批量JSON解码 + 按报文去重后一次切分编组项 (aftn_tokenizer)，替代逐行 iterrows。
+    输出列与 FlightKey 与逐行版本保持一致。
+    dedupe=True 时，同一报文的重复转发 (规整后正文的摘要相同) 只保留接收时间最早的一条，在JSON解码和切分之前剔除；
+    去除的条数见 aftn_duplicates_dropped(结果)。
+    """
+    if df.empty or df.shape[1] < 5: return pd.DataFrame()
+    parsed = _parse_aftn_columns(df.iloc[:, 1], df.iloc[:, 3], df.iloc[:, 4], target_date, dedupe)
+    return _finish_aftn_dedupe(parsed, aftn_duplicates_dropped(parsed))
+
+
+def read_aftn_for_analysis(path, target_date, chunksize=AFTN_CSV_CHUNKSIZE, dedupe=True):
+    """
+    分块读取AFTN导出CSV并解析 (等价于 read_csv 全量读入后调用 process_aftn_for_analysis)。
+    每块只读取 JSON/正文/接收时间 三列，块内先做接收时间与DOF的日期预筛和 DEP/ARR 剔除，
+    只解析留下的报文并累积结果，峰值内存取决于目标日数据量而不是整个导出文件。
+    重复转发先在块内剔除，跨块的副本在拼接后按摘要再剔除一次。
+    """
+    return read_aftn_days(path, [target_date], chunksize, dedupe)[target_date]
+
+
+def read_aftn_days(path, target_dates, chunksize=AFTN_CSV_CHUNKSIZE, dedupe=True):
+    """
+    多个日期共用一次分块读取：每块的日期预筛只做一次，再按日期拆开解析。
+    返回 {日期: 结果}，各日期的结果与分别调用 read_aftn_for_analysis 相同。
+    """
+    target_dates = list(dict.fromkeys(target_dates))
+    if len(pd.read_csv(path, header=0, nrows=0).columns) < 5: return {d: pd.DataFrame() for d in target_dates}
+    parsed_chunks = {d: [] for d in target_dates}
+    duplicates = dict.fromkeys(target_dates, 0)
+    for chunk in pd.read_csv(path, header=0, on_bad_lines='skip', usecols=[1, 3, 4], chunksize=chunksize):
+        aftn, flight_date = _prefilter_aftn(chunk.iloc[:, 0], chunk.iloc[:, 1], chunk.iloc[:, 2])
+        for target_date in target_dates:
+            parsed = _parse_aftn_day(aftn[flight_date == pd.Timestamp(target_date)], target_date, dedupe)
+            duplicates[target_date] += aftn_duplicates_dropped(parsed)
+            if not parsed.empty: parsed_chunks[target_date].append(parsed)
+    return {d: _finish_aftn_dedupe(concat_aftn_frames(parsed_chunks[d]), duplicates[d]) for d in target_dates}
+
+
+def aftn_duplicates_dropped(df):
+    """解析时作为重复转发剔除的报文条数。"""
+    return df.attrs.get(AFTN_DUPLICATES_ATTR, 0)
+
+
+def _record_column_order(record_keys):
+    """
+    逐行版本 pd.DataFrame(记录列表) 的列顺序：每条记录依次写入基本列、该报文的 New_* 字段、FlightKey，
+    各列按行序首次出现的位置排列 (CHG 的变更字段按编组项在报文中的顺序)。
+    """
+    columns = dict.fromkeys(AFTN_RESULT_COLS[:8])
+    for keys in pd.unique(record_keys):
+        columns.update(dict.fromkeys((keys.split(',') if keys else []) + ['FlightKey']))
+    return list(columns)
+
+
+def _finish_aftn_dedupe(result, duplicates):
+    """剔除残留的重复副本 (跨分块)，去掉摘要列，按逐行版本的列顺序输出，并把剔除总数记入 attrs。"""
+    if AFTN_HASH_COL in result.columns:
+        keep = earliest_telegram_copies(result[AFTN_HASH_COL], result['ReceiveTime'])
+        duplicates += int((~keep).sum())
+        result = result[keep].drop(columns=AFTN_HASH_COL).reset_index(drop=True)
+    if AFTN_KEYS_COL in result.columns:
+        result = result[_record_column_order(result[AFTN_KEYS_COL])]
+    result.attrs[AFTN_DUPLICATES_ATTR] = duplicates
+    return result
+
+
+def _prefilter_aftn(json_col, body_col, time_col):
+    """剔除 DEP/ARR 与接收时间无效的报文，返回 (报文表, 执行日期)。执行日期：DOF优先，DOF无效时取接收时间的日期。"""
+    aftn = pd.DataFrame({'Json': json_col, 'RawMessage': body_col.astype(str),
+                         'ReceiveTime': to_datetime_coerce(time_col)})
+    aftn['MessageType'] = aftn['RawMessage'].str[1:4].str.strip()
+    aftn = aftn[~aftn['MessageType'].isin(['DEP', 'ARR']) & aftn['ReceiveTime'].notna()]
+    dof = _extract_per_unique_body(aftn['RawMessage'], AFTN_DOF_PATTERN, 'dof')
+    dof_date = pd.to_datetime('20' + dof, format='%Y%m%d', errors='coerce')
+    return aftn, dof_date.fillna(aftn['ReceiveTime']).dt.normalize()
+
+
+def _parse_aftn_columns(json_col, body_col, time_col, target_date, dedupe=True):
+    aftn, flight_date = _prefilter_aftn(json_col, body_col, time_col)
+    return _parse_aftn_day(aftn[flight_date == pd.Timestamp(target_date)], target_date, dedupe)
+
+
+def _parse_aftn_day(aftn, target_date, dedupe=True):
+    """解析预筛后执行日期为 target_date 的报文 (见 _prefilter_aftn)。"""
+    if aftn.empty: return pd.DataFrame()
+
+    # 重复转发：每个报文摘要只保留最早的一条，后续的JSON解码与切分只处理留下的报文
+    duplicates = 0
+    if dedupe:
+        hashes = telegram_hashes(aftn['RawMessage'])
+        keep = earliest_telegram_copies(hashes, aftn['ReceiveTime'])
+        duplicates = int((~keep).sum())
+        aftn, hashes = aftn[keep], hashes[keep]
+
+    decoded = _bulk_json_loads(aftn['Json'])
+    is_dict = [isinstance(d, dict) for d in decoded]
+    aftn = aftn[is_dict]
+    records = [d for d in decoded if isinstance(d, dict)]
+    if not records: return _finish_aftn_dedupe(pd.DataFrame(), duplicates)
+    meta = pd.DataFrame.from_records(records, columns=AFTN_JSON_FIELDS, index=aftn.index).astype(object)
+
+    bodies = aftn['RawMessage']
+    msg_type = aftn['MessageType']
+    is_chg, is_dla, is_cpl = msg_type == 'CHG', msg_type == 'DLA', msg_type == 'CPL'
+    # DLA/CPL 需要的编组项字段一次切分取出；CHG 的变更编组项见 _extract_chg_changes
+    tokens = _aftn_token_frame(bodies[is_dla | is_cpl])
+
+    flight_no = _extract_per_unique_body(bodies, AFTN_FLIGHT_NO_PATTERN, 'flight_no')
+    no_match = flight_no.isna().tolist()
+    if any(no_match):
+        flight_no[no_match] = [f"{d.get('airlineIcaoCode', '')}{str(d.get('flightNo', '')).lstrip('0')}"
+                               for d, missing in zip(records, no_match) if missing]
+
+    dep_icao = meta['depAirportIcaoCode']
+    arr_icao = meta['arrAirportIcaoCode'].copy()
+    if is_cpl.any():
+        cpl_arr = _first_truthy(meta['actlArrAirportIcaoCode'], meta['orgArrAirportIcaoCode'],
+                                meta['arrAirportIcaoCode'])
+        arr_icao[is_cpl] = cpl_arr[is_cpl]
+        need_arr = is_cpl & ~_truthy(arr_icao)
+        found_arr = tokens.loc[need_arr[need_arr].index, 'ArrAirport'].dropna()
+        arr_icao[found_arr.index] = found_arr
+        need_dep = is_cpl & ~_truthy(dep_icao)
+        found_dep = tokens.loc[need_dep[need_dep].index, 'DepAirport'].dropna()
+        dep_icao = dep_icao.copy()
+        dep_icao[found_dep.index] = found_dep
+
+    result = pd.DataFrame({'ReceiveTime': aftn['ReceiveTime'], 'MessageType': msg_type, 'FlightNo': flight_no,
+                           'RegNo': meta['regNo'], 'DepAirport': dep_icao, 'ArrAirport': arr_icao,
+                           'CraftType': meta['aerocraftTypeIcaoCode'], 'RawMessage': bodies})
+
+    # 各行写入的 New_* 键 (逐行版本 record 字典的键顺序)，在 _finish_aftn_dedupe 中决定输出列顺序
+    record_keys = pd.Series('', index=result.index, dtype=object)
+    change_frames, dropped = [], bodies.index[:0]
+    if is_chg.any():
+        chg_changes, dropped = _extract_chg_changes(bodies[is_chg])
+        record_keys[chg_changes.index] = chg_changes.pop(AFTN_KEYS_COL)
+        change_frames.append(chg_changes)
+    if is_dla.any():
+        dla_eobt = tokens.loc[is_dla[is_dla].index, 'EOBT'].dropna()
+        record_keys[dla_eobt.index] = 'New_Departure_Time'
+        if not dla_eobt.empty: change_frames.append(dla_eobt.to_frame('New_Departure_Time'))
+    if is_cpl.any():
+        cpl_changes = pd.DataFrame({'New_FlightNo': flight_no[is_cpl], 'New_Destination': arr_icao[is_cpl]})
+        cpl_index = is_cpl[is_cpl].index
+        cpl_craft, cpl_reg = tokens.loc[cpl_index, 'CraftType'], tokens.loc[cpl_index, 'RegNo']
+        record_keys[cpl_index] = (np.where(cpl_craft.notna(), 'New_CraftType,', '')
+                                  + np.where(cpl_reg.notna(), 'New_RegNo,', '') + 'New_FlightNo,New_Destination')
+        if cpl_craft.notna().any(): cpl_changes['New_CraftType'] = cpl_craft
+        if cpl_reg.notna().any(): cpl_changes['New_RegNo'] = cpl_reg
+        change_frames.append(cpl_changes)
+    if change_frames:
+        changes = pd.concat(change_frames)
+        result = result.join(changes[[col for col in AFTN_CHANGE_COLS if col in changes.columns]])
+    result[AFTN_KEYS_COL] = record_keys
+    result = result.drop(index=dropped)
+
+    key_flight_no = result['New_FlightNo'].where(result['New_FlightNo'].notna(), result['FlightNo']) \
+        if 'New_FlightNo' in result.columns else result['FlightNo']
+    key_arr_airport = _first_truthy(result['New_Destination'], result['ArrAirport']) \
+        if 'New_Destination' in result.columns else result['ArrAirport']
+    key_dep_airport = result['DepAirport']
+    key_ok = _truthy(key_flight_no) & _truthy(key_dep_airport) & _truthy(key_arr_airport)
+    result['FlightKey'] = generate_flight_key_series(target_date, key_flight_no, key_dep_airport,
+                                                     key_arr_airport, key_ok)
+    if dedupe: result[AFTN_HASH_COL] = hashes
+    result = compact_aftn_frame(result.reset_index(drop=True))
+    result.attrs[AFTN_DUPLICATES_ATTR] = duplicates
+    return result
+
+
+def compact_aftn_frame(df):
+    """
+    解析结果的紧凑表示：报文类型、机场、机型、机号为分类列，ReceiveTime 为 datetime64。
+    RawMessage 也是分类列：categories 即去重后的报文库，每行只保存整数编号 (codes)，
+    重复转发的同一报文只存一份，需要报文原文时按编号取用 (见 raw_message_store)。
+    """
+    if 'ReceiveTime' in df.columns: df['ReceiveTime'] = pd.to_datetime(df['ReceiveTime'], errors='coerce')
+    for col in AFTN_CATEGORY_COLS:
+        if col in df.columns: df[col] = df[col].astype('category')
+    return df
+
+
+def concat_aftn_frames(frames):
+    """拼接多块解析结果；分类列先统一为各块类别的并集，避免 concat 退化为 object 列。"""
+    frames = [df for df in frames if not df.empty]
+    if not frames: return pd.DataFrame()
+    if len(frames) == 1: return frames[0].reset_index(drop=True)
+    frames = [df.copy(deep=False) for df in frames]
+    for col in AFTN_CATEGORY_COLS:
+        parts = [df[col] for df in frames if col in df.columns]
+        if not all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts): continue
+        categories = pd.Index(np.concatenate([part.cat.categories.to_numpy(dtype=object) for part in parts])).unique()
+        for df in frames:
+            if col in df.columns: df[col] = df[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def raw_message_store(df):
+    """返回 (报文库, 每行的报文编号)：报文库为去重后的报文原文 Index，编号 -1 表示缺失。"""
+    raw = df['RawMessage'] if isinstance(df['RawMessage'].dtype, pd.CategoricalDtype) \
+        else df['RawMessage'].astype('category')
+    return raw.cat.categories, raw.cat.codes
+
+
+def _column(df, name):
+    """等价于逐行的 row.get(name)：列不存在时返回全 None 列。"""
+    return df[name] if name in df.columns else pd.Series([None] * len(df), index=df.index, dtype=object)
+
+
+def _or_series(primary, fallback):
+    """逐元素等价于 `a or b` (Python 真值，NaN 视为真)。"""
+    return primary.where(primary.astype(bool), fallback)
+
+
+def _flight_date_mask(sobt_str, min_len, target_date):
+    """SOBT 字符串长度达标且前8位日期等于目标日期的行。"""
+    flight_date = pd.to_datetime(sobt_str.str[:8].where(sobt_str.str.len() >= min_len), format='%Y%m%d',
+                                 errors='coerce')
+    return flight_date == pd.Timestamp(target_date)
+
+
+def process_fpla_for_analysis(df, target_date):
+    """
+    FPLA 预处理 (列式)：不对输出去重，保留完整的消息历史。
+    plan_df 和 dynamic_df 为同一份包含所有记录的 DataFrame，仅为接口统一分别返回。
+    """
+    sobt_str = _column(df, 'SOBT').astype(str).str.split('.').str[0]
+    fpla = df[_flight_date_mask(sobt_str, 8, target_date)]
+    if fpla.empty: return pd.DataFrame(), pd.DataFrame()
+    col = lambda name: _column(fpla, name)
+    full_df = pd.DataFrame({
+        'FlightKey': generate_flight_key_series(target_date, col('CALLSIGN'), col('DEPAP'), col('ARRAP')),
+        'ReceiveTime': col('SENDTIME'), 'FPLA_Status': col('PSCHEDULESTATUS'), 'FlightNo': col('CALLSIGN'),
+        'RegNo': _or_series(col('EREGNUMBER'), col('REGNUMBER')), 'CraftType': col('PSAIRCRAFTTYPE'),
+        'SOBT': col('SOBT'), 'SIBT': col('SIBT'), 'DepAirport': col('DEPAP'), 'ArrAirport': col('ARRAP'),
+        'APTSOBT': col('APTSOBT'), 'APTSIBT': col('APTSIBT'), 'APTDEPAP': col('APTDEPAP'),
+        'APTARRAP': col('APTARRAP'), 'Route': col('SROUTE'),
+    }).reset_index(drop=True)
+    return full_df.copy(), full_df.copy()
+
+
+def process_fodc_for_analysis(df, target_date):
+    """
+    FODC 预处理 (列式)：不对输出去重，保留完整的消息历史。
+    有实际起飞时间或实际起飞机场的记录同时进入 dynamic_df。
+    """
+    df.columns = [str(col).strip() for col in df.columns]
+    sobt_str = _column(df, '计划离港时间').astype(str).str.split('.').str[0]
+    on_date = _flight_date_mask(sobt_str, 12, target_date)
+    fodc, sobt_str = df[on_date], sobt_str[on_date]
+    if fodc.empty: return pd.DataFrame(), pd.DataFrame()
+    col = lambda name: _column(fodc, name)
+    flight_key = generate_flight_key_series(target_date, col('航空器识别标志'), col('计划起飞机场'),
+                                            col('计划降落机场'))
+    plan_df = pd.DataFrame({
+        'FlightKey': flight_key, 'ReceiveTime': col('消息发送时间'), 'FlightNo': col('航空器识别标志'),
+        'RegNo': col('航空器注册号'), 'DepAirport': col('计划起飞机场'), 'ArrAirport': col('计划降落机场'),
+        'SOBT': sobt_str, 'CraftType': col('航空器机型'),
+    }).reset_index(drop=True)
+
+    has_dynamic = col('实际起飞时间').notna() | col('实际起飞机场').notna()
+    if not has_dynamic.any(): return plan_df, pd.DataFrame()
+    dynamic = fodc[has_dynamic]
+    col = lambda name: _column(dynamic, name)
+    dynamic_df = pd.DataFrame({
+        'FlightKey': flight_key[has_dynamic], 'ReceiveTime': col('消息发送时间'), 'FlightNo': col('航空器识别标志'),
+        'RegNo': col('航空器注册号'), 'CraftType': col('航空器机型'),
+        'DepAirport': _or_series(col('实际起飞机场'), col('计划起飞机场')),
+        'ArrAirport': _or_series(col('实际降落机场'), col('计划降落机场')),
+        'FODC_ATOT': col('实际起飞时间').astype(str).str.split('.').str[0],
+    }).reset_index(drop=True)
+    return plan_df, dynamic_df
+
+
+# ==============================================================================
+# --- 3. 对比函数 (计划对比 / 动态对比) ---
+# ==============================================================================
+def run_plan_comparison(aftn_df, fpla_plan_df, fodc_plan_df, target_date_obj):
+    """
+    计划对比：先为 AFTN FPL / FPLA / FODC 各建一次 "每航班最新记录" 索引，再按 FlightKey 连接，
+    对比结论以整列运算生成，整体为线性复杂度。
+    """
+    plan_columns = ['航班标识(FlightKey)', 'AFTN-机号(FPL_RegNo)', 'FPLA-机号(FPLA_RegNo)',
+                    'AFTN-离港时间(FPL_SOBT_BJT)', 'FPLA-离港时间(FPLA_SOBT)', 'FODC-机号(FODC_RegNo)',
+                    'FODC-离港时间(FODC_SOBT)', 'AFTN vs FODC 对比', 'FPLA vs FODC 对比', '最终结论(Final_Conclusion)']
+    aftn_fpls = aftn_df[aftn_df['MessageType'] == 'FPL']
+    aftn_fpl_keys = aftn_fpls['FlightKey'].dropna().unique()
+    if len(aftn_fpl_keys) == 0: return pd.DataFrame(columns=plan_columns)
+    latest_fpl = build_latest_record_index(aftn_fpls).reindex(aftn_fpl_keys)
+    latest_fpla = build_latest_record_index(fpla_plan_df)
+    latest_fodc = build_latest_record_index(fodc_plan_df)
+
+    # AFTN: 以最新FPL报文中的EOBT/DOF/REG为准
+    fpl_tokens = _aftn_token_frame(latest_fpl['RawMessage'])
+    fpl_eobt = fpl_tokens['EOBT']
+    dof_date = pd.to_datetime('20' + fpl_tokens['DOF'], format='%Y%m%d', errors='coerce')
+    base_date = dof_date.fillna(pd.Timestamp(target_date_obj))
+    aftn_sobt = format_time_series(convert_utc_series_to_bjt(fpl_eobt, base_date))
+    aftn_reg_match = fpl_tokens['RegNo']
+    aftn_reg = safe_strip_series(aftn_reg_match).where(aftn_reg_match.notna(),
+                                                      safe_strip_series(latest_fpl['RegNo']))
+
+    # FPLA / FODC: 按 FlightKey 对齐各自的最新记录
+    has_fpla = latest_fpl.index.isin(latest_fpla.index)
+    has_fodc = latest_fpl.index.isin(latest_fodc.index)
+    fpla = latest_fpla.reindex(latest_fpl.index, columns=['SOBT', 'RegNo'])
+    fodc = latest_fodc.reindex(latest_fpl.index, columns=['SOBT', 'RegNo'])
+    fpla_reg, fodc_reg = safe_strip_series(fpla['RegNo']), safe_strip_series(fodc['RegNo'])
+    fpla_sobt = format_time_series(parse_fpla_time_series(fpla['SOBT']))
+    fodc_sobt = format_time_series(parse_fpla_time_series(fodc['SOBT']))
+
+    # 对比结论 (整列)
+    same = lambda left, right: np.where(left == right, '一致', '不一致')
+    aftn_fodc_reg, fpla_fodc_reg = same(aftn_reg, fodc_reg), same(fpla_reg, fodc_reg)
+    aftn_fodc_sobt, fpla_fodc_sobt = same(aftn_sobt, fodc_sobt), same(fpla_sobt, fodc_sobt)
+
+    def three_way(prefix, aftn_status, fpla_status):
+        return np.select([(aftn_status == '一致') & (fpla_status == '一致'), aftn_status == '一致',
+                          fpla_status == '一致'], ['', f'{prefix}:AFTN正确', f'{prefix}:FPLA正确'],
+                         f'{prefix}:三方不一致')
+
+    def join_parts(first, second, default):
+        joined = np.where((first != '') & (second != ''), np.char.add(np.char.add(first, ', '), second),
+                          np.char.add(first, second))
+        return np.where(joined == '', default, joined)
+
+    both_conclusion = join_parts(three_way('机号', aftn_fodc_reg, fpla_fodc_reg),
+                                 three_way('时刻', aftn_fodc_sobt, fpla_fodc_sobt), '三方一致')
+    fpla_only_conclusion = join_parts(np.where(aftn_reg != fpla_reg, '机号不一致', ''),
+                                      np.where(aftn_sobt != fpla_sobt, '时刻不一致', ''), '初步一致')
+
+    aftn_vs_fodc = np.char.add(np.char.add('机号:', aftn_fodc_reg), np.char.add(', 时刻:', aftn_fodc_sobt))
+    fpla_vs_fodc = np.char.add(np.char.add('机号:', fpla_fodc_reg), np.char.add(', 时刻:', fpla_fodc_sobt))
+    no_fpla, no_fodc = ~has_fpla, has_fpla & ~has_fodc
+    df = pd.DataFrame({
+        '航班标识(FlightKey)': latest_fpl.index,
+        'AFTN-机号(FPL_RegNo)': aftn_reg.values,
+        'FPLA-机号(FPLA_RegNo)': np.where(has_fpla, fpla_reg, '无FPLA数据'),
+        'AFTN-离港时间(FPL_SOBT_BJT)': aftn_sobt.values,
+        'FPLA-离港时间(FPLA_SOBT)': np.where(has_fpla, fpla_sobt, '无FPLA数据'),
+        'FODC-机号(FODC_RegNo)': np.where(has_fodc, fodc_reg, '无FODC数据'),
+        'FODC-离港时间(FODC_SOBT)': np.where(has_fodc, fodc_sobt, '无FODC数据'),
+        'AFTN vs FODC 对比': np.select([no_fpla, no_fodc], ['N/A (无FPLA)', '无FODC数据'], aftn_vs_fodc),
+        'FPLA vs FODC 对比': np.select([no_fpla, no_fodc], ['无FPLA数据', '无FODC数据'], fpla_vs_fodc),
+        '最终结论(Final_Conclusion)': np.select([no_fpla, no_fodc], ['无FPLA数据', fpla_only_conclusion],
+                                            both_conclusion),
+    })
+    return df
+
+
+def run_dynamic_comparison(aftn_df, fpla_dynamic_df, fodc_dynamic_df, target_date_obj):
+    """
+    动态变更事件溯源对比 (列式版)。
+    FPLA/FODC 时间线先一次性规整，AFTN 事件按字段展开为检查表，
+    "FPLA 是否有任一版本与 AFTN 值一致" 通过与 (FlightKey, 字段, 值) 去重表的合并一次性回答，
+    未命中时取该航班最新一版 FPLA 的值，FODC 侧取最新一条记录对比。
+    """
+    events = aftn_df[aftn_df['MessageType'].isin(['DLA', 'CHG', 'CPL'])].sort_values('ReceiveTime', kind='mergesort')
+    events = events[events['FlightKey'].notna()].reset_index(drop=True)
+    if events.empty: return _rename_dynamic_report(pd.DataFrame(columns=DYNAMIC_REPORT_COLS))
+    missing_cols = [rule[0] for rule in DLA_CHG_FIELD_RULES if rule[0] not in events.columns]
+    events = events.reindex(columns=list(events.columns) + missing_cols)
+
+    fpla_fields = ['APTSOBT', 'RegNo', 'APTARRAP', 'CraftType', 'FlightNo']
+    fodc_fields = ['FODC_ATOT', 'RegNo', 'ArrAirport', 'CraftType', 'FlightNo']
+    fpla = normalize_timeline(fpla_dynamic_df, ['APTSOBT'], fpla_fields[1:])
+    fodc = normalize_timeline(fodc_dynamic_df, ['FODC_ATOT'], fodc_fields[1:])
+    latest_fpla = build_latest_record_index(fpla)
+    latest_fodc = build_latest_record_index(fodc)
+    fpla_revisions = fpla.dropna(subset=['FlightKey']).melt(
+        id_vars='FlightKey', value_vars=fpla_fields, var_name='FPLA_Field', value_name='AFTN_Value').drop_duplicates()
+    fpla_revisions['Matched'] = True
+
+    has_fpla = events['FlightKey'].isin(latest_fpla.index)
+    base = pd.DataFrame({'EventId': events.index, 'FlightKey': events['FlightKey'],
+                         'AFTN_Event_Time': events['ReceiveTime'], 'MessageType': events['MessageType'].astype(object)})
+
+    # --- 1. 无FPLA时间线的事件：每个事件一行 (无匹配) ---
+    no_fpla = base[~has_fpla]  # 须用同一子集的列赋值：对空表 assign 整列会改用该列的索引，凭空生成全空行
+    result_frames = [no_fpla.assign(
+        Rank=0, AFTN_Event_Type=no_fpla['MessageType'] + ' (无匹配)', AFTN_Change_Detail='N/A',
+        FPLA_vs_AFTN_Status='无FPLA数据', FPLA_vs_FODC_Status='无FPLA数据', Evidence='无FPLA数据')]
+
+    # --- 2. 按字段规则把事件展开为检查表 ---
+    checks = []
+    for msg_types, rules in [(['DLA', 'CHG'], DLA_CHG_FIELD_RULES), (['CPL'], CPL_FIELD_RULES)]:
+        in_scope = has_fpla & events['MessageType'].isin(msg_types)
+        for rank, (aftn_col, change_type, detail_prefix, fpla_col, fodc_col, fpla_label, fodc_label,
+                   is_time) in enumerate(rules, 1):
+            mask = in_scope & events[aftn_col].notna()
+            if not mask.any(): continue
+            if is_time:
+                value = format_time_series(convert_utc_series_to_bjt(events.loc[mask, aftn_col],
+                                                                     events.loc[mask, 'ReceiveTime']))
+            else:
+                value = safe_strip_series(events.loc[mask, aftn_col])
+            checks.append(base[mask].assign(
+                Rank=rank, AFTN_Event_Type=base.loc[mask, 'MessageType'] + f' ({change_type})',
+                AFTN_Change_Detail=detail_prefix + value, AFTN_Value=value, FPLA_Field=fpla_col,
+                FODC_Field=fodc_col, FPLA_Label=fpla_label, FODC_Label=fodc_label, IsTime=is_time))
+
+    # --- 3. CHG 未识别出核心字段变更 ---
+    checked_ids = pd.concat([c['EventId'] for c in checks]) if checks else pd.Series(dtype='int64')
+    other_chg = has_fpla & (events['MessageType'] == 'CHG') & ~events.index.isin(checked_ids)
+    result_frames.append(base[other_chg].assign(
+        Rank=0, AFTN_Event_Type='CHG (其他变更)', AFTN_Change_Detail='未识别出核心字段变更',
+        FPLA_vs_AFTN_Status='N/A', FPLA_vs_FODC_Status='N/A', Evidence='N/A'))
+
+    if checks:
+        checks_df = pd.concat(checks, ignore_index=True)
+        # FPLA 任一版本命中：与 (FlightKey, 字段, 规整值) 去重表合并；未命中回落到最新一版 FPLA 的值
+        checks_df = checks_df.merge(fpla_revisions, on=['FlightKey', 'FPLA_Field', 'AFTN_Value'], how='left')
+        checks_df = checks_df.merge(_melt_fields(latest_fpla, fpla_fields, 'FPLA_Latest').rename(
+            columns={'Field': 'FPLA_Field'}), on=['FlightKey', 'FPLA_Field'], how='left')
+        matched = checks_df['Matched'].eq(True)
+        fpla_value = checks_df['AFTN_Value'].where(matched, checks_df['FPLA_Latest'])
+
+        fodc_isna = _melt_fields(latest_fodc, [c + '_isna' for c in fodc_fields], 'FODC_IsNa')
+        fodc_isna['Field'] = fodc_isna['Field'].str[:-len('_isna')]
+        fodc_long = _melt_fields(latest_fodc, fodc_fields, 'FODC_Value').merge(fodc_isna, on=['FlightKey', 'Field'])
+        checks_df = checks_df.merge(fodc_long.rename(columns={'Field': 'FODC_Field'}),
+                                    on=['FlightKey', 'FODC_Field'], how='left')
+        has_fodc = checks_df['FlightKey'].isin(latest_fodc.index)
+        fodc_value = checks_df['FODC_Value'].where(has_fodc, '')
+
+        checks_df['FPLA_vs_AFTN_Status'] = np.where(matched, '一致', '不一致')
+        checks_df['FPLA_vs_FODC_Status'] = np.select(
+            [~has_fodc, checks_df['FODC_IsNa'].eq(True)], ['无FODC标杆', '无FODC数据'],
+            np.where(fpla_value == fodc_value, '一致', '不一致'))
+        # 无FODC记录时，原逻辑时刻字段佐证输出空串，其余字段输出 'None'
+        fodc_evidence = fodc_value.where(has_fodc | checks_df['IsTime'], 'None')
+        checks_df['Evidence'] = (checks_df['FPLA_Label'] + fpla_value.astype(str) + ', ' +
+                                 checks_df['FODC_Label'] + fodc_evidence.astype(str))
+        result_frames.append(checks_df)
+
+    dynamic_df = pd.concat([f[['EventId', 'Rank'] + DYNAMIC_REPORT_COLS] for f in result_frames], ignore_index=True)
+    dynamic_df = dynamic_df.sort_values(['EventId', 'Rank'], kind='mergesort')[DYNAMIC_REPORT_COLS]
+    return _rename_dynamic_report(dynamic_df.reset_index(drop=True))
+
+
+def _rename_dynamic_report(df):
+    df.columns = ['航班标识(FlightKey)', 'AFTN事件时间(AFTN_Event_Time)', 'AFTN事件类型(AFTN_Event_Type)',
+                  'AFTN变更明细(AFTN_Change_Detail)', 'FPLA vs AFTN 状态', 'FPLA vs FODC 状态', '数据源佐证(Evidence)']
+    return df
+
+
+# ==============================================================================
+# --- 4. 准确率统计 ---
+# ==============================================================================
+# 先在每条对比结果上算出布尔状态列，再按分组维度一次 groupby 求和得到全部计数。
+# 内置维度：航空公司 (FlightKey 中航班号的三字代码)、小时 (计划取AFTN离港时刻，动态取事件时间)、报文类型；
+# 其余维度 (机型/机号/目的机场) 从 accuracy_flight_attrs 生成的航班属性表中按 FlightKey 取值。
+ACCURACY_EVENT_TYPES = ['时刻变更', '机号变更', '航站变更', '机型变更', '航班号变更']
+ACCURACY_EVENT_PATTERN = '(' + '|'.join(ACCURACY_EVENT_TYPES) + ')'
+ACCURACY_FLIGHT_ATTR_COLS = {'CraftType': '机型', 'RegNo': '机号', 'ArrAirport': '目的机场'}
+ACCURACY_DIMENSIONS = ['航空公司', '小时', '报文类型'] + list(ACCURACY_FLIGHT_ATTR_COLS.values())
+ACCURACY_UNKNOWN = '未知'
+AIRLINE_FROM_FLIGHT_KEY_PATTERN = r'^[^_]*_([A-Z]{3})'
+PLAN_SOBT_HOUR_PATTERN = r' (\d{2}):'
+HOUR_LABELS = np.array([f'{hour:02d}' for hour in range(24)], dtype=object)
+
+
+def accuracy_flight_attrs(aftn_df):
+    """以每个航班最新一条AFTN报文为准的航班属性表 (FlightKey 索引，列为 机型/机号/目的机场)。"""
+    cols = [col for col in ACCURACY_FLIGHT_ATTR_COLS if col in aftn_df.columns]
+    latest = build_latest_record_index(aftn_df[['FlightKey', 'ReceiveTime'] + cols])
+    return latest.reindex(columns=cols).rename(columns=ACCURACY_FLIGHT_ATTR_COLS)
+
+
+def _accuracy_dimensions(report_df, is_plan, group_keys, flight_attrs):
+    """取出对比结果每一行的分组维度值，缺失记为 '未知'。"""
+    flight_keys = report_df['航班标识(FlightKey)'].astype(str)
+    dims = {}
+    for key in group_keys:
+        if key == '航空公司':
+            values = _extract_per_unique_body(flight_keys, AIRLINE_FROM_FLIGHT_KEY_PATTERN, 0)
+        elif key == '小时' and is_plan:
+            values = _extract_per_unique_body(report_df['AFTN-离港时间(FPL_SOBT_BJT)'], PLAN_SOBT_HOUR_PATTERN, 0)
+        elif key == '小时':
+            hours = pd.to_datetime(report_df['AFTN事件时间(AFTN_Event_Time)'], errors='coerce').dt.hour
+            values = pd.Series(HOUR_LABELS[hours.fillna(0).astype(int)], index=report_df.index).where(hours.notna())
+        elif key == '报文类型':
+            values = (pd.Series('FPL', index=report_df.index) if is_plan else
+                      _extract_per_unique_body(report_df['AFTN事件类型(AFTN_Event_Type)'], r'^(\w+)', 0))
+        elif flight_attrs is not None and key in flight_attrs.columns:
+            values = flight_keys.map(flight_attrs[key].astype(object))
+        else:
+            raise ValueError(f"不支持的分组维度: {key}")
+        dims[key] = values.astype(object).where(values.notna(), ACCURACY_UNKNOWN)
+    return pd.DataFrame(dims, index=report_df.index)
+
+
+def _plan_status(plan_report_df):
+    """计划对比结果 -> 每个航班的布尔状态列。"""
+    aftn_reg, aftn_sobt = plan_report_df['AFTN-机号(FPL_RegNo)'], plan_report_df['AFTN-离港时间(FPL_SOBT_BJT)']
+    fpla_reg, fpla_sobt = plan_report_df['FPLA-机号(FPLA_RegNo)'], plan_report_df['FPLA-离港时间(FPLA_SOBT)']
+    fodc_reg, fodc_sobt = plan_report_df['FODC-机号(FODC_RegNo)'], plan_report_df['FODC-离港时间(FODC_SOBT)']
+    fpla_found = fpla_reg != '无FPLA数据'
+    both_found = fpla_found & (fodc_reg != '无FODC数据')
+    status = pd.DataFrame({'total': True, 'fpla_found': fpla_found,
+                           'aftn_reg_ok': fpla_found & (aftn_reg == fpla_reg),
+                           'aftn_sobt_ok': fpla_found & (aftn_sobt == fpla_sobt), 'both_found': both_found,
+                           'fodc_reg_ok': both_found & (fpla_reg == fodc_reg),
+                           'fodc_sobt_ok': both_found & (fpla_sobt == fodc_sobt)}, index=plan_report_df.index)
+    status['aftn_ok'] = status['aftn_reg_ok'] & status['aftn_sobt_ok']
+    status['fodc_ok'] = status['fodc_reg_ok'] & status['fodc_sobt_ok']
+    return status
+
+
+def _dynamic_status(dynamic_report_df):
+    """动态对比结果 -> 每个事件的核心变更类别 (事件类型中含哪一种，无则为空) 与布尔状态列。"""
+    event = _extract_per_unique_body(dynamic_report_df['AFTN事件类型(AFTN_Event_Type)'], ACCURACY_EVENT_PATTERN, 0)
+    aftn_status, fodc_status = dynamic_report_df['FPLA vs AFTN 状态'], dynamic_report_df['FPLA vs FODC 状态']
+    fodc_base = fodc_status != '无FODC标杆'
+    return pd.DataFrame({'事件': event, 'total': True, 'fpla_found': aftn_status != '无FPLA数据',
+                         'aftn_ok': aftn_status == '一致', 'fodc_base': fodc_base,
+                         'fodc_ok': fodc_base & (fodc_status == '一致')}, index=dynamic_report_df.index)
+
+
+def _group_counts(status, by, count_cols):
+    """按 by (Series 列表) 对布尔状态列求和，返回以分组值为普通列的计数表；by 为空时返回单行总计。"""
+    if not by: return status[count_cols].sum().to_frame().T.astype('int64')
+    counts = status[count_cols].groupby(by, sort=True, dropna=False).sum().astype('int64')
+    return counts.reset_index()
+
+
+def _percent(numerator, denominator):
+    return (numerator / denominator * 100).map('{:.2f}%'.format).astype(object)
+
+
+def _stat_rows(counts, key_cols, items, columns):
+    """
+    计数表 -> 统计表。items 为 [(各列取值, 是否输出), ...]，取值可为标量或与 counts 对齐的 Series。
+    每组按 items 顺序输出，组间保持 counts 的顺序，分组维度列在最前。
+    列类型与逐行构建 DataFrame 时相同：只输出了计数行时取值列为整数列，含比例文本时为 object 列。
+    """
+    group_order = np.arange(len(counts))
+    frames = []
+    for item_order, (values, show) in enumerate(items):
+        frame = counts[key_cols].assign(**values, _group=group_order, _item=item_order)
+        frames.append(frame[np.broadcast_to(np.asarray(show, dtype=bool), len(counts))])
+    rows = pd.concat(frames, ignore_index=True).sort_values(['_group', '_item'], kind='mergesort')
+    return rows[key_cols + columns].reset_index(drop=True).infer_objects()
+
+
+def _plan_stats(counts, key_cols):
+    total, fpla_found, both_found = counts['total'], counts['fpla_found'], counts['both_found']
+    plan_cols = ['分类', '统计项', '数量/比例', '备注']
+
+    def row(category, item, value, note=''):
+        return {'分类': category, '统计项': item, '数量/比例': value, '备注': note}
+
+    plan_aftn = _stat_rows(counts, key_cols, [
+        (row('匹配度', '总计划航班数 (AFTN FPL)', total, '以当天AFTN FPL报文为基准'), True),
+        (row('匹配度', 'FPLA 匹配航班数', fpla_found, '在FPLA数据中能找到对应航班的数量'), True),
+        (row('匹配度', 'FPLA 匹配率', _percent(fpla_found, total).where(total > 0, '0.00%'),
+             'FPLA匹配数 / 总计划航班数'), True),
+        (row('准确度', '(对比基数：FPLA匹配的航班)', fpla_found), fpla_found > 0),
+        (row('准确度', '机号一致数', counts['aftn_reg_ok']), fpla_found > 0),
+        (row('准确度', '时刻一致数', counts['aftn_sobt_ok']), fpla_found > 0),
+        (row('准确度', '综合一致数', counts['aftn_ok'], '机号和时刻均一致的数量'), fpla_found > 0),
+        (row('准确度', '综合准确率', _percent(counts['aftn_ok'], fpla_found), '综合一致数 / FPLA匹配航班数'),
+         fpla_found > 0),
+    ], plan_cols)
+    plan_fodc = _stat_rows(counts, key_cols, [
+        (row('匹配度', 'FPLA与FODC均存在的计划航班数', both_found, '作为对比基准'), True),
+        (row('准确度', '机号一致数', counts['fodc_reg_ok']), both_found > 0),
+        (row('准确度', '时刻一致数', counts['fodc_sobt_ok']), both_found > 0),
+        (row('准确度', '综合一致数', counts['fodc_ok'], '机号和时刻均一致的数量'), both_found > 0),
+        (row('准确度', '综合准确率', _percent(counts['fodc_ok'], both_found), '综合一致数 / FPLA与FODC均匹配数'),
+         both_found > 0),
+    ], plan_cols)
+    return plan_aftn, plan_fodc
+
+
+def _dynamic_stats(status, dims, group_keys):
+    # 一次按 (分组维度, 核心变更类别) 求和，'总计' 由同一结果再按分组维度汇总
+    count_cols = ['total', 'fpla_found', 'aftn_ok', 'fodc_base', 'fodc_ok']
+    by_event = _group_counts(status, [dims[key] for key in group_keys] + [status['事件']], count_cols)
+    totals = (by_event.groupby(group_keys, sort=False)[count_cols].sum().reset_index() if group_keys else
+              by_event[count_cols].sum().to_frame().T.astype('int64'))
+    counts = pd.concat([totals.assign(事件='总计'), by_event.dropna(subset=['事件'])], ignore_index=True)
+    counts['事件'] = pd.Categorical(counts['事件'], categories=['总计'] + ACCURACY_EVENT_TYPES, ordered=True)
+    counts = counts.sort_values(group_keys + ['事件'], kind='mergesort').reset_index(drop=True)
+    key_cols = group_keys + ['事件类型']
+    counts['事件类型'] = counts['事件'].astype(object)
+
+    is_total = counts['事件类型'] == '总计'
+    total, matched, accurate = counts['total'], counts['fpla_found'], counts['aftn_ok']
+    fodc_base, fodc_accurate = counts['fodc_base'], counts['fodc_ok']
+    ratio = lambda num, den: _percent(num, den) + ' (' + num.astype(str) + '/' + den.astype(str) + ')'
+    row = lambda item, value: {'统计项': item, '数值': value}
+    dyn_aftn = _stat_rows(counts, key_cols, [
+        (row('AFTN事件数', total), total > 0),
+        (row('FPLA匹配数', matched), total > 0),
+        (row('FPLA匹配率', _percent(matched, total)), is_total & (total > 0)),
+        (row('综合准确事件数', accurate), is_total & (total > 0)),
+        (row('准确率', ratio(accurate, matched)), (total > 0) & (matched > 0)),
+    ], ['统计项', '数值'])
+    dyn_fodc = _stat_rows(counts, key_cols, [
+        (row('FODC存在标杆数', fodc_base), fodc_base > 0),
+        (row('综合准确事件数', fodc_accurate), is_total & (fodc_base > 0)),
+        (row('准确率', ratio(fodc_accurate, fodc_base)), fodc_base > 0),
+    ], ['统计项', '数值'])
+    return dyn_aftn, dyn_fodc
+
+
+def calculate_accuracy(plan_report_df, dynamic_report_df, group_keys=None, flight_attrs=None):
+    """
+    计划/动态准确率统计，返回 (计划-FPLA vs AFTN, 计划-FPLA vs FODC, 动态-FPLA vs AFTN, 动态-FPLA vs FODC)。
+    group_keys 为分组维度列表 (见 ACCURACY_DIMENSIONS；机型/机号/目的机场需传入 accuracy_flight_attrs 的结果)，
+    给出时四张表按维度分组输出、维度列在最前，所有分组由同一次 groupby 得到；缺省为全量统计。
+    """
+    group_keys = list(group_keys or [])
+    plan_status = _plan_status(plan_report_df)
+    plan_dims = _accuracy_dimensions(plan_report_df, True, group_keys, flight_attrs)
+    plan_counts = _group_counts(plan_status, [plan_dims[key] for key in group_keys], list(plan_status.columns))
+    plan_aftn_stats_df, plan_fodc_stats_df = _plan_stats(plan_counts, group_keys)
+
+    dyn_status = _dynamic_status(dynamic_report_df)
+    dyn_dims = _accuracy_dimensions(dynamic_report_df, False, group_keys, flight_attrs)
+    dyn_aftn_stats_df, dyn_fodc_stats_df = _dynamic_stats(dyn_status, dyn_dims, group_keys)
+    return plan_aftn_stats_df, plan_fodc_stats_df, dyn_aftn_stats_df, dyn_fodc_stats_df
+
+
+# ==============================================================================
+# --- 5. 报告输出 ---
+# ==============================================================================
+# FPLA 导出文件中文列名 -> 内部字段名
+FPLA_COLUMN_MAP = {"全球唯一飞行标识符": "GUFI", "航空器识别标志": "CALLSIGN", "共享单位航班标识符": "UNITUFI",
+                   "航空器注册号": "REGNUMBER", "航空器地址码": "ADDRESSCODE", "计划离港时间": "SOBT",
+                   "计划到港时间": "SIBT", "计划起飞机场": "DEPAP", "计划目的地机场": "ARRAP",
+                   "机场保障计划离港时间": "APTSOBT", "机场保障计划到港时间": "APTSIBT",
+                   "机场保障计划起飞机场": "APTDEPAP", "机场保障计划目的地机场": "APTARRAP",
+                   "执飞航空器注册号": "EREGNUMBER", "执飞航空器地址码": "EADDRESSCODE",
+                   "预执行航班取消原因": "PCNLREASON", "预执行航班延误原因": "PDELAYREASON",
+                   "预执行任务性质": "PMISSIONPROPERTY", "预执行客货属性": "PGJ",
+                   "预执行计划机型": "PSAIRCRAFTTYPE", "预执行航线属性": "LIFLAG",
+                   "预执行计划状态": "PSCHEDULESTATUS", "预执行航段": "PFLIGHTLAG",
+                   "预执行共享航班号": "PSHAREFLIGHTNO", "预执行计划种类": "PMISSIONTYPE", "计划航路": "SROUTE",
+                   "消息发送时间": "SENDTIME", "格式校验结果": "FORMATCHECKRESULT",
+                   "逻辑校验结果": "LOGICCHECKRESULT", "及时性校验结果": "ISTIMELY", "校验结论": "ALLCHECKRESULT"}
+
+REPORT_SHEETS = [('计划对比详情', '计划对比详情'), ('动态对比详情', '动态对比详情'),
+                 ('计划-FPLA vs AFTN', '计划准确率(vs AFTN)统计'), ('计划-FPLA vs FODC', '计划准确率(vs FODC)统计'),
+                 ('动态-FPLA vs AFTN', '动态准确率(vs AFTN)统计'), ('动态-FPLA vs FODC', '动态准确率(vs FODC)统计')]
+# 指定分组维度时追加的分组准确率 Sheet，顺序与 calculate_accuracy 的返回值一致
+BREAKDOWN_SHEETS = [('计划-FPLA vs AFTN 分组', '计划准确率(vs AFTN)分组统计'),
+                    ('计划-FPLA vs FODC 分组', '计划准确率(vs FODC)分组统计'),
+                    ('动态-FPLA vs AFTN 分组', '动态准确率(vs AFTN)分组统计'),
+                    ('动态-FPLA vs FODC 分组', '动态准确率(vs FODC)分组统计')]
+
+
+def run_comparison_reports(aftn_df, fpla_plan_df, fpla_dynamic_df, fodc_plan_df, fodc_dynamic_df, target_date_obj,
+                           profiler=None, breakdown_keys=None):
+    """
+    两阶段对比 + 准确率统计，返回按报告 Sheet 顺序排列的 {Sheet名: DataFrame}。
+    各输入表的 ReceiveTime 会被原地转换为 datetime。传入 stage_profiler.StageProfiler 时分别记录三个阶段。
+    breakdown_keys 为分组维度列表 (见 ACCURACY_DIMENSIONS)，给出时在同一次对比结果上追加 BREAKDOWN_SHEETS 四张分组统计。
+    """
+    for df in [aftn_df, fpla_plan_df, fpla_dynamic_df, fodc_plan_df, fodc_dynamic_df]:
+        if 'ReceiveTime' in df.columns: df['ReceiveTime'] = pd.to_datetime(df['ReceiveTime'], errors='coerce')
+
+    with profile_stage(profiler, '计划对比', len(aftn_df) + len(fpla_plan_df) + len(fodc_plan_df)) as stage:
+        plan_report_df = run_plan_comparison(aftn_df, fpla_plan_df, fodc_plan_df, target_date_obj)
+        stage['rows_out'] = len(plan_report_df)
+    with profile_stage(profiler, '动态对比', len(aftn_df) + len(fpla_dynamic_df) + len(fodc_dynamic_df)) as stage:
+        dynamic_report_df = run_dynamic_comparison(aftn_df, fpla_dynamic_df, fodc_dynamic_df, target_date_obj)
+        stage['rows_out'] = len(dynamic_report_df)
+    with profile_stage(profiler, '准确率统计', len(plan_report_df) + len(dynamic_report_df)) as stage:
+        stats = calculate_accuracy(plan_report_df, dynamic_report_df)
+        breakdown = calculate_accuracy(plan_report_df, dynamic_report_df, breakdown_keys,
+                                       accuracy_flight_attrs(aftn_df)) if breakdown_keys else ()
+        stage['rows_out'] = sum(len(df) for df in list(stats) + list(breakdown))
+    report_dfs = [plan_report_df, dynamic_report_df] + list(stats)
+    reports = {sheet_name: df for (sheet_name, _), df in zip(REPORT_SHEETS, report_dfs)}
+    reports.update({sheet_name: df for (sheet_name, _), df in zip(BREAKDOWN_SHEETS, breakdown)})
+    return reports
+
+
+def write_report_workbook(output_file, reports, log_callback=print, sidecar_formats=()):
+    """
+    把 run_comparison_reports 的结果写入Excel (constant_memory 逐行写出)，空表跳过，每写完一个Sheet回调一次日志。
+    sidecar_formats 可含 'csv' / 'parquet'，在工作簿旁为每个Sheet额外输出同名文件。
+    """
+    sheet_list = REPORT_SHEETS + [sheet for sheet in BREAKDOWN_SHEETS if sheet[0] in reports]
+    sheets = [(sheet_name, reports.get(sheet_name), f"√ [Sheet {i}] {label}已生成")
+              for i, (sheet_name, label) in enumerate(sheet_list, 1)]
+    write_workbook(output_file, sheets, log_callback)
+    if sidecar_formats:
+        written = write_sidecars(output_file, [(sheet_name, df) for sheet_name, df, _ in sheets], sidecar_formats)
+        log_callback(f"√ 已输出 {len(written)} 个 {'/'.join(sidecar_formats)} 文件")
+
+
+def summarize_reports(reports):
+    """从 run_comparison_reports 的结果中摘出汇总用的关键指标 (计划/动态的匹配率与准确率)。"""
+    def stat_value(stats_df, key_col, key, item, value_col):
+        if stats_df.empty: return None
+        hit = stats_df[(stats_df[key_col] == key) & (stats_df['统计项'] == item)]
+        return hit[value_col].iloc[0] if not hit.empty else None
+
+    plan_aftn, plan_fodc = reports['计划-FPLA vs AFTN'], reports['计划-FPLA vs FODC']
+    dyn_aftn, dyn_fodc = reports['动态-FPLA vs AFTN'], reports['动态-FPLA vs FODC']
+    return {'计划航班数': len(reports['计划对比详情']),
+            'FPLA匹配率': stat_value(plan_aftn, '分类', '匹配度', 'FPLA 匹配率', '数量/比例'),
+            '计划综合准确率(vs AFTN)': stat_value(plan_aftn, '分类', '准确度', '综合准确率', '数量/比例'),
+            '计划综合准确率(vs FODC)': stat_value(plan_fodc, '分类', '准确度', '综合准确率', '数量/比例'),
+            '动态事件数': len(reports['动态对比详情']),
+            '动态准确率(vs AFTN)': stat_value(dyn_aftn, '事件类型', '总计', '准确率', '数值'),
+            '动态准确率(vs FODC)': stat_value(dyn_fodc, '事件类型', '总计', '准确率', '数值')}
+
+
+def raw_input_files(raw_dir, airport, target_date):
+    """按导出文件命名约定返回 (FPLA, FODC) 原始Excel路径。"""
+    start_str = target_date.strftime('%Y%m%d')
+    end_str = (target_date + timedelta(days=1)).strftime('%Y%m%d')
+    fpla_file = os.path.join(raw_dir, f'FPLA-Details-{airport}-{start_str}000000-{end_str}000000.xlsx')
+    fodc_file = os.path.join(raw_dir, f'FODC-Details-{airport}-{start_str}000000-{end_str}000000.xlsx')
+    return fpla_file, fodc_file
@@ -0,0 +1,183 @@
+"""
+Excel 导出文件的读取缓存 (CMP_V3 与 航班统计 共用本模块)。
+FPLA/FODC 的 xlsx 用 openpyxl 解析很慢，而同一天的数据往往会反复分析。
+首次读取后在源文件旁的 .excel_cache 目录写入一份 Parquet (含列类型) 缓存，
+缓存键为 文件路径 + 大小 + 修改时间 + 读取参数，源文件变化后自动失效。
+
+Parquet 无法原样保存 object 列中的 NaN (读回为 None) 和混合类型 (如数字与文本混排的机号列)，
+写入前按列规整 (_encode_object_columns)，读回时按文件元数据还原，读出的数据与 read_excel 完全相同；
+仍无法原样保存的表不写缓存，只使用 Parquet，不读取 pickle 文件。
+"""
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装 pyarrow 时不缓存，直接读取 Excel
+    pa = pq = None
+
+CACHE_DIR_NAME = '.excel_cache'
+CACHE_VERSION = 3  # 缓存格式变化时递增，旧缓存随之失效
+CACHE_METADATA_KEY = b'excel_cache'
+LEGACY_CACHE_PATTERN = r'\.[0-9a-f]{16}\.(?:parquet|pkl)'  # 旧版本 (单一缓存键) 的缓存文件名后缀
+
+
+def _digest(*parts):
+    key_source = json.dumps(parts, default=str, ensure_ascii=False)
+    return hashlib.sha1(key_source.encode('utf-8')).hexdigest()[:16]
+
+
+def _cache_paths(path, read_kwargs):
+    """
+    返回 (缓存目录, 源文件名, 同一读取方式的缓存文件名前缀, 缓存文件)。文件名为 源文件名.读取方式.文件状态.parquet：
+    读取方式 = 路径 + 读取参数，文件状态 = 格式版本 + 大小 + 修改时间，源文件变化后只替换同一读取方式的缓存。
+    """
+    abs_path = os.path.abspath(path)
+    stat = os.stat(path)
+    cache_dir = os.path.join(os.path.dirname(abs_path), CACHE_DIR_NAME)
+    stem = os.path.basename(path)
+    prefix = f"{stem}.{_digest(abs_path, sorted(read_kwargs.items()))}."
+    cache_file = prefix + _digest(CACHE_VERSION, stat.st_size, stat.st_mtime_ns) + '.parquet'
+    return cache_dir, stem, prefix, os.path.join(cache_dir, cache_file)
+
+
+# ==============================================================================
+# --- 1. object 列规整与还原 ---
+# ==============================================================================
+# 混合类型列逐值保存为 "类型标记:文本"，NaN 保存为 Parquet 空值
+_VALUE_TAGS = {str: 's', bool: 'b', int: 'i', float: 'f', pd.Timestamp: 'T', datetime: 'd', time: 't'}
+_TAG_PARSERS = {'s': str, 'b': lambda text: text == '1', 'i': int, 'f': float, 'T': pd.Timestamp,
+                'd': datetime.fromisoformat, 't': time.fromisoformat, 'n': lambda text: None}
+
+
+def _tag_value(value):
+    if value is None: return 'n:'
+    tag = _VALUE_TAGS.get(type(value))
+    if tag is None: raise TypeError(f"无法缓存的取值类型: {type(value).__name__}")
+    if tag == 'b': return 'b:' + str(int(value))
+    if tag == 'f': return 'f:' + repr(value)
+    if tag in ('T', 'd', 't'): return f"{tag}:{value.isoformat()}"
+    return f"{tag}:{value}"
+
+
+def _untag_value(text):
+    tag, _, value = text.partition(':')
+    return _TAG_PARSERS[tag](value)
+
+
+def _is_nan(value):
+    return isinstance(value, float) and value != value
+
+
+def _encode_object_columns(df):
+    """
+    返回 (可写入 Parquet 的表, {列名: 规整方式})。只含文本与 NaN 的列 ('text') 原样写入，读回时空值还原为 NaN；
+    其余 object 列 ('tagged') 逐值写为 "类型标记:文本" (逐值转换：按去重值会把 True 与 1、1 与 1.0 合并)。
+    """
+    encoded, modes = df.copy(deep=False), {}
+    for col in df.columns[df.dtypes == object]:
+        series = df[col]
+        codes, uniques = pd.factorize(series)
+        nulls = series[codes < 0]
+        if all(type(value) is str for value in uniques) and all(_is_nan(value) for value in nulls):
+            modes[col] = 'text'
+            continue
+        encoded[col] = [None if _is_nan(value) else _tag_value(value) for value in series]
+        modes[col] = 'tagged'
+    return encoded, modes
+
+
+def _decode_object_columns(df, modes):
+    for col, mode in modes.items():
+        series = df[col]
+        if mode == 'text':
+            df[col] = series.astype(object).where(series.notna(), np.nan)
+            continue
+        codes, uniques = pd.factorize(series)
+        values = np.empty(len(uniques) + 1, dtype=object)
+        values[:-1] = [_untag_value(text) for text in uniques]
+        values[-1] = np.nan
+        df[col] = values[codes]
+    return df
+
+
+def _same_frame(left, right):
+    """
+    比 DataFrame.equals 更严格：object 列中各值的类型也须一致 (如 None 与 NaN 视为不同)。
+    两者的真值不同 (NaN 为真、None 为假)，会改变 `a or b` 之类取值逻辑的结果。
+    """
+    if not left.equals(right) or not left.columns.equals(right.columns): return False
+    for col in left.columns[left.dtypes == object]:
+        if not left[col].map(type).equals(right[col].map(type)): return False
+    return True
+
+
+# ==============================================================================
+# --- 2. 缓存读写 ---
+# ==============================================================================
+def _read_cache(cache_path):
+    table = pq.read_table(cache_path)
+    modes = json.loads((table.schema.metadata or {}).get(CACHE_METADATA_KEY, b'{}'))
+    return _decode_object_columns(table.to_pandas(), modes)
+
+
+def _remove_stale(cache_dir, stem, prefix, cache_path):
+    """清理同一源文件、同一读取参数的旧缓存 (大小或修改时间已变化)，以及旧版本格式的缓存；其他读取参数的缓存保留。"""
+    legacy = re.compile(re.escape(stem) + LEGACY_CACHE_PATTERN)
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if path != cache_path and (name.startswith(prefix) or legacy.fullmatch(name)): os.remove(path)
+
+
+def _write_cache(df, cache_dir, stem, prefix, cache_path):
+    """
+    规整 object 列后写入 Parquet (先写临时文件再替换，并行任务不会读到写了一半的缓存)，回读校验与原表完全相同。
+    非字符串列名、无法规整的取值类型等无法原样保存的情况不写缓存，返回 None。
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    _remove_stale(cache_dir, stem, prefix, cache_path)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        encoded, modes = _encode_object_columns(df)
+        table = pa.Table.from_pandas(encoded)
+        metadata = {**(table.schema.metadata or {}), CACHE_METADATA_KEY: json.dumps(modes, ensure_ascii=False)}
+        pq.write_table(table.replace_schema_metadata(metadata), temp_path)
+        if not _same_frame(df, _read_cache(temp_path)):
+            os.remove(temp_path)
+            return None
+        os.replace(temp_path, cache_path)
+        return cache_path
+    except (ValueError, TypeError, pa.ArrowException):
+        if os.path.exists(temp_path): os.remove(temp_path)
+        return None
+
+
+def read_excel_cached(path, refresh=False, log_callback=None, **read_kwargs):
+    """
+    带缓存的 pd.read_excel。refresh=True 时忽略已有缓存并重新读取 Excel。
+    缓存目录不可写、缓存文件损坏或未安装 pyarrow 时退回到直接读取，不影响分析流程。
+    """
+    log = log_callback or (lambda message: None)
+    if pq is None: return pd.read_excel(path, **read_kwargs)
+    cache_dir, stem, prefix, cache_path = _cache_paths(path, read_kwargs)
+    if not refresh and os.path.exists(cache_path):
+        try:
+            df = _read_cache(cache_path)
+            log(f"使用缓存: {os.path.basename(path)}")
+            return df
+        except (OSError, ValueError, KeyError, pa.ArrowException) as e:
+            log(f"警告: 缓存文件无法读取 ({e})，重新读取Excel。")
+
+    df = pd.read_excel(path, **read_kwargs)
+    try:
+        _write_cache(df, cache_dir, stem, prefix, cache_path)
+    except OSError as e:
+        log(f"警告: 无法写入缓存 ({e})，本次直接使用Excel数据。")
+    return df
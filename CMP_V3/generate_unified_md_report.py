@@ -1,7 +1,13 @@
+import html
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
+import numpy as np
 import pandas as pd
-from datetime import datetime
+
+from core import AIRLINE_FROM_FLIGHT_KEY_PATTERN
 
 # ==============================================================================
 # --- 1. 配置区 ---
@@ -11,44 +17,69 @@ AFTN_ANALYSIS_FILE = f'analysis_aftn_data_{TARGET_DATE_STR}.csv'
 FPLA_ANALYSIS_FILE = f'analysis_fpla_data_{TARGET_DATE_STR}.csv'
 MD_REPORT_FILE = f'unified_flight_timeline_report_{TARGET_DATE_STR}.md'
 FLIGHTS_TO_ANALYZE = -1
+MD_RENDER_WORKERS = os.cpu_count()  # 渲染进程数，1 为单进程
+MD_FLIGHTS_PER_CHUNK = 200  # 每个渲染任务包含的航班数
+MD_WRITE_BUFFER_SIZE = 1 << 20
+MD_SHARD_BUFFER_SIZE = 1 << 16  # 按航空公司分片时可能同时打开数十个文件，单个缓冲取小一些
+MD_SHARD_MODE = None  # None 单个文件；'count' 按航班顺序均分为 MD_SHARD_COUNT 份；'airline' 每个航空公司一个文件
+MD_SHARD_COUNT = 10
+MD_OUTPUT_FORMATS = ('md',)  # 可加 'html'：与 Markdown 同名的 .html，各航班时间轴展开时才渲染
+FPL_EOBT_PATTERN = re.compile(r'-\w{4}(\d{4})\s')
+HTML_PRE_PATTERN = re.compile(r'```(.*?)```', re.DOTALL)
+HTML_CODE_PATTERN = re.compile(r'`([^`]*)`')
+HTML_BOLD_PATTERN = re.compile(r'\*\*(.*?)\*\*')
+HTML_STYLE = ('body{font-family:sans-serif;margin:1em 2em}table{border-collapse:collapse}'
+              'td,th{border:1px solid #ccc;padding:2px 6px;vertical-align:top}summary{cursor:pointer;padding:2px 0}'
+              '.count{color:#888;font-size:90%}code.raw{white-space:pre-wrap}#search{margin:0.5em 0;width:24em}')
+# 航班小节：展开时实例化 <template> 中的表格；地址带 #f编号 时自动展开并定位；搜索框按摘要行筛选
+HTML_SECTION_SCRIPT = (
+    "function load(d){if(!d.dataset.loaded){d.appendChild(d.querySelector('template').content.cloneNode(true));"
+    "d.dataset.loaded=1}}"
+    "document.addEventListener('toggle',e=>{if(e.target.open)load(e.target)},true);"
+    "function jump(){const d=document.getElementById(location.hash.slice(1));"
+    "if(d&&d.tagName==='DETAILS'){d.open=true;load(d);d.scrollIntoView()}}"
+    "window.addEventListener('hashchange',jump);jump();"
+    "document.getElementById('search').addEventListener('input',e=>{const q=e.target.value.trim().toUpperCase();"
+    "for(const d of document.querySelectorAll('details'))"
+    "d.hidden=q!==''&&!d.querySelector('summary').textContent.toUpperCase().includes(q)});")
+HTML_INDEX_SCRIPT = (
+    "document.getElementById('search').addEventListener('input',e=>{const q=e.target.value.trim().toUpperCase();"
+    "for(const r of document.querySelectorAll('#index tr:not(:first-child)'))"
+    "r.hidden=q!==''&&!r.textContent.toUpperCase().includes(q)});")
 
 
 # ==============================================================================
 # --- 2. 辅助格式化函数 (核心修正！) ---
 # ==============================================================================
 
+def format_fpla_hhmm(value):
+    """FPLA 的 SOBT/SIBT (yyyymmddHHMM 或带秒，读入后可能是浮点数) -> 'HH:MM'，缺失或无法解析时为 '----'。"""
+    if pd.isna(value): return "----"
+    try:
+        value_str = str(int(float(value)))
+    except (TypeError, ValueError, OverflowError):
+        return "----"
+    dt = pd.to_datetime(value_str, format='%Y%m%d%H%M', errors='coerce')
+    if pd.isna(dt): dt = pd.to_datetime(value_str, format='%Y%m%d%H%M%S', errors='coerce')
+    return dt.strftime('%H:%M') if pd.notna(dt) else "----"
+
+
+def format_fpla_hhmm_series(series):
+    """整列版 format_fpla_hhmm：同一个时刻值只解析一次 (FPLA 各版本的 SOBT/SIBT 大多重复)。"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    formatted = np.array([format_fpla_hhmm(value) for value in uniques], dtype=object)
+    return pd.Series(formatted[codes], index=series.index)
+
+
 def format_fpla_info(row):
-    """【V4修正版】格式化FPLA行的核心信息，补全起降机场"""
+    """【V4修正版】格式化FPLA行的核心信息，补全起降机场。行中已有 SOBT_HHMM/SIBT_HHMM (预先整列格式化) 时直接使用"""
     parts = []
 
     # 航站与时刻信息
     dep_ap = row.get('DepAirport', 'N/A')
     arr_ap = row.get('ArrAirport', 'N/A')
-
-    sobt_str = "----"
-    sibt_str = "----"
-
-    if pd.notna(row.get('SOBT')):
-        try:
-            sobt_val_str = str(int(float(row['SOBT'])))
-            sobt_dt = pd.to_datetime(sobt_val_str, format='%Y%m%d%H%M', errors='coerce')
-            if pd.isna(sobt_dt):
-                sobt_dt = pd.to_datetime(sobt_val_str, format='%Y%m%d%H%M%S', errors='coerce')
-            if pd.notna(sobt_dt):
-                sobt_str = sobt_dt.strftime('%H:%M')
-        except:
-            pass
-
-    if pd.notna(row.get('SIBT')):
-        try:
-            sibt_val_str = str(int(float(row['SIBT'])))
-            sibt_dt = pd.to_datetime(sibt_val_str, format='%Y%m%d%H%M', errors='coerce')
-            if pd.isna(sibt_dt):
-                sibt_dt = pd.to_datetime(sibt_val_str, format='%Y%m%d%H%M%S', errors='coerce')
-            if pd.notna(sibt_dt):
-                sibt_str = sibt_dt.strftime('%H:%M')
-        except:
-            pass
+    sobt_str = row['SOBT_HHMM'] if 'SOBT_HHMM' in row else format_fpla_hhmm(row.get('SOBT'))
+    sibt_str = row['SIBT_HHMM'] if 'SIBT_HHMM' in row else format_fpla_hhmm(row.get('SIBT'))
 
     parts.append(f"**航程**: `{dep_ap}` -> `{arr_ap}`")
     parts.append(f"**时刻 (SOBT-SIBT)**: `{sobt_str}` - `{sibt_str}`")
@@ -68,6 +99,12 @@ def format_fpla_info(row):
     return ' <br> '.join(parts) if parts else "No detailed info"
 
 
+def raw_message_text(row):
+    """报文原文 (时间轴中 RawMessage 为分类列，即去重后的报文库)；只有解析EOBT或回退展示原文时才会用到。"""
+    raw_msg = row.get('RawMessage')
+    return str(raw_msg) if pd.notna(raw_msg) else ''
+
+
 def format_aftn_info(row):
     """【V4版】格式化AFTN行的核心信息，保持与上一版一致"""
     parts = []
@@ -75,7 +112,7 @@ def format_aftn_info(row):
 
     if msg_type == 'FPL':
         if pd.notna(row.get('RegNo')): parts.append(f"**机号 (REG)**: `{row['RegNo']}`")
-        match = re.search(r'-\w{4}(\d{4})\s', row.get('RawMessage', ''))
+        match = FPL_EOBT_PATTERN.search(raw_message_text(row))
         if match: parts.append(f"**计划时刻 (EOBT)**: `{match.group(1)}`")
         if pd.notna(row.get('DepAirport')): parts.append(f"**起飞 (DEP)**: `{row.get('DepAirport')}`")
         if pd.notna(row.get('ArrAirport')): parts.append(f"**目的地 (DEST)**: `{row['ArrAirport']}`")
@@ -103,34 +140,256 @@ def format_aftn_info(row):
             parts.append(f"**任务变更 (STS)**: `{row['New_Mission_STS']}`")
 
     if not parts:
-        raw_msg = str(row.get('RawMessage', ''))
+        raw_msg = raw_message_text(row)
         return f"```{raw_msg[:120].strip()}...```" if len(raw_msg) > 120 else f"```{raw_msg.strip()}```"
 
     return ' <br> '.join(parts)
 
 
-def generate_unified_report():
-    """主函数"""
-    print("--- 开始生成航班动态时间轴分析报告 (V4 - 完整信息修正版) ---")
-
-    try:
-        aftn_df = pd.read_csv(AFTN_ANALYSIS_FILE, low_memory=False)
-        fpla_df = pd.read_csv(FPLA_ANALYSIS_FILE, low_memory=False)
-    except FileNotFoundError as e:
-        print(f"错误: 找不到输入文件。\n详细错误: {e}");
-        return
-
+# ==============================================================================
+# --- 3. 时间轴准备与分块渲染 ---
+# ==============================================================================
+def build_timeline(aftn_df, fpla_df):
+    """
+    合并 AFTN/FPLA 为按 (航班, 接收时间) 排序的时间轴，并一次性整列生成表格用到的文本列：
+    No (合并后的原始行号 + 1)、ReceiveTimeText、MsgTypeText，以及 FPLA 的 SOBT_HHMM/SIBT_HHMM。
+    """
+    # 报文原文以分类列存放 (categories 即去重后的报文库)，时间轴各行只引用报文库中的同一个字符串对象
+    if 'RawMessage' in aftn_df.columns: aftn_df['RawMessage'] = aftn_df['RawMessage'].astype('category')
     aftn_df['Source'] = 'AFTN'
     fpla_df['Source'] = 'FPLA'
     fpla_df.rename(columns={'MessageType': 'FPLA_Status'}, inplace=True)
+    for col in ['SOBT', 'SIBT']:
+        fpla_df[col + '_HHMM'] = format_fpla_hhmm_series(fpla_df[col]) if col in fpla_df.columns else "----"
 
     for df in [aftn_df, fpla_df]:
         df['ReceiveTime'] = pd.to_datetime(df['ReceiveTime'], errors='coerce')
 
     timeline_df = pd.concat([aftn_df, fpla_df], ignore_index=True)
+    timeline_df['No'] = timeline_df.index + 1
     timeline_df.dropna(subset=['ReceiveTime', 'FlightKey'], inplace=True)
     timeline_df.sort_values(by=['FlightKey', 'ReceiveTime'], inplace=True)
 
+    timeline_df['ReceiveTimeText'] = timeline_df['ReceiveTime'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    is_aftn = timeline_df['Source'] == 'AFTN'
+    aftn_type = timeline_df['MessageType'].astype(object) if 'MessageType' in timeline_df.columns else ''
+    fpla_type = timeline_df['FPLA_Status'] if 'FPLA_Status' in timeline_df.columns else ''
+    timeline_df['MsgTypeText'] = np.where(is_aftn, aftn_type, fpla_type)
+    return timeline_df
+
+
+def _row_info(row):
+    return format_aftn_info(row) if row['Source'] == 'AFTN' else format_fpla_info(row)
+
+
+def render_flight_section(number, flight_key, rows, infos=None, anchor=False):
+    """
+    单个航班的 Markdown 小节 (标题 + 时间轴表格)，rows 为该航班按时间排序的记录 (dict)，infos 为各行已格式化的核心信息。
+    anchor 为 True 时在标题前加 <a id="f编号">，供分片输出的索引页跳转。
+    """
+    if infos is None: infos = [_row_info(row) for row in rows]
+    lines = [f'<a id="f{number}"></a>\n\n' if anchor else '',
+             f"## {number}. 航班: `{flight_key}`\n\n",
+             "| No. | Source | ReceiveTime (UTC) | Message Type | Core Business Information |\n",
+             "|:---:|:------:|:------------------|:-------------|:--------------------------|\n"]
+    for row, info in zip(rows, infos):
+        lines.append(f"| {row['No']} | **{row['Source']}** | {row['ReceiveTimeText']} | `{row['MsgTypeText']}` | {info} |\n")
+    lines.append("\n---\n\n")
+    return ''.join(lines)
+
+
+def markdown_info_to_html(info):
+    """核心信息中的 Markdown 片段 (```原文```、`代码`、**加粗**、<br>) 转为 HTML，其余内容转义。"""
+    text = html.escape(info, quote=False).replace('&lt;br&gt;', '<br>')
+    text = HTML_PRE_PATTERN.sub(r'<code class="raw">\1</code>', text)
+    text = HTML_CODE_PATTERN.sub(r'<code>\1</code>', text)
+    return HTML_BOLD_PATTERN.sub(r'<b>\1</b>', text)
+
+
+def render_flight_section_html(number, flight_key, rows, infos, aftn_count, fpla_count):
+    """
+    单个航班的 HTML 小节：<details> 的摘要行只含航班号与消息数，时间轴表格放在 <template> 中，
+    浏览器加载页面时不渲染，展开时才由页面脚本实例化。
+    """
+    lines = [f'<details id="f{number}"><summary>{number}. <code>{html.escape(flight_key)}</code> '
+             f'<span class="count">AFTN {aftn_count} / FPLA {fpla_count}</span></summary><template>'
+             '<table><tr><th>No.</th><th>Source</th><th>ReceiveTime (UTC)</th><th>Message Type</th>'
+             '<th>Core Business Information</th></tr>']
+    for row, info in zip(rows, infos):
+        lines.append(f"<tr><td>{row['No']}</td><td><b>{row['Source']}</b></td><td>{row['ReceiveTimeText']}</td>"
+                     f"<td><code>{html.escape(str(row['MsgTypeText']))}</code></td>"
+                     f"<td>{markdown_info_to_html(info)}</td></tr>")
+    lines.append('</table></template></details>\n')
+    return ''.join(lines)
+
+
+def render_flight_chunk(chunk_df, flight_numbers, formats=('md',), anchors=False):
+    """
+    渲染一段连续航班 (进程池任务，模块级函数以便 pickle)。flight_numbers: {FlightKey: 小节编号}。
+    返回按航班顺序的 [(FlightKey, 编号, AFTN消息数, FPLA消息数, {格式: 小节文本}), ...]。
+    """
+    records = chunk_df.to_dict('records')
+    sections = []
+    start = 0
+    for flight_key, size in chunk_df.groupby('FlightKey', sort=False).size().items():
+        rows = records[start:start + size]
+        start += size
+        number = flight_numbers[flight_key]
+        infos = [_row_info(row) for row in rows]
+        aftn_count = sum(row['Source'] == 'AFTN' for row in rows)
+        texts = {}
+        if 'md' in formats: texts['md'] = render_flight_section(number, flight_key, rows, infos, anchors)
+        if 'html' in formats:
+            texts['html'] = render_flight_section_html(number, flight_key, rows, infos, aftn_count, size - aftn_count)
+        sections.append((flight_key, number, aftn_count, size - aftn_count, texts))
+    return sections
+
+
+def _flight_chunks(timeline_df, numbers):
+    """按航班切成连续的小块：时间轴已按 FlightKey 排序，每块为行的一段切片，分块内编号随航班一起传递。"""
+    rows = timeline_df[timeline_df['FlightKey'].isin(list(numbers))]
+    if 'RawMessage' in rows.columns:
+        # 分类列切片会带上整个报文库，分块前转为普通列，每块只携带自己用到的报文
+        rows = rows.assign(RawMessage=rows['RawMessage'].astype(object))
+    flight_sizes = rows.groupby('FlightKey', sort=False).size()
+    bounds = np.concatenate([[0], np.cumsum(flight_sizes.to_numpy())])
+    for first in range(0, len(flight_sizes), MD_FLIGHTS_PER_CHUNK):
+        keys = flight_sizes.index[first:first + MD_FLIGHTS_PER_CHUNK]
+        chunk = rows.iloc[bounds[first]:bounds[first + len(keys)]]
+        yield chunk, {flight_key: numbers[flight_key] for flight_key in keys}
+
+
+def _render_sections(chunks, workers, formats, anchors):
+    """按航班顺序逐个产出渲染好的小节；workers > 1 时分块交给进程池，map 按提交顺序返回，边渲染边写出。"""
+    if workers and workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            for sections in pool.map(render_flight_chunk, *zip(*chunks), repeat(formats), repeat(anchors)):
+                yield from sections
+    else:
+        for chunk, flight_numbers in chunks:
+            yield from render_flight_chunk(chunk, flight_numbers, formats, anchors)
+
+
+# ==============================================================================
+# --- 4. 分片输出与索引页 ---
+# ==============================================================================
+def assign_shards(flight_keys, shard_mode=None, shard_count=MD_SHARD_COUNT):
+    """
+    航班 -> 分片名。shard_mode 为 None 时不分片 (全部为 None)；'count' 按航班顺序均分为 shard_count 份
+    (part01、part02…)；'airline' 按 FlightKey 中航班号的三字代码分片，无法识别的记为 '未知'。
+    """
+    if shard_mode is None: return {flight_key: None for flight_key in flight_keys}
+    if shard_mode == 'count':
+        per_shard = max(1, -(-len(flight_keys) // max(1, shard_count)))
+        width = max(2, len(str(-(-len(flight_keys) // per_shard))))
+        return {flight_key: f"part{i // per_shard + 1:0{width}d}" for i, flight_key in enumerate(flight_keys)}
+    if shard_mode == 'airline':
+        shards = {}
+        for flight_key in flight_keys:
+            match = re.match(AIRLINE_FROM_FLIGHT_KEY_PATTERN, str(flight_key))
+            shards[flight_key] = match.group(1) if match else '未知'
+        return shards
+    raise ValueError(f"不支持的分片方式: {shard_mode}")
+
+
+def shard_file(report_file, shard, fmt):
+    """分片文件名：报告文件名去掉扩展名后加 _分片名；不分片时即报告文件本身 (html 换扩展名)。"""
+    stem = os.path.splitext(report_file)[0]
+    return f"{stem}.{fmt}" if shard is None else f"{stem}_{shard}.{fmt}"
+
+
+def _html_page(title, body_top):
+    return (f'<!DOCTYPE html>\n<html lang="zh-CN"><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+            f'<style>{HTML_STYLE}</style></head><body>\n<h1>{html.escape(title)}</h1>\n{body_top}'
+            '<input id="search" type="search" placeholder="按航班号/FlightKey筛选">\n')
+
+
+class TimelineWriter:
+    """
+    把渲染好的航班小节写入各分片文件：首次写入某分片时打开文件并写页头，close 时补齐 HTML 页尾。
+    分片模式下 Markdown 页头带返回索引页的链接。
+    """
+
+    def __init__(self, report_file, formats, sharded):
+        self.report_file = report_file
+        self.formats = formats
+        self.sharded = sharded
+        self.files = {}
+        self.buffer_size = MD_SHARD_BUFFER_SIZE if sharded else MD_WRITE_BUFFER_SIZE
+
+    def write(self, shard, texts):
+        for fmt in self.formats:
+            if (shard, fmt) not in self.files: self._open(shard, fmt)
+            self.files[(shard, fmt)].write(texts[fmt])
+
+    def _open(self, shard, fmt):
+        f = open(shard_file(self.report_file, shard, fmt), 'w', encoding='utf-8', buffering=self.buffer_size)
+        self.files[(shard, fmt)] = f
+        title = f"航班动态时间轴分析报告 ({TARGET_DATE_STR})" + (f" - {shard}" if shard is not None else "")
+        index_name = os.path.basename(shard_file(self.report_file, None, fmt))
+        if fmt == 'md':
+            f.write(f"# {title}\n\n")
+            if self.sharded: f.write(f"[返回索引]({index_name})\n\n")
+            f.write(
+                "本报告整合了AFTN和FPLA两个数据源的消息，**仅包含那些至少有一条AFTN消息的航班**，并按时间顺序排列以便分析。\n\n")
+        else:
+            back = f'<p><a href="{html.escape(index_name)}">返回索引</a></p>\n' if self.sharded else ''
+            f.write(_html_page(title, back))
+
+    def close(self):
+        """关闭全部文件，返回 {(分片, 格式): 文件路径}。"""
+        paths = {}
+        for (shard, fmt), f in self.files.items():
+            if fmt == 'html': f.write(f'<script>{HTML_SECTION_SCRIPT}</script>\n</body></html>\n')
+            f.close()
+            paths[(shard, fmt)] = f.name
+        return paths
+
+
+def write_index(report_file, entries, formats):
+    """
+    分片模式的索引页 (Markdown 即报告文件本身，HTML 同名)：每个航班一行，含跳转到分片内锚点的链接与消息数。
+    entries: [(编号, FlightKey, 分片名, AFTN消息数, FPLA消息数), ...]
+    """
+    shard_names = sorted({entry[2] for entry in entries})
+    summary = f"共 {len(entries)} 个航班，分为 {len(shard_names)} 个文件。"
+    if 'md' in formats:
+        with open(shard_file(report_file, None, 'md'), 'w', encoding='utf-8', buffering=MD_WRITE_BUFFER_SIZE) as f:
+            f.write(f"# 航班动态时间轴分析报告 ({TARGET_DATE_STR}) - 索引\n\n{summary}\n\n")
+            f.write("| No. | 航班 | AFTN消息数 | FPLA消息数 | 文件 |\n|:---:|:-----|:---:|:---:|:-----|\n")
+            for number, flight_key, shard, aftn_count, fpla_count in entries:
+                target = os.path.basename(shard_file(report_file, shard, 'md'))
+                f.write(f"| {number} | [`{flight_key}`]({target}#f{number}) | {aftn_count} | {fpla_count} | {shard} |\n")
+    if 'html' in formats:
+        with open(shard_file(report_file, None, 'html'), 'w', encoding='utf-8', buffering=MD_WRITE_BUFFER_SIZE) as f:
+            f.write(_html_page(f"航班动态时间轴分析报告 ({TARGET_DATE_STR}) - 索引", f"<p>{summary}</p>\n"))
+            f.write('<table id="index"><tr><th>No.</th><th>航班</th><th>AFTN消息数</th><th>FPLA消息数</th>'
+                    '<th>文件</th></tr>\n')
+            for number, flight_key, shard, aftn_count, fpla_count in entries:
+                target = html.escape(os.path.basename(shard_file(report_file, shard, 'html')))
+                f.write(f'<tr><td>{number}</td><td><a href="{target}#f{number}">{html.escape(flight_key)}</a></td>'
+                        f'<td>{aftn_count}</td><td>{fpla_count}</td><td>{html.escape(shard)}</td></tr>\n')
+            f.write(f'</table>\n<script>{HTML_INDEX_SCRIPT}</script>\n</body></html>\n')
+
+
+def generate_unified_report(workers=MD_RENDER_WORKERS, shard_mode=MD_SHARD_MODE, shard_count=MD_SHARD_COUNT,
+                            formats=MD_OUTPUT_FORMATS):
+    """
+    主函数。workers > 1 时各航班小节分块交给进程池渲染，按航班顺序写出。
+    shard_mode 为 'count' / 'airline' 时按份数或航空公司分片输出，并以报告文件名写出索引页；
+    formats 可含 'md' / 'html'，HTML 中各航班的时间轴展开时才渲染。
+    """
+    print("--- 开始生成航班动态时间轴分析报告 (V4 - 完整信息修正版) ---")
+
+    try:
+        aftn_df = pd.read_csv(AFTN_ANALYSIS_FILE, low_memory=False)
+        fpla_df = pd.read_csv(FPLA_ANALYSIS_FILE, low_memory=False)
+    except FileNotFoundError as e:
+        print(f"错误: 找不到输入文件。\n详细错误: {e}");
+        return
+
+    timeline_df = build_timeline(aftn_df, fpla_df)
+
     flights_with_aftn = set(aftn_df['FlightKey'].unique())
     all_flights = timeline_df['FlightKey'].unique()
     flights_to_process = [fk for fk in all_flights if fk in flights_with_aftn]
@@ -140,32 +399,25 @@ def generate_unified_report():
     if FLIGHTS_TO_ANALYZE != -1:
         flights_to_process = flights_to_process[:FLIGHTS_TO_ANALYZE]
 
-    with open(MD_REPORT_FILE, 'w', encoding='utf-8') as f:
-        f.write(f"# 航班动态时间轴分析报告 ({TARGET_DATE_STR})\n\n")
-        f.write(
-            "本报告整合了AFTN和FPLA两个数据源的消息，**仅包含那些至少有一条AFTN消息的航班**，并按时间顺序排列以便分析。\n\n")
-
-        for i, flight_key in enumerate(flights_to_process):
-            if flight_key == 'KEY_GENERATION_FAILED': continue
-
-            f.write(f"## {i + 1}. 航班: `{flight_key}`\n\n")
-
-            flight_timeline = timeline_df[timeline_df['FlightKey'] == flight_key]
-
-            f.write("| No. | Source | ReceiveTime (UTC) | Message Type | Core Business Information |\n")
-            f.write("|:---:|:------:|:------------------|:-------------|:--------------------------|\n")
-
-            for index, row in flight_timeline.iterrows():
-                source = row['Source']
-                receive_time = row['ReceiveTime'].strftime('%Y-%m-%d %H:%M:%S')
-                msg_type = row.get('MessageType', '') if source == 'AFTN' else row.get('FPLA_Status', '')
-                info = format_aftn_info(row) if source == 'AFTN' else format_fpla_info(row)
-
-                f.write(f"| {index + 1} | **{source}** | {receive_time} | `{msg_type}` | {info} |\n")
-
-            f.write("\n---\n\n")
-
-    print(f"\n报告生成完毕！请查看文件: {MD_REPORT_FILE}")
+    numbers = {flight_key: i + 1 for i, flight_key in enumerate(flights_to_process)
+               if flight_key != 'KEY_GENERATION_FAILED'}
+    shards = assign_shards(list(numbers), shard_mode, shard_count)
+    chunks = list(_flight_chunks(timeline_df, numbers))
+    writer = TimelineWriter(MD_REPORT_FILE, formats, shard_mode is not None)
+    entries = []
+    try:
+        for flight_key, number, aftn_count, fpla_count, texts in _render_sections(chunks, workers, formats,
+                                                                                 shard_mode is not None):
+            writer.write(shards[flight_key], texts)
+            entries.append((number, flight_key, shards[flight_key], aftn_count, fpla_count))
+    finally:
+        paths = writer.close()
+    if shard_mode is not None:
+        write_index(MD_REPORT_FILE, entries, formats)
+        print(f"\n报告生成完毕！共 {len(paths)} 个分片文件，索引页: "
+              f"{', '.join(shard_file(MD_REPORT_FILE, None, fmt) for fmt in formats)}")
+    else:
+        print(f"\n报告生成完毕！请查看文件: {', '.join(paths.values()) or MD_REPORT_FILE}")
 
 
 # ==============================================================================
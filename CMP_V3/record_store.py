@@ -0,0 +1,249 @@
+"""
+预处理结果的本地持久库 (SQLite，标准库，无额外依赖)。
+process_*_for_analysis / read_aftn_for_analysis 的结果按天写入，之后的对比、报告与跨日期查询直接从库中读取，
+不必重新解析 AFTN CSV 和 FPLA/FODC Excel。
+
+    aftn                                     按 target_date 分区 (AFTN 为各机场共用的同一个CSV)
+    fpla_plan / fpla_dynamic / fodc_plan / fodc_dynamic    按 (airport, target_date) 分区
+    store_partitions                         已写入的分区目录：行数、列及列类型、写入时间
+
+写入以分区为单位：同一事务中先删除该分区再插入，重复写入同一天是幂等的。
+每次写入在事务开始时即取得写锁 (BEGIN IMMEDIATE)，多个批处理进程同时写入同一个新库时，
+建表、补列与插入依次进行，不会出现两个进程同时建同一张表。
+各表在分区列、FlightKey、RegNo、ReceiveTime 上建有索引。时间列存为 'YYYY-MM-DD HH:MM:SS' 文本，
+可直接使用 SQLite 的日期函数；读出时按目录中记录的列类型还原 (datetime64 / 分类列 / 数值)。
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from core import concat_aftn_frames
+
+STORE_FILE_NAME = 'cmp_records.sqlite'
+STORE_TABLES = {'aftn': ('target_date',),
+                'fpla_plan': ('airport', 'target_date'), 'fpla_dynamic': ('airport', 'target_date'),
+                'fodc_plan': ('airport', 'target_date'), 'fodc_dynamic': ('airport', 'target_date')}
+# run_comparison_reports 的输入顺序
+DAY_TABLES = ['aftn', 'fpla_plan', 'fpla_dynamic', 'fodc_plan', 'fodc_dynamic']
+INDEXED_COLUMNS = ['FlightKey', 'RegNo', 'ReceiveTime']
+STORE_TIMEOUT_SECONDS = 300  # 多个批处理进程同时写入时等待写锁的时间
+INSERT_BATCH_ROWS = 50000
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+# ==============================================================================
+# --- 1. 列类型与取值转换 ---
+# ==============================================================================
+def _column_kind(series):
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype): return 'category'
+    if pd.api.types.is_datetime64_any_dtype(dtype): return 'datetime'
+    if pd.api.types.is_bool_dtype(dtype): return 'bool'
+    if pd.api.types.is_integer_dtype(dtype): return 'int'
+    if pd.api.types.is_float_dtype(dtype): return 'float'
+    return 'object'
+
+
+def _sql_scalar(value):
+    """object 列中的单个值 -> SQLite 可保存的值：缺失为 NULL，numpy 标量取 Python 值，其余类型存文本。"""
+    if value is None or isinstance(value, str): return value
+    if isinstance(value, np.generic): value = value.item()
+    if isinstance(value, (int, float)): return None if value != value else value
+    return None if pd.isna(value) else str(value)
+
+
+def _to_sql_values(series, kind):
+    """整列转换为 Python 值列表 (NaN/NaT -> None)，对象列按去重值转换。"""
+    if kind == 'datetime':
+        fmt = '%Y-%m-%d %H:%M:%S.%f' if (series.dt.microsecond != 0).any() else '%Y-%m-%d %H:%M:%S'
+        values = series.dt.strftime(fmt)
+    elif kind == 'category':
+        values = series.astype(object)
+    elif kind == 'object':
+        codes, uniques = pd.factorize(series)
+        converted = np.array([_sql_scalar(value) for value in uniques] + [None], dtype=object)
+        return converted[codes].tolist()
+    else:
+        values = series.astype(int) if kind == 'bool' else series
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def _from_sql_values(values, kind):
+    if kind == 'datetime': return pd.to_datetime(values, format='ISO8601')
+    if kind == 'category': return values.astype('category')
+    if kind == 'int': return values.astype('int64')
+    if kind == 'float': return values.astype('float64')
+    if kind == 'bool': return values.astype(bool)
+    return values
+
+
+# ==============================================================================
+# --- 2. 持久库 ---
+# ==============================================================================
+class RecordStore:
+    """
+    用法:
+        with RecordStore(path) as store:
+            store.append('fpla_plan', fpla_plan_df, target_date, airport='ZLXY')
+            fpla_plan_df = store.load('fpla_plan', target_date, airport='ZLXY')
+            month = store.load_range('fpla_plan', start, end, airport='ZLXY', reg_no='B6966')
+            df = store.query('SELECT ... FROM fpla_plan WHERE RegNo = ?', ['B6966'])
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=STORE_TIMEOUT_SECONDS)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS store_partitions ('
+                              'table_name TEXT NOT NULL, airport TEXT NOT NULL, target_date TEXT NOT NULL, '
+                              'row_count INTEGER, columns TEXT, written_at TEXT, '
+                              'PRIMARY KEY (table_name, airport, target_date))')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.conn.close()
+
+    # --- 写入 ---
+    def append(self, table, df, target_date, airport=None):
+        """写入一个分区 (覆盖同一分区的旧数据)，返回写入的行数。"""
+        partition = self._partition(table, target_date, airport)
+        kinds = [(str(col), _column_kind(df[col])) for col in df.columns]
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            self._ensure_table(table, [col for col, _ in kinds])
+            where, params = self._partition_filter(table, partition)
+            self.conn.execute(f'DELETE FROM {_quote(table)} WHERE {where}', params)
+            columns = list(STORE_TABLES[table]) + [col for col, _ in kinds]
+            insert_sql = (f'INSERT INTO {_quote(table)} ({", ".join(map(_quote, columns))}) '
+                          f'VALUES ({", ".join("?" * len(columns))})')
+            for start in range(0, len(df), INSERT_BATCH_ROWS):
+                chunk = df.iloc[start:start + INSERT_BATCH_ROWS]
+                value_lists = [[partition[col]] * len(chunk) for col in STORE_TABLES[table]]
+                value_lists += [_to_sql_values(chunk[col], kind) for (_, kind), col in zip(kinds, chunk.columns)]
+                self.conn.executemany(insert_sql, zip(*value_lists))
+            self.conn.execute('INSERT OR REPLACE INTO store_partitions VALUES (?, ?, ?, ?, ?, ?)',
+                              (table, partition.get('airport', ''), partition['target_date'], len(df),
+                               json.dumps(kinds, ensure_ascii=False), datetime.now().isoformat(timespec='seconds')))
+        return len(df)
+
+    def append_day(self, target_date, airport, frames):
+        """frames: {表名: DataFrame}，按 DAY_TABLES 中的表名写入同一天的多张表 (aftn 不区分机场)。"""
+        for table, df in frames.items():
+            self.append(table, df, target_date, airport if table != 'aftn' else None)
+
+    def _ensure_table(self, table, columns):
+        """
+        建表或补齐缺少的列 (各列不声明类型，SQLite 按值原样保存，整数与文本混排的列不会被改写)，并补建索引。
+        调用方已持有写锁；建表/建索引仍用 IF NOT EXISTS，补列时列已存在 (其他连接刚刚补上) 视为成功。
+        """
+        partition_cols = STORE_TABLES[table]
+        existing = [row[1] for row in self.conn.execute(f'PRAGMA table_info({_quote(table)})')]
+        if not existing:
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS {_quote(table)} '
+                              f'({", ".join(f"{_quote(col)} TEXT NOT NULL" for col in partition_cols)})')
+            existing = [row[1] for row in self.conn.execute(f'PRAGMA table_info({_quote(table)})')]
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS {_quote(f"idx_{table}_partition")} ON {_quote(table)} '
+                              f'({", ".join(map(_quote, partition_cols))})')
+        for col in columns:
+            if col not in existing:
+                try:
+                    self.conn.execute(f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(col)}')
+                except sqlite3.OperationalError as e:
+                    if 'duplicate column' not in str(e): raise
+                existing.append(col)
+        for col in INDEXED_COLUMNS:
+            if col in existing:
+                self.conn.execute(f'CREATE INDEX IF NOT EXISTS {_quote(f"idx_{table}_{col}")} '
+                                  f'ON {_quote(table)} ({_quote(col)})')
+
+    # --- 读取 ---
+    def partitions(self, table=None):
+        """已写入的分区目录 (表名、机场、日期、行数、写入时间)。"""
+        sql = 'SELECT table_name, airport, target_date, row_count, written_at FROM store_partitions'
+        params = []
+        if table:
+            sql += ' WHERE table_name = ?'
+            params.append(table)
+        return pd.read_sql_query(sql + ' ORDER BY table_name, target_date, airport', self.conn, params=params)
+
+    def has_partition(self, table, target_date, airport=None):
+        return self._partition_columns(table, self._partition(table, target_date, airport)) is not None
+
+    def has_day(self, target_date, airport):
+        return all(self.has_partition(table, target_date, airport if table != 'aftn' else None)
+                   for table in DAY_TABLES)
+
+    def load(self, table, target_date, airport=None, flight_key=None, reg_no=None):
+        """读出一个分区，列与列类型与写入时一致；分区不存在时返回 None。可按 FlightKey / RegNo 过滤 (走索引)。"""
+        partition = self._partition(table, target_date, airport)
+        kinds = self._partition_columns(table, partition)
+        if kinds is None: return None
+        where, params = self._partition_filter(table, partition)
+        for col, value in (('FlightKey', flight_key), ('RegNo', reg_no)):
+            if value is not None:
+                where += f' AND {_quote(col)} = ?'
+                params.append(value)
+        columns = [col for col, _ in kinds]
+        cursor = self.conn.execute(f'SELECT {", ".join(map(_quote, columns)) or "NULL"} FROM {_quote(table)} '
+                                   f'WHERE {where} ORDER BY rowid', params)
+        rows = cursor.fetchall()
+        df = pd.DataFrame(rows, columns=columns, dtype=object) if columns else pd.DataFrame(index=range(len(rows)))
+        for col, kind in kinds:
+            df[col] = _from_sql_values(df[col], kind)
+        return df
+
+    def load_day(self, target_date, airport):
+        """按 run_comparison_reports 的输入顺序返回同一天的五张表；任一分区缺失时返回 None。"""
+        if not self.has_day(target_date, airport): return None
+        return [self.load(table, target_date, airport if table != 'aftn' else None) for table in DAY_TABLES]
+
+    def load_range(self, table, start_date, end_date, airport=None, flight_key=None, reg_no=None):
+        """读出日期区间 (含两端) 内已写入的各分区并拼接，附加 target_date 列，便于跨日期统计。"""
+        catalog = self.partitions(table)
+        catalog = catalog[(catalog['target_date'] >= str(start_date)) & (catalog['target_date'] <= str(end_date))]
+        if 'airport' in STORE_TABLES[table] and airport: catalog = catalog[catalog['airport'] == airport]
+        frames = []
+        for part in catalog.itertuples():
+            df = self.load(table, part.target_date, part.airport or None, flight_key, reg_no)
+            frames.append(df.assign(target_date=part.target_date, **({'airport': part.airport} if part.airport else {})))
+        if not frames: return pd.DataFrame()
+        return concat_aftn_frames(frames) if table == 'aftn' else pd.concat(frames, ignore_index=True)
+
+    def query(self, sql, params=()):
+        """任意只读 SQL，结果为 DataFrame (列类型由 pandas 推断，时间列为文本)。"""
+        return pd.read_sql_query(sql, self.conn, params=list(params))
+
+    # --- 分区 ---
+    def _partition(self, table, target_date, airport):
+        if table not in STORE_TABLES: raise ValueError(f"未知的表: {table}")
+        partition = {'target_date': str(target_date)}
+        if 'airport' in STORE_TABLES[table]:
+            if not airport: raise ValueError(f"表 {table} 按机场分区，需要指定 airport")
+            partition['airport'] = airport
+        return partition
+
+    def _partition_filter(self, table, partition):
+        cols = STORE_TABLES[table]
+        return ' AND '.join(f'{_quote(col)} = ?' for col in cols), [partition[col] for col in cols]
+
+    def _partition_columns(self, table, partition):
+        row = self.conn.execute('SELECT columns FROM store_partitions WHERE table_name = ? AND airport = ? '
+                                'AND target_date = ?',
+                                (table, partition.get('airport', ''), partition['target_date'])).fetchone()
+        return None if row is None else [tuple(item) for item in json.loads(row[0])]
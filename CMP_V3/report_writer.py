@@ -0,0 +1,119 @@
+"""
+CMP_V3 报告写出组件。
+使用 xlsxwriter 的 constant_memory 模式逐行写出 Sheet (内存占用与行数无关，且绕开 to_excel 的逐单元格样式处理)，
+列宽按整列 .str.len() 估算 (大表抽样)，并可在工作簿旁额外输出每个 Sheet 的 CSV / Parquet 文件供程序读取。
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+COLUMN_WIDTH_SAMPLE_ROWS = 20000  # 超过该行数时等间隔抽样估算列宽
+SIDECAR_FORMATS = ('csv', 'parquet')
+SIDECAR_NAME_PATTERN = re.compile(r'[\\/:*?"<>|\s]+')  # Sheet名中不宜出现在文件名里的字符
+
+# 与 pandas to_excel 的默认表头样式 / 日期格式保持一致
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+WORKBOOK_OPTIONS = {'constant_memory': True, 'default_date_format': DATETIME_FORMAT,
+                    'strings_to_formulas': False, 'strings_to_urls': False, 'strings_to_numbers': False}
+
+
+def estimate_column_widths(df, sample_rows=COLUMN_WIDTH_SAMPLE_ROWS):
+    """
+    按显示宽度估算每列列宽：ASCII 字符计 1，其余字符 (中文等) 计 2，与 GBK 字节数一致，表头参与计算，再加 2。
+    行数超过 sample_rows 时等间隔抽样，只对样本做字符串化。
+    """
+    sample = df.iloc[::-(-len(df) // sample_rows)] if len(df) > sample_rows else df
+    widths = []
+    for col in df.columns:
+        text = sample[col].astype(str)
+        cell_width = (text.str.len() + text.str.count(r'[^\x00-\x7f]')).max() if len(text) else 0
+        header_width = len(str(col)) + len(re.findall(r'[^\x00-\x7f]', str(col)))
+        widths.append(int(max(cell_width, header_width)) + 2)
+    return widths
+
+
+def _to_builtin(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _column_writer(worksheet, series, date_format):
+    """
+    为一列选定写入方法并预先转换好整列的值 (缺失值为 None，写出时跳过即为空单元格)。
+    按列的类型直接调用 write_string / write_number，省去 xlsxwriter 对每个单元格的类型判断；
+    日期时间列整列换算为 Excel 序列号后按数字写出。
+    """
+    missing = series.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        serial = (series - EXCEL_EPOCH) / pd.Timedelta(days=1)
+        values, method, cell_format = serial.to_numpy(dtype=object), worksheet.write_number, date_format
+    elif pd.api.types.is_bool_dtype(series):
+        values, method, cell_format = series.to_numpy(dtype=object), worksheet.write_boolean, None
+    elif pd.api.types.is_numeric_dtype(series) and np.isfinite(series[~missing]).all():
+        values, method, cell_format = series.to_numpy(dtype=object), worksheet.write_number, None
+    else:
+        values = series.map(_to_builtin).to_numpy(dtype=object)
+        is_text = all(isinstance(v, str) for v in values[~missing])
+        method, cell_format = (worksheet.write_string if is_text else worksheet.write), None
+    values[missing] = None
+    return values.tolist(), method, cell_format
+
+
+def write_sheet(workbook, sheet_name, df, header_format, date_format):
+    """constant_memory 模式要求按行顺序写入：先写表头和列宽，再逐行写数据。"""
+    worksheet = workbook.add_worksheet(sheet_name)
+    for i, width in enumerate(estimate_column_widths(df)):
+        worksheet.set_column(i, i, width)
+    worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+    columns = [_column_writer(worksheet, df[col], date_format) for col in df.columns]
+    for row_idx in range(len(df)):
+        for col_idx, (values, method, cell_format) in enumerate(columns):
+            value = values[row_idx]
+            if value is not None: method(row_idx + 1, col_idx, value, cell_format)
+
+
+def write_workbook(output_file, sheets, log_callback=None):
+    """
+    sheets 为按顺序排列的 (Sheet名, DataFrame, 日志标签) 列表，空表跳过。
+    """
+    workbook = xlsxwriter.Workbook(output_file, WORKBOOK_OPTIONS)
+    header_format = workbook.add_format(HEADER_FORMAT)
+    date_format = workbook.add_format({'num_format': DATETIME_FORMAT})
+    try:
+        for sheet_name, df, label in sheets:
+            if df is None or df.empty: continue
+            write_sheet(workbook, sheet_name, df, header_format, date_format)
+            if log_callback: log_callback(label)
+    finally:
+        workbook.close()
+
+
+def _sidecar_path(output_file, sheet_name, fmt):
+    stem = os.path.splitext(output_file)[0]
+    return f"{stem}_{SIDECAR_NAME_PATTERN.sub('_', sheet_name)}.{fmt}"
+
+
+def write_sidecars(output_file, sheets, formats):
+    """
+    在工作簿旁为每个非空 Sheet 输出同名 CSV / Parquet 文件，返回写出的路径列表。
+    Parquet 不支持混合类型的 object 列 (如统计表的"数量/比例")，这类列中的非空值统一转为字符串。
+    """
+    written = []
+    for sheet_name, df in sheets:
+        if df is None or df.empty: continue
+        for fmt in formats:
+            path = _sidecar_path(output_file, sheet_name, fmt)
+            if fmt == 'csv':
+                df.to_csv(path, index=False, encoding='utf-8-sig')
+            elif fmt == 'parquet':
+                object_cols = df.columns[df.dtypes == object]
+                df.assign(**{col: df[col].where(df[col].isna(), df[col].astype(str)) for col in object_cols}) \
+                    .to_parquet(path, index=False)
+            else:
+                raise ValueError(f"不支持的输出格式: {fmt}")
+            written.append(path)
+    return written
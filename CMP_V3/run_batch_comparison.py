@@ -0,0 +1,287 @@
+"""
+CMP_V3 批量对比：日期区间 × 机场列表，每个 (机场, 日期) 生成一份对比结果Excel，并汇总为一张总表。
+
+用法示例:
+    python run_batch_comparison.py --start 2025-08-01 --end 2025-08-31 --airports ZLXY ZSSS --workers 4
+
+输入文件命名与 generate_analysis_files.py 一致：
+    raw_data/FPLA-Details-{机场}-{日期}000000-{次日}000000.xlsx
+    raw_data/FODC-Details-{机场}-{日期}000000-{次日}000000.xlsx
+AFTN 为所有机场共用的同一个CSV，整个文件只读取一次并按日期拆分解析，结果在同日期的各机场任务间共享；
+FPLA/FODC 的Excel按文件去重后预先写入读取缓存，多个任务引用同一文件时不会重复解析。
+指定 --store 时，预处理结果按天写入持久库 (record_store)；库中已有的日期直接读取，不再解析AFTN与Excel。
+某个日期的AFTN解析出错时，该日期的各机场任务在汇总表中记为失败，其余日期照常进行。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from core import (FPLA_COLUMN_MAP, read_aftn_for_analysis, read_aftn_days, process_fpla_for_analysis, process_fodc_for_analysis,
+                  run_comparison_reports, write_report_workbook, summarize_reports, raw_input_files,
+                  auto_set_column_width, aftn_duplicates_dropped, ACCURACY_DIMENSIONS)
+from excel_cache import read_excel_cached
+from record_store import RecordStore, DAY_TABLES
+from report_writer import SIDECAR_FORMATS
+
+# ==============================================================================
+# --- 1. 配置 ---
+# ==============================================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DATA_DIR = os.path.join(BASE_DIR, 'raw_data')
+DEFAULT_AFTN_FILE = os.path.join(RAW_DATA_DIR, 'sqlResult_9 1.csv')
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, 'compare_result', 'batch')
+
+SUMMARY_COLS = ['机场', '日期', '状态', '计划航班数', 'FPLA匹配率', '计划综合准确率(vs AFTN)',
+                '计划综合准确率(vs FODC)', '动态事件数', '动态准确率(vs AFTN)', '动态准确率(vs FODC)', '报告文件',
+                '错误信息']
+
+
+def date_range(start_date, end_date):
+    current = start_date
+    while current <= end_date:
+        yield current
+        current += timedelta(days=1)
+
+
+# ==============================================================================
+# --- 2. 进程池任务 (模块级函数，供子进程 pickle 调用) ---
+# ==============================================================================
+def _save_aftn_day(aftn_df, target_date, work_dir, store_path=None):
+    if store_path:
+        with RecordStore(store_path) as store:
+            store.append('aftn', aftn_df, target_date)
+    pickle_path = os.path.join(work_dir, f"aftn_{target_date.isoformat()}.pkl")
+    aftn_df.to_pickle(pickle_path)
+    return pickle_path
+
+
+def _parse_aftn_days(aftn_path, target_dates, work_dir, store_path=None, refresh=False):
+    """
+    解析各日期的AFTN并逐日落盘为 pickle，同日期的所有机场任务直接读取该结果。持久库中已有的日期直接读取，
+    其余日期共用一次CSV读取 (read_aftn_days)。整体解析出错时逐日重试，只有出错的日期记为失败。
+    返回每个日期的 (日期, pickle路径, 记录数, 剔除的重复转发数, 错误信息)，失败的日期 pickle路径为 None。
+    """
+    results, pending = [], []
+    for target_date in target_dates:
+        aftn_df = None
+        if store_path and not refresh:
+            with RecordStore(store_path) as store:
+                aftn_df = store.load('aftn', target_date)
+        if aftn_df is None:
+            pending.append(target_date)
+        else:
+            pickle_path = _save_aftn_day(aftn_df, target_date, work_dir)
+            results.append((target_date, pickle_path, len(aftn_df), aftn_duplicates_dropped(aftn_df), None))
+    try:
+        parsed = read_aftn_days(aftn_path, pending) if pending else {}
+    except Exception:
+        traceback.print_exc()
+        parsed = {}
+    for target_date in pending:
+        try:
+            aftn_df = parsed[target_date] if target_date in parsed else read_aftn_for_analysis(aftn_path, target_date)
+            pickle_path = _save_aftn_day(aftn_df, target_date, work_dir, store_path)
+            results.append((target_date, pickle_path, len(aftn_df), aftn_duplicates_dropped(aftn_df), None))
+        except Exception as e:
+            traceback.print_exc()
+            results.append((target_date, None, 0, 0, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _warm_excel_cache(path, refresh, read_kwargs):
+    """预先读取一次Excel以生成缓存，后续任务命中缓存即可。"""
+    read_excel_cached(path, refresh=refresh, **read_kwargs)
+    return path
+
+
+def _stored_excel_inputs(store_path, airport, target_date):
+    """持久库中该 (机场, 日期) 的 FPLA/FODC 预处理结果 (计划, 动态, 计划, 动态)，不全时返回 None。"""
+    with RecordStore(store_path) as store:
+        frames = [store.load(table, target_date, airport) for table in DAY_TABLES[1:]]
+    return None if any(df is None for df in frames) else frames
+
+
+def _process_excel_inputs(fpla_file, fodc_file, target_date):
+    fpla_raw_df = read_excel_cached(fpla_file)
+    fpla_raw_df.rename(columns=FPLA_COLUMN_MAP, inplace=True)
+    fpla_filtered_df = fpla_raw_df[fpla_raw_df['PSCHEDULESTATUS'] != 'CNL'].copy()
+    fpla_plan_df, fpla_dynamic_df = process_fpla_for_analysis(fpla_filtered_df, target_date)
+    fodc_plan_df, fodc_dynamic_df = process_fodc_for_analysis(read_excel_cached(fodc_file, engine='openpyxl'),
+                                                              target_date)
+    return [fpla_plan_df, fpla_dynamic_df, fodc_plan_df, fodc_dynamic_df]
+
+
+def _run_job(airport, target_date, aftn_pickle, fpla_file, fodc_file, output_dir, sidecar_formats=(),
+             breakdown_keys=None, store_path=None, refresh=False):
+    """
+    单个 (机场, 日期) 任务：预处理 FPLA/FODC、两阶段对比并写出报告。异常不外抛，记入汇总行。
+    给出 store_path 时优先读取持久库中的预处理结果，库中没有时解析Excel并写入库。
+    """
+    summary = {'机场': airport, '日期': target_date.isoformat()}
+    stored = _stored_excel_inputs(store_path, airport, target_date) if store_path and not refresh else None
+    missing = [path for path in (fpla_file, fodc_file) if not os.path.exists(path)] if stored is None else []
+    if missing:
+        summary.update({'状态': '缺少输入文件', '错误信息': '; '.join(os.path.basename(p) for p in missing)})
+        return summary
+    try:
+        aftn_df = pd.read_pickle(aftn_pickle)
+        if aftn_df.empty:
+            summary['状态'] = '无AFTN数据'
+            return summary
+
+        excel_frames = stored
+        if excel_frames is None:
+            excel_frames = _process_excel_inputs(fpla_file, fodc_file, target_date)
+            if store_path:
+                with RecordStore(store_path) as store:
+                    store.append_day(target_date, airport, dict(zip(DAY_TABLES[1:], excel_frames)))
+        fpla_plan_df, fpla_dynamic_df, fodc_plan_df, fodc_dynamic_df = excel_frames
+
+        reports = run_comparison_reports(aftn_df, fpla_plan_df, fpla_dynamic_df, fodc_plan_df, fodc_dynamic_df,
+                                         target_date, breakdown_keys=breakdown_keys)
+        output_file = os.path.join(output_dir, f"{airport}对比结果_{target_date.isoformat()}.xlsx")
+        write_report_workbook(output_file, reports, log_callback=lambda message: None,
+                              sidecar_formats=sidecar_formats)
+        summary.update(summarize_reports(reports))
+        summary.update({'状态': '成功', '报告文件': os.path.basename(output_file)})
+    except Exception as e:
+        summary.update({'状态': '失败', '错误信息': f"{type(e).__name__}: {e}"})
+        traceback.print_exc()
+    return summary
+
+
+# ==============================================================================
+# --- 3. 批量调度 ---
+# ==============================================================================
+def run_batch(start_date, end_date, airports, aftn_path=DEFAULT_AFTN_FILE, raw_dir=RAW_DATA_DIR,
+              output_dir=DEFAULT_OUTPUT_DIR, workers=None, refresh=False, sidecar_formats=(), breakdown_keys=None,
+              store_path=None):
+    dates = list(date_range(start_date, end_date))
+    jobs = [(airport, target_date) + raw_input_files(raw_dir, airport, target_date)
+            for target_date in dates for airport in airports]
+    stored_jobs = set()
+    if store_path and not refresh:
+        with RecordStore(store_path) as store:
+            stored_jobs = {(airport, target_date) for airport, target_date, _, _ in jobs
+                           if all(store.has_partition(table, target_date, airport) for table in DAY_TABLES[1:])}
+        if stored_jobs: print(f"持久库中已有 {len(stored_jobs)} 个任务的FPLA/FODC预处理结果，跳过对应Excel。")
+    os.makedirs(output_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='cmp_batch_', dir=output_dir)
+    print(f"===== 批量对比: {len(dates)} 天 × {len(airports)} 个机场 = {len(jobs)} 个任务，"
+          f"工作进程数 {workers or os.cpu_count()} =====")
+
+    summaries = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # --- 阶段 1: 共享输入 (每天的AFTN解析一次，每个Excel文件读取一次) ---
+            print("--- [阶段 1/2] 解析共享输入 (AFTN按日期、FPLA/FODC按文件) ---")
+            aftn_future = pool.submit(_parse_aftn_days, aftn_path, dates, work_dir, store_path, refresh)
+            excel_files = {}
+            for airport, target_date, fpla_file, fodc_file in jobs:
+                if (airport, target_date) in stored_jobs: continue
+                if os.path.exists(fpla_file): excel_files.setdefault(fpla_file, {})
+                if os.path.exists(fodc_file): excel_files.setdefault(fodc_file, {'engine': 'openpyxl'})
+            excel_futures = {pool.submit(_warm_excel_cache, path, refresh, kwargs): path
+                             for path, kwargs in excel_files.items()}
+
+            aftn_pickles, aftn_errors = {}, {}
+            for future in as_completed([aftn_future, *excel_futures]):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 预读失败不影响其他输入：Excel由对应任务重新读取 (出错时记入该任务)，AFTN失败的日期记为失败
+                    error = f"{type(e).__name__}: {e}"
+                    if future is aftn_future:
+                        aftn_errors.update(dict.fromkeys(dates, error))
+                        print(f"× AFTN 解析失败: {error}")
+                    else:
+                        print(f"× 缓存失败: {os.path.basename(excel_futures[future])} ({error})")
+                    continue
+                if future is not aftn_future:
+                    print(f"√ 已缓存: {os.path.basename(result)}")
+                    continue
+                for target_date, pickle_path, count, duplicates, error in result:
+                    if error:
+                        aftn_errors[target_date] = error
+                        print(f"× AFTN {target_date.isoformat()} 解析失败: {error}")
+                        continue
+                    aftn_pickles[target_date] = pickle_path
+                    print(f"√ AFTN {target_date.isoformat()} 解析完成，共 {count} 条有效记录 "
+                          f"(已剔除重复转发 {duplicates} 条)。")
+
+            # --- 阶段 2: 按 (机场, 日期) 并行对比并写出报告 ---
+            print("--- [阶段 2/2] 执行对比并生成报告 ---")
+            for airport, target_date, _, _ in jobs:
+                if target_date in aftn_pickles: continue
+                summaries.append({'机场': airport, '日期': target_date.isoformat(), '状态': '失败',
+                                  '错误信息': f"AFTN解析失败: {aftn_errors.get(target_date, '未生成解析结果')}"})
+                print(f"[{len(summaries)}/{len(jobs)}] {airport} {target_date.isoformat()}: 失败")
+            futures = [pool.submit(_run_job, airport, target_date, aftn_pickles[target_date], fpla_file, fodc_file,
+                                   output_dir, sidecar_formats, breakdown_keys, store_path, refresh)
+                       for airport, target_date, fpla_file, fodc_file in jobs if target_date in aftn_pickles]
+            for future in as_completed(futures):
+                summary = future.result()
+                summaries.append(summary)
+                print(f"[{len(summaries)}/{len(jobs)}] {summary['机场']} {summary['日期']}: {summary['状态']}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    summary_df = pd.DataFrame(summaries).reindex(columns=SUMMARY_COLS).sort_values(['日期', '机场'])
+    summary_file = os.path.join(output_dir, f"批量对比汇总_{start_date.isoformat()}_{end_date.isoformat()}.xlsx")
+    with pd.ExcelWriter(summary_file, engine='xlsxwriter') as writer:
+        summary_df.to_excel(writer, sheet_name='汇总', index=False)
+        auto_set_column_width(summary_df, writer, '汇总')
+    print(f"\n===== 批量任务完成: 成功 {(summary_df['状态'] == '成功').sum()}/{len(summary_df)}，"
+          f"汇总表: {summary_file} =====")
+    return summary_df
+
+
+# ==============================================================================
+# --- 4. 命令行入口 ---
+# ==============================================================================
+def main():
+    parser = argparse.ArgumentParser(description="CMP_V3 多日期、多机场批量对比")
+    parser.add_argument('--start', required=True, help="起始日期 YYYY-MM-DD")
+    parser.add_argument('--end', help="结束日期 YYYY-MM-DD (含)，缺省与起始日期相同")
+    parser.add_argument('--airports', nargs='+', required=True, help="机场ICAO代码列表，如 ZLXY ZSSS")
+    parser.add_argument('--aftn', default=DEFAULT_AFTN_FILE, help="AFTN原始CSV文件")
+    parser.add_argument('--raw-dir', default=RAW_DATA_DIR, help="FPLA/FODC原始Excel所在目录")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="报告输出目录")
+    parser.add_argument('--workers', type=int, default=None, help="工作进程数，缺省为CPU核数")
+    parser.add_argument('--refresh', action='store_true',
+                        help="忽略已有的Excel读取缓存与持久库中的记录，重新解析原始文件")
+    parser.add_argument('--sidecar', nargs='+', choices=SIDECAR_FORMATS, default=[],
+                        help="在每份报告旁额外输出各Sheet的 csv / parquet 文件")
+    parser.add_argument('--breakdown', nargs='+', choices=ACCURACY_DIMENSIONS, default=[],
+                        help="在报告中追加按这些维度分组的准确率统计，如 航空公司 小时")
+    parser.add_argument('--store', default=None,
+                        help="预处理结果持久库 (SQLite 文件，如 preprocessed_files/cmp_records.sqlite)，已有的日期直接读取")
+    args = parser.parse_args()
+
+    try:
+        start_date = datetime.strptime(args.start, "%Y-%m-%d").date()
+        end_date = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else start_date
+    except ValueError:
+        print("错误: 日期格式无效。请使用 YYYY-MM-DD。")
+        sys.exit(1)
+    if end_date < start_date:
+        print("错误: 结束日期早于起始日期。")
+        sys.exit(1)
+    if not os.path.exists(args.aftn):
+        print(f"错误: 原始AFTN文件 '{args.aftn}' 未找到。")
+        sys.exit(1)
+
+    run_batch(start_date, end_date, [a.strip().upper() for a in args.airports], aftn_path=args.aftn,
+              raw_dir=args.raw_dir, output_dir=args.output_dir, workers=args.workers, refresh=args.refresh,
+              sidecar_formats=args.sidecar, breakdown_keys=args.breakdown, store_path=args.store)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+CMP_V3 实时(增量)对比：持续跟踪不断增长的AFTN导出CSV (或投递目录中的CSV文件)，
+只解析新到达的报文，只对受影响的航班重新执行计划/动态对比，并按固定间隔发布最新的准确率统计。
+
+用法示例:
+    python run_incremental_comparison.py --date 2025-08-26 --airport ZLXY --interval 60
+    python run_incremental_comparison.py --aftn-dir raw_data/aftn_drop --interval 30
+    python run_incremental_comparison.py --once        # 处理现有数据、发布一次后退出
+
+每个航班 (FlightKey) 的状态即其当天的全部AFTN报文 (最新FPL由对比函数按接收时间选出)、
+FPLA 修订历史和 FODC 记录；计划对比与动态对比都只依赖单个航班自身的数据，
+因此新报文到达时只需对涉及的 FlightKey 重算，其余航班的对比结果原样保留。
+FPLA/FODC 的Excel文件被重新导出 (修改时间变化) 时重新加载，并对所有航班重算。
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from core import (FPLA_COLUMN_MAP, AFTN_RESULT_COLS, process_aftn_for_analysis, concat_aftn_frames,
+                  telegram_hashes, earliest_telegram_copies, aftn_duplicates_dropped,
+                  process_fpla_for_analysis, process_fodc_for_analysis, run_plan_comparison, run_dynamic_comparison,
+                  calculate_accuracy, REPORT_SHEETS, write_report_workbook, summarize_reports, raw_input_files)
+from excel_cache import read_excel_cached
+from report_writer import SIDECAR_FORMATS, write_sidecars
+
+# ==============================================================================
+# --- 1. 配置 ---
+# ==============================================================================
+load_dotenv()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DATA_DIR = os.path.join(BASE_DIR, 'raw_data')
+DEFAULT_AFTN_FILE = os.path.join(RAW_DATA_DIR, 'sqlResult_9 1.csv')
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, 'compare_result', 'live')
+AFTN_TAIL_READ_BYTES = 64 * 1024 * 1024  # 每次最多读取的字节数，首次启动读取大文件时分块解析
+
+
+# ==============================================================================
+# --- 2. AFTN 增量读取 ---
+# ==============================================================================
+def _complete_records_end(data):
+    """
+    返回 data 中最后一条完整CSV记录的结束位置 (含换行符)。
+    AFTN正文字段带引号且内部含换行，只有在引号之外的换行才是记录边界；
+    文件末尾尚未写完的半条记录留到下一轮再读。
+    """
+    end, quotes, pos = 0, 0, 0
+    for line in data.split(b'\n')[:-1]:
+        pos += len(line) + 1
+        quotes += line.count(b'"')
+        if quotes % 2 == 0: end = pos
+    return end
+
+
+class AftnTail:
+    """
+    跟踪一个AFTN导出CSV或一个投递目录 (目录下的 *.csv 各自独立跟踪)，
+    每次 poll() 返回自上次以来新写入的完整记录，列与 read_csv 读取原文件时一致。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = {}
+        self.headers = {}
+
+    def _files(self):
+        if os.path.isdir(self.path): return sorted(glob.glob(os.path.join(self.path, '*.csv')))
+        return [self.path] if os.path.exists(self.path) else []
+
+    def _read_new(self, file_path):
+        with open(file_path, 'rb') as f:
+            if file_path not in self.headers:
+                header_line = f.readline()
+                if not header_line.endswith(b'\n'): return None
+                self.headers[file_path] = pd.read_csv(io.BytesIO(header_line), nrows=0).columns.tolist()
+                self.offsets[file_path] = f.tell()
+            if os.path.getsize(file_path) < self.offsets[file_path]:
+                # 文件被截断或重新导出：下一轮从头重新跟踪
+                del self.headers[file_path]
+                return None
+            f.seek(self.offsets[file_path])
+            data = f.read(AFTN_TAIL_READ_BYTES)
+        end = _complete_records_end(data)
+        if end == 0: return None
+        self.offsets[file_path] += end
+        try:
+            return pd.read_csv(io.BytesIO(data[:end]), header=None, names=self.headers[file_path],
+                               on_bad_lines='skip')
+        except pd.errors.ParserError as e:
+            print(f"警告: {os.path.basename(file_path)} 中有无法解析的记录块 ({e})，已跳过。")
+            return pd.DataFrame()
+
+    def poll(self):
+        """逐块产出所有被跟踪文件中新写入的完整记录，直到没有新数据。"""
+        for file_path in self._files():
+            while True:
+                raw_df = self._read_new(file_path)
+                if raw_df is None: break
+                if not raw_df.empty: yield raw_df
+
+
+# ==============================================================================
+# --- 3. 按航班维护的增量对比状态 ---
+# ==============================================================================
+def _append_rows(current, new_rows):
+    """拼接两张表；跳过空表，避免 pandas 对空表参与 concat 时的列类型推断告警。"""
+    if current.empty: return new_rows.reset_index(drop=True)
+    if new_rows.empty: return current.reset_index(drop=True)
+    return pd.concat([current, new_rows], ignore_index=True)
+
+
+class IncrementalComparison:
+    def __init__(self, target_date, fpla_file, fodc_file, log_callback=print):
+        self.target_date = target_date
+        self.fpla_file, self.fodc_file = fpla_file, fodc_file
+        self.log = log_callback
+        self.aftn_df = pd.DataFrame(columns=AFTN_RESULT_COLS)
+        self.fpla_plan_df = self.fpla_dynamic_df = pd.DataFrame(columns=['FlightKey', 'ReceiveTime'])
+        self.fodc_plan_df = self.fodc_dynamic_df = pd.DataFrame(columns=['FlightKey', 'ReceiveTime'])
+        self.plan_report_df = run_plan_comparison(self.aftn_df, self.fpla_plan_df, self.fodc_plan_df, target_date)
+        self.dynamic_report_df = run_dynamic_comparison(self.aftn_df, self.fpla_dynamic_df, self.fodc_dynamic_df,
+                                                        target_date)
+        self.reference_mtimes = None
+        self.dirty = True
+        # 已保留的报文摘要 -> 该副本的接收时间：与批处理相同，每份报文只保留接收时间最早的副本
+        self.kept_telegrams = {}
+        self.duplicates_dropped = 0
+
+    def _file_mtimes(self):
+        return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in (self.fpla_file, self.fodc_file))
+
+    def reload_reference_if_changed(self):
+        """FPLA/FODC 文件首次出现或被重新导出时重新加载，并对全部航班重算。"""
+        mtimes = self._file_mtimes()
+        if mtimes == self.reference_mtimes: return False
+        self.reference_mtimes = mtimes
+        if os.path.exists(self.fpla_file):
+            fpla_raw_df = read_excel_cached(self.fpla_file)
+            fpla_raw_df.rename(columns=FPLA_COLUMN_MAP, inplace=True)
+            fpla_filtered_df = fpla_raw_df[fpla_raw_df['PSCHEDULESTATUS'] != 'CNL'].copy()
+            fpla_plan_df, fpla_dynamic_df = process_fpla_for_analysis(fpla_filtered_df, self.target_date)
+            if not fpla_plan_df.empty: self.fpla_plan_df, self.fpla_dynamic_df = fpla_plan_df, fpla_dynamic_df
+        if os.path.exists(self.fodc_file):
+            fodc_plan_df, fodc_dynamic_df = process_fodc_for_analysis(
+                read_excel_cached(self.fodc_file, engine='openpyxl'), self.target_date)
+            if not fodc_plan_df.empty: self.fodc_plan_df = fodc_plan_df
+            if not fodc_dynamic_df.empty: self.fodc_dynamic_df = fodc_dynamic_df
+        for df in [self.fpla_plan_df, self.fpla_dynamic_df, self.fodc_plan_df, self.fodc_dynamic_df]:
+            df['ReceiveTime'] = pd.to_datetime(df['ReceiveTime'], errors='coerce')
+        self.log(f"√ FPLA/FODC 已加载: FPLA {len(self.fpla_plan_df)} 条，FODC计划 {len(self.fodc_plan_df)} 条，"
+                 f"FODC动态 {len(self.fodc_dynamic_df)} 条，全部航班重算。")
+        self._recompute(None)
+        return True
+
+    def add_aftn(self, raw_frames):
+        """
+        逐块解析新到达的原始AFTN记录，只对其涉及的航班重算一次，返回 (读取记录数, 目标日期有效报文数, 重复转发数)。
+        同一报文的多个副本 (含已收到的和本次的其他块) 只保留接收时间最早的一条，与批处理结果一致：
+        后到达但接收时间更早的副本 (投递乱序) 替换已保留的副本，两者涉及的航班都重算。
+        """
+        raw_count, parsed, duplicates = 0, [], 0
+        for raw_df in raw_frames:
+            raw_count += len(raw_df)
+            parsed_df = process_aftn_for_analysis(raw_df, self.target_date)
+            duplicates += aftn_duplicates_dropped(parsed_df)
+            parsed.append(parsed_df)
+        new_df = concat_aftn_frames(parsed)
+        replaced_keys = set()
+        if not new_df.empty:
+            hashes = telegram_hashes(new_df['RawMessage'])
+            kept_time = pd.to_datetime(hashes.map(self.kept_telegrams))
+            fresh = earliest_telegram_copies(hashes, new_df['ReceiveTime']) & \
+                (kept_time.isna() | (new_df['ReceiveTime'] < kept_time))
+            duplicates += int((~fresh).sum())
+            replaced = set(hashes[fresh & kept_time.notna()])
+            if replaced:
+                old = telegram_hashes(self.aftn_df['RawMessage']).isin(replaced).to_numpy()
+                replaced_keys = set(self.aftn_df.loc[old, 'FlightKey'].dropna())
+                duplicates += int(old.sum())
+                self.aftn_df = self.aftn_df[~old].reset_index(drop=True)
+            new_df = new_df[fresh.to_numpy()].reset_index(drop=True)
+            self.kept_telegrams.update(zip(hashes[fresh], new_df['ReceiveTime']))
+        self.duplicates_dropped += duplicates
+        if new_df.empty: return raw_count, 0, duplicates
+        self.aftn_df = concat_aftn_frames([self.aftn_df, new_df])
+        self._recompute(set(new_df['FlightKey'].dropna()) | replaced_keys)
+        return raw_count, len(new_df), duplicates
+
+    def _recompute(self, touched_keys):
+        """touched_keys 为 None 时全量重算；否则只替换这些 FlightKey 的计划/动态对比结果。"""
+        if touched_keys is None:
+            subset = lambda df: df
+            keep_plan = keep_dynamic = None
+        else:
+            subset = lambda df: df[df['FlightKey'].isin(touched_keys)]
+            keep_plan = self.plan_report_df[~self.plan_report_df['航班标识(FlightKey)'].isin(touched_keys)]
+            keep_dynamic = self.dynamic_report_df[
+                ~self.dynamic_report_df['航班标识(FlightKey)'].isin(touched_keys)]
+        aftn_df = subset(self.aftn_df)
+        plan_df = run_plan_comparison(aftn_df, subset(self.fpla_plan_df), subset(self.fodc_plan_df),
+                                      self.target_date)
+        dynamic_df = run_dynamic_comparison(aftn_df, subset(self.fpla_dynamic_df), subset(self.fodc_dynamic_df),
+                                            self.target_date)
+        if touched_keys is not None:
+            plan_df = _append_rows(keep_plan, plan_df)
+            dynamic_df = _append_rows(keep_dynamic, dynamic_df)
+        self.plan_report_df, self.dynamic_report_df = plan_df, dynamic_df
+        self.dirty = True
+
+    def reports(self):
+        stats = calculate_accuracy(self.plan_report_df, self.dynamic_report_df)
+        report_dfs = [self.plan_report_df, self.dynamic_report_df] + list(stats)
+        return {sheet_name: df for (sheet_name, _), df in zip(REPORT_SHEETS, report_dfs)}
+
+
+# ==============================================================================
+# --- 4. 发布 ---
+# ==============================================================================
+def publish(state, output_dir, airport, sidecar_formats=()):
+    """
+    写出最新的对比报告 (先写临时文件再替换，读取方不会看到写了一半的文件)，
+    并向当天的准确率时间序列CSV追加一行。
+    """
+    reports = state.reports()
+    date_str = state.target_date.isoformat()
+    output_file = os.path.join(output_dir, f"{airport}实时对比结果_{date_str}.xlsx")
+    tmp_file = output_file + '.tmp.xlsx'
+    write_report_workbook(tmp_file, reports, log_callback=lambda message: None)
+    os.replace(tmp_file, output_file)
+    if sidecar_formats: write_sidecars(output_file, reports.items(), sidecar_formats)
+
+    summary = {'发布时间': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'AFTN报文数': len(state.aftn_df)}
+    summary.update(summarize_reports(reports))
+    history_file = os.path.join(output_dir, f"{airport}实时准确率_{date_str}.csv")
+    pd.DataFrame([summary]).to_csv(history_file, mode='a', index=False, header=not os.path.exists(history_file),
+                                   encoding='utf-8-sig')
+    state.dirty = False
+    return summary
+
+
+def run_incremental(target_date, airport, aftn_path, fpla_file, fodc_file, output_dir, interval=60, poll_seconds=5,
+                    once=False, sidecar_formats=()):
+    os.makedirs(output_dir, exist_ok=True)
+    tail = AftnTail(aftn_path)
+    state = IncrementalComparison(target_date, fpla_file, fodc_file)
+    print(f"===== 实时对比: {airport} {target_date.isoformat()}，跟踪 {aftn_path}，发布间隔 {interval} 秒 =====")
+
+    next_publish = time.monotonic()
+    try:
+        while True:
+            state.reload_reference_if_changed()
+            raw_count, added, duplicates = state.add_aftn(tail.poll())
+            if raw_count:
+                print(f"读取新报文 {raw_count} 条，目标日期有效 {added} 条 (重复转发 {duplicates} 条)，"
+                      f"累计 {len(state.aftn_df)} 条。")
+            if once or (time.monotonic() >= next_publish and state.dirty):
+                summary = publish(state, output_dir, airport, sidecar_formats)
+                print(f"[{summary['发布时间']}] 计划航班 {summary['计划航班数']}，FPLA匹配率 {summary['FPLA匹配率']}，"
+                      f"动态准确率(vs AFTN) {summary['动态准确率(vs AFTN)']}")
+                next_publish = time.monotonic() + interval
+            if once: break
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        if state.dirty: publish(state, output_dir, airport, sidecar_formats)
+        print("\n===== 已停止实时对比 =====")
+    return state
+
+
+# ==============================================================================
+# --- 5. 命令行入口 ---
+# ==============================================================================
+def main():
+    parser = argparse.ArgumentParser(description="CMP_V3 实时(增量)对比")
+    parser.add_argument('--date', default=os.getenv("TARGET_DATE"), help="目标日期 YYYY-MM-DD，缺省读取 .env")
+    parser.add_argument('--airport', default=os.getenv("AIRPORT"), help="机场ICAO代码，缺省读取 .env")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--aftn', default=DEFAULT_AFTN_FILE, help="持续增长的AFTN导出CSV文件")
+    source.add_argument('--aftn-dir', help="AFTN投递目录，目录下每个 *.csv 文件均被跟踪")
+    parser.add_argument('--raw-dir', default=RAW_DATA_DIR, help="FPLA/FODC原始Excel所在目录")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="实时报告输出目录")
+    parser.add_argument('--interval', type=int, default=60, help="准确率统计发布间隔 (秒)")
+    parser.add_argument('--poll', type=float, default=5, help="检查新报文的间隔 (秒)")
+    parser.add_argument('--once', action='store_true', help="处理现有数据并发布一次后退出")
+    parser.add_argument('--sidecar', nargs='+', choices=SIDECAR_FORMATS, default=[],
+                        help="在实时报告旁额外输出各Sheet的 csv / parquet 文件")
+    args = parser.parse_args()
+
+    if not args.date or not args.airport:
+        print("错误: 请通过参数或 .env 文件设置 TARGET_DATE 和 AIRPORT。")
+        sys.exit(1)
+    try:
+        target_date = datetime.strptime(args.date, "%Y-%m-%d").date()
+    except ValueError:
+        print(f"错误: 日期格式无效 ({args.date})。请使用 YYYY-MM-DD。")
+        sys.exit(1)
+
+    airport = args.airport.strip().upper()
+    fpla_file, fodc_file = raw_input_files(args.raw_dir, airport, target_date)
+    run_incremental(target_date, airport, args.aftn_dir or args.aftn, fpla_file, fodc_file, args.output_dir,
+                    interval=args.interval, poll_seconds=args.poll, once=args.once,
+                    sidecar_formats=args.sidecar)
+
+
+if __name__ == "__main__":
+    main()
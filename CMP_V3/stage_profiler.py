@@ -0,0 +1,188 @@
+"""
+CMP_V3 流水线的阶段级性能记录。
+把各阶段 (读取AFTN/Excel、预处理、对比、统计、写报告) 包在 profiler.stage() 中，记录墙钟时间、CPU时间、
+输入/输出行数和峰值内存：每个阶段结束时回调一行日志 (GUI 日志窗格)，同时以 JSON Lines 追加到运行日志文件，
+事后可按日期、机场筛选出某次运行慢在哪个阶段。
+
+峰值内存在 Linux 上每个阶段开始前重置 (VmHWM)，只反映该阶段；其他平台为进程至今的峰值，
+记录中的 peak_rss_stage_only 标明了是哪一种。各阶段不应嵌套。
+
+stage_callback(event, name) 在每个阶段开始 ('start') 与结束 ('end') 时调用，供后台任务上报进度；
+在 'start' 时抛出的异常会中止运行 (用于取消，该阶段不留记录)。异常带 run_status 属性时，以其作为运行状态。
+流程未抛异常却未走完 (如输入无效时提前返回) 时，由调用方设置 profiler.status，避免把这次运行记为成功。
+"""
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows 无 resource 模块
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+RUN_LOG_NAME = 'cmp_run_log.jsonl'
+
+
+# ==============================================================================
+# --- 1. 内存读数 ---
+# ==============================================================================
+def _proc_status_mb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'): return int(line.split()[1]) / 1024
+    return None
+
+
+def reset_peak_rss():
+    """Linux 下向 /proc/self/clear_refs 写入 5 可把峰值 (VmHWM) 重置为当前值，返回是否重置成功。"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def current_rss_mb():
+    try:
+        return _proc_status_mb('VmRSS')
+    except OSError:
+        return psutil.Process().memory_info().rss / (1024 * 1024) if psutil else None
+
+
+def peak_rss_mb():
+    try:
+        return _proc_status_mb('VmHWM')
+    except OSError:
+        pass
+    # 非 Linux：进程至今的峰值。Windows 依赖可选的 psutil (peak_wset)；ru_maxrss 在 macOS 上单位为字节，其余为 KB
+    if psutil and hasattr(psutil.Process().memory_info(), 'peak_wset'):
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    return None
+
+
+# ==============================================================================
+# --- 2. 阶段记录 ---
+# ==============================================================================
+def _round(value, digits):
+    return round(value, digits) if value is not None else None
+
+
+def _format_rows(rows):
+    return '-' if rows is None else f"{rows:,}"
+
+
+class StageProfiler:
+    """
+    一次运行的阶段记录器。context 中的键值 (如 airport、target_date) 会写入每一条运行日志记录。
+    用法:
+        with StageProfiler(log_callback, run_log_path, airport='ZLXY') as profiler:
+            with profiler.stage('读取AFTN') as stage:
+                aftn_df = read_aftn_for_analysis(...)
+                stage['rows_out'] = len(aftn_df)
+    """
+
+    def __init__(self, log_callback=None, run_log_path=None, stage_callback=None, **context):
+        self.log_callback = log_callback
+        self.run_log_path = run_log_path
+        self.stage_callback = stage_callback
+        self.context = context
+        self.run_id = f"{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.records = []
+        self.status = None  # 正常退出时的运行状态，None 表示按各阶段结果判定
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(getattr(exc, 'run_status', '失败') if exc_type else self.status)
+        return False
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        记录一个阶段。yield 出的 dict 中可填写 rows_out (以及其他需要写入日志的字段)。
+        阶段内抛出的异常记入 status 后原样抛出。CPU 时间为整个进程的 CPU 时间 (含 pandas/pyarrow 的工作线程)。
+        """
+        if self.stage_callback: self.stage_callback('start', name)
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        rss_before = current_rss_mb()
+        stage_only = reset_peak_rss()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        record['status'] = 'ok'
+        try:
+            yield record
+        except BaseException as e:
+            record['status'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            peak = peak_rss_mb()
+            record.update({'wall_s': round(time.perf_counter() - wall_start, 4),
+                           'cpu_s': round(time.process_time() - cpu_start, 4),
+                           'peak_rss_mb': _round(peak, 1), 'peak_rss_stage_only': stage_only,
+                           'rss_growth_mb': _round(peak - rss_before, 1) if None not in (peak, rss_before) else None})
+            self.records.append(record)
+            self._log(f"[性能] {name}: 耗时 {record['wall_s']:.2f}s (CPU {record['cpu_s']:.2f}s)，"
+                      f"行数 {_format_rows(record['rows_in'])} -> {_format_rows(record['rows_out'])}，"
+                      f"峰值内存 {'-' if peak is None else f'{peak:.0f} MB'}")
+            self._append_run_log(record)
+            if self.stage_callback: self.stage_callback('end', name)
+
+    def finish(self, status=None):
+        """
+        输出各阶段耗时占比，并在运行日志中追加一条 stage='总计' 的记录。
+        status 缺省时按各阶段是否都成功判定为 成功/失败。
+        """
+        if status is None:
+            status = '成功' if all(r['status'] == 'ok' for r in self.records) else '失败'
+        total_wall = time.perf_counter() - self._started
+        total_cpu = time.process_time() - self._cpu_started
+        if self.records:
+            self._log(f"\n--- 阶段耗时汇总 (共 {total_wall:.2f}s，CPU {total_cpu:.2f}s) ---")
+            for r in sorted(self.records, key=lambda r: r['wall_s'], reverse=True):
+                share = r['wall_s'] / total_wall if total_wall else 0
+                self._log(f"  {r['stage']:<12} {r['wall_s']:>8.2f}s  {share:6.1%}")
+        peaks = [r['peak_rss_mb'] for r in self.records if r['peak_rss_mb'] is not None]
+        self._append_run_log({'stage': '总计', 'status': status, 'wall_s': round(total_wall, 4),
+                              'cpu_s': round(total_cpu, 4), 'peak_rss_mb': max(peaks) if peaks else None})
+
+    def _log(self, message):
+        if self.log_callback: self.log_callback(message)
+
+    def _append_run_log(self, record):
+        """每条记录立即落盘，运行中途异常退出时已完成的阶段仍有记录。写日志失败不影响主流程。"""
+        if not self.run_log_path: return
+        entry = {'run_id': self.run_id, 'timestamp': datetime.now().isoformat(timespec='seconds'),
+                 **self.context, **record}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.run_log_path)), exist_ok=True)
+            with open(self.run_log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+        except OSError as e:
+            self._log(f"警告: 写入运行日志 {self.run_log_path} 失败: {e}")
+
+
+def profile_stage(profiler, name, rows_in=None):
+    """profiler 为 None 时返回空上下文，供可选接收 profiler 的函数使用。"""
+    return profiler.stage(name, rows_in) if profiler else nullcontext({})
+
+
+def read_run_log(path):
+    """把运行日志读成 DataFrame，便于按日期/机场/阶段筛选分析。"""
+    return pd.read_json(path, lines=True)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 与各脚本相同，按同目录导入 (core、aftn_tokenizer 等)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,54 @@
+"""aftn_tokenizer 切分结果：编组项对位，以及内容中含 '-' 时不被误切。"""
+from aftn_tokenizer import tokenize_aftn
+from core import parse_core_business_info
+
+FPL_BODY = ('(FPL-CCA1234-IS\n-A320/M-SDE2E3FGIJ1RWY/LB1\n-ZBAA0800\n-N0450F300 DCT VYK W40 DCT\n'
+            '-ZSSS0200 ZSPD\n-PBN/A1B2 DOF/250826 REG/B1234 EET/ZSHA0120)')
+
+
+def test_fpl_fields_and_item18():
+    telegram = tokenize_aftn(FPL_BODY, use_cache=False)
+    assert telegram['type'] == 'FPL'
+    assert telegram['fields'] == {'7': 'CCA1234', '8': 'IS', '9': 'A320/M', '10': 'SDE2E3FGIJ1RWY/LB1',
+                                  '13': 'ZBAA0800', '15': 'N0450F300 DCT VYK W40 DCT', '16': 'ZSSS0200 ZSPD',
+                                  '18': 'PBN/A1B2 DOF/250826 REG/B1234 EET/ZSHA0120'}
+    assert telegram['item18'] == {'PBN': 'A1B2', 'DOF': '250826', 'REG': 'B1234', 'EET': 'ZSHA0120'}
+    assert telegram['amendments'] == []
+
+
+def test_cpl_without_item14():
+    telegram = tokenize_aftn('(CPL-CCA1234-IS-A320/M-S/C-ZBAA0800-N0450F300 DCT-ZSSS0200-REG/B1234)',
+                             use_cache=False)
+    assert telegram['fields']['15'] == 'N0450F300 DCT'
+    assert telegram['fields']['16'] == 'ZSSS0200'
+    assert telegram['item18'] == {'REG': 'B1234'}
+
+
+def test_chg_amendments_in_order():
+    telegram = tokenize_aftn('(CHG-CCA1234-ZBAA0800-ZSSS-DOF/250826-18/REG/B5678 STS/HOSP-9/A321/M)',
+                             use_cache=False)
+    assert telegram['fields'] == {'7': 'CCA1234', '13': 'ZBAA0800', '16': 'ZSSS', '18': 'DOF/250826'}
+    assert telegram['amendments'] == [('18', 'REG/B5678 STS/HOSP'), ('9', 'A321/M')]
+
+
+def test_chg_route_with_hyphen():
+    body = '(CHG-CCA1234-ZBAA0800-ZSSS-0-15/N0450F300 DCT ABC-A123 XYZ DCT)'
+    assert tokenize_aftn(body, use_cache=False)['amendments'] == [('15', 'N0450F300 DCT ABC-A123 XYZ DCT')]
+    assert parse_core_business_info(body)['New_Route'] == 'N0450F300 DCT ABC-A123 XYZ DCT'
+
+
+def test_chg_remarks_with_hyphen():
+    body = '(CHG-CCA1234-ZBAA0800-ZSSS-DOF/250826-18/REG/B1234 RMK/TCAS-EQUIPPED OPR/AIR-CHINA-15/N0450F300 DCT)'
+    telegram = tokenize_aftn(body, use_cache=False)
+    assert telegram['amendments'] == [('18', 'REG/B1234 RMK/TCAS-EQUIPPED OPR/AIR-CHINA'), ('15', 'N0450F300 DCT')]
+    assert parse_core_business_info(body) == {'New_RegNo': 'B1234', 'New_Route': 'N0450F300 DCT'}
+
+
+def test_fpl_route_and_remarks_with_hyphen():
+    body = FPL_BODY.replace('VYK W40', 'ABC-A123').replace('EET/ZSHA0120', 'RMK/TCAS-EQUIPPED OPR/AIR-CHINA')
+    telegram = tokenize_aftn(body, use_cache=False)
+    assert telegram['fields']['15'] == 'N0450F300 DCT ABC-A123 DCT'
+    assert telegram['fields']['16'] == 'ZSSS0200 ZSPD'
+    assert telegram['item18']['RMK'] == 'TCAS-EQUIPPED'
+    assert telegram['item18']['OPR'] == 'AIR-CHINA'
+    assert telegram['item18']['REG'] == 'B1234'
@@ -0,0 +1,56 @@
+"""run_analysis_and_generate_report 的运行日志：未走完的运行不能记为成功。"""
+import json
+
+import pandas as pd
+
+from analysis_job import run_analysis_and_generate_report
+from stage_profiler import RUN_LOG_NAME
+
+AFTN_JSON = ('{"airlineIcaoCode": "CCA", "flightNo": "1234", "regNo": "B1234", "aerocraftTypeIcaoCode": "A320", '
+             '"depAirportIcaoCode": "ZBAA", "arrAirportIcaoCode": "ZLXY"}')
+FODC_COLUMNS = {'航空器识别标志': ['CCA1234'], '计划起飞机场': ['ZBAA'], '计划降落机场': ['ZLXY'],
+                '计划离港时间': [20250826080000], '航空器注册号': ['B1234'], '航空器机型': ['A320'],
+                '实际起飞时间': [20250826083500], '实际起飞机场': ['ZBAA'], '实际降落机场': ['ZLXY'],
+                '消息发送时间': ['2025-08-26 08:35:00']}
+FPLA_COLUMNS = {'航空器识别标志': ['CCA1234'], '航空器注册号': ['B1234'], '计划离港时间': [202508260800],
+                '计划到港时间': [202508261000], '计划起飞机场': ['ZBAA'], '计划目的地机场': ['ZLXY'],
+                '机场保障计划离港时间': [20250826080000], '预执行计划机型': ['A320'], '预执行计划状态': ['ADD'],
+                '消息发送时间': ['2025-08-26 07:00:00']}
+
+
+def _inputs(tmp_path):
+    aftn_path, fpla_path, fodc_path = tmp_path / 'aftn.csv', tmp_path / 'fpla.xlsx', tmp_path / 'fodc.xlsx'
+    pd.DataFrame({'ID': [0], 'JSON_DATA': [AFTN_JSON], 'ADDR': ['ZLXYZPZX'],
+                  'TELE_BODY': ['(FPL-CCA1234-IS\n-A320/M-S/C\n-ZBAA0000\n-N0450F300 DCT\n-ZLXY0200\n'
+                                '-DOF/250826 REG/B1234)'],
+                  'RECEIVE_TIME': ['2025-08-25 20:00:00']}).to_csv(aftn_path, index=False)
+    pd.DataFrame(FPLA_COLUMNS).to_excel(fpla_path, index=False)
+    pd.DataFrame(FODC_COLUMNS).to_excel(fodc_path, index=False)
+    return str(aftn_path), str(fpla_path), str(fodc_path)
+
+
+def _run(tmp_path, aftn_path, fpla_path, fodc_path):
+    messages = []
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    result = run_analysis_and_generate_report(aftn_path, fpla_path, fodc_path, str(output_dir), 'ZLXY', '2025-08-26',
+                                              messages.append)
+    with open(output_dir / RUN_LOG_NAME, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    return result, messages, records
+
+
+def test_successful_run_is_logged_as_success(tmp_path):
+    result, _, records = _run(tmp_path, *_inputs(tmp_path))
+    assert result is not None
+    assert records[-1]['stage'] == '总计' and records[-1]['status'] == '成功'
+
+
+def test_failed_preprocessing_is_not_logged_as_success(tmp_path):
+    aftn_path, _, fodc_path = _inputs(tmp_path)
+    # 把 FODC 文件当作 FPLA 输入：缺少 PSCHEDULESTATUS 列，_run_pipeline 记录错误后返回 None
+    result, messages, records = _run(tmp_path, aftn_path, fodc_path, fodc_path)
+    assert result is None
+    assert any("处理FPLA文件时发生错误: 'PSCHEDULESTATUS'" in message for message in messages)
+    assert [r['stage'] for r in records] == ['读取AFTN', '读取FPLA', '总计']
+    assert records[-1]['status'] == '未完成'
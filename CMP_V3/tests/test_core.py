@@ -0,0 +1,347 @@
+"""core 的预处理与对比函数：用小样例固定当前输出 (与重构前 main_app 中的实现逐项核对一致)。"""
+import json
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from core import (BREAKDOWN_SHEETS, accuracy_flight_attrs, aftn_duplicates_dropped, calculate_accuracy,
+                  generate_flight_key, parse_core_business_info, process_aftn_for_analysis, process_fodc_for_analysis,
+                  process_fpla_for_analysis, run_comparison_reports, run_dynamic_comparison, run_plan_comparison)
+
+TARGET_DATE = date(2025, 8, 26)
+CCA_KEY = '2025-08-26_CCA1234_ZBAA_ZLXY'
+CES_KEY = '2025-08-26_CES5678_ZLXY_ZSSS'
+
+
+def _json(flight_no, reg_no, craft_type, dep, arr):
+    return json.dumps({'airlineIcaoCode': flight_no[:3], 'flightNo': flight_no[3:], 'regNo': reg_no,
+                       'aerocraftTypeIcaoCode': craft_type, 'depAirportIcaoCode': dep, 'arrAirportIcaoCode': arr})
+
+
+CCA_JSON = _json('CCA1234', 'B1234', 'A320', 'ZBAA', 'ZLXY')
+CES_JSON = _json('CES5678', 'B6001', 'A321', 'ZLXY', 'ZSSS')
+CCA_FPL = ('(FPL-CCA1234-IS\n-A320/M-SDE2E3FGIJ1RWY/LB1\n-ZBAA0000\n-N0450F300 DCT\n-ZLXY0200 ZLLL\n'
+           '-DOF/250826 REG/B1234)')
+CES_FPL = '(FPL-CES5678-IS\n-A321/M-SDE2E3FGIJ1RWY/LB1\n-ZLXY0300\n-N0450F300 DCT\n-ZSSS0200\n-DOF/250826 REG/B6001)'
+# (JSON, 报文正文, 接收时间)：含重复副本、DEP 报 (不参与分析) 与次日的 FPL
+AFTN_ROWS = [
+    (CCA_JSON, CCA_FPL, '2025-08-25 20:00:00'),
+    (CCA_JSON, CCA_FPL, '2025-08-25 20:05:00'),
+    (CCA_JSON, '(CHG-CCA1234-ZBAA0000-ZLXY-DOF/250826-18/REG/B5678)', '2025-08-25 22:00:00'),
+    (CCA_JSON, '(DLA-CCA1234-ZBAA0030-ZLXY-DOF/250826)', '2025-08-25 23:00:00'),
+    (CES_JSON, CES_FPL, '2025-08-26 01:00:00'),
+    (CES_JSON, '(CPL-CES5678-IS-A321/M-S/C-ZLXY0300-N0450F300 DCT-ZSPD0200-REG/B6002 DOF/250826)',
+     '2025-08-26 03:10:00'),
+    (CES_JSON, '(CHG-CES5678-ZLXY0300-ZSSS-DOF/250826-15/N0450F300 DCT)', '2025-08-26 02:00:00'),
+    (CES_JSON, '(DEP-CES5678-ZLXY0305-ZSSS-DOF/250826)', '2025-08-26 03:05:00'),
+    (CES_JSON, CES_FPL.replace('DOF/250826', 'DOF/250827'), '2025-08-26 20:00:00'),
+]
+
+
+def aftn_raw():
+    return pd.DataFrame({'ID': range(len(AFTN_ROWS)), 'JSON_DATA': [row[0] for row in AFTN_ROWS], 'ADDR': 'ZLXYZPZX',
+                         'TELE_BODY': [row[1] for row in AFTN_ROWS], 'RECEIVE_TIME': [row[2] for row in AFTN_ROWS]})
+
+
+def fpla_raw():
+    """列名已按 FPLA_COLUMN_MAP 转换；CSN3000 为次日航班。"""
+    return pd.DataFrame({
+        'CALLSIGN': ['CCA1234', 'CCA1234', 'CES5678', 'CSN3000'],
+        'DEPAP': ['ZBAA', 'ZBAA', 'ZLXY', 'ZLXY'], 'ARRAP': ['ZLXY', 'ZLXY', 'ZSSS', 'ZGGG'],
+        'SOBT': [202508260800, 202508260800, 202508261100, 202508271000],
+        'SIBT': [202508261000, 202508261000, 202508261300, 202508271200],
+        'APTSOBT': [20250826080000, 20250826083000, 20250826110000, 20250827100000],
+        'APTSIBT': [None] * 4, 'APTDEPAP': ['ZBAA', 'ZBAA', 'ZLXY', 'ZLXY'],
+        'APTARRAP': ['ZLXY', 'ZLXY', 'ZSSS', 'ZGGG'],
+        'REGNUMBER': ['B1234', 'B1234', 'B6001', 'B7000'], 'EREGNUMBER': [None, 'B5678', None, None],
+        'PSAIRCRAFTTYPE': ['A320', 'A320', 'A321', 'B738'], 'PSCHEDULESTATUS': ['ADD', 'UPD', 'ADD', 'ADD'],
+        'SROUTE': ['DCT'] * 4,
+        'SENDTIME': ['2025-08-25 18:00:00', '2025-08-26 07:00:00', '2025-08-26 05:00:00', '2025-08-26 09:00:00'],
+    })
+
+
+def fodc_raw():
+    return pd.DataFrame({
+        '航空器识别标志': ['CCA1234', 'CES5678', 'CSN3000'], '计划起飞机场': ['ZBAA', 'ZLXY', 'ZLXY'],
+        '计划降落机场': ['ZLXY', 'ZSSS', 'ZGGG'], '计划离港时间': [20250826080000, 20250826110000, 20250827100000],
+        '航空器注册号': ['B5678', 'B6002', 'B7000'], '航空器机型': ['A320', 'A321', 'B738'],
+        '实际起飞时间': [20250826083500, None, None], '实际起飞机场': ['ZBAA', None, None],
+        '实际降落机场': ['ZLXY', None, None],
+        '消息发送时间': ['2025-08-26 08:35:00', '2025-08-26 06:00:00', '2025-08-26 09:00:00'],
+    })
+
+
+def _values(series):
+    """NaN 与 None 统一为 None，便于与列表比较。"""
+    return [None if pd.isna(value) else value for value in series]
+
+
+def _prepared():
+    aftn = process_aftn_for_analysis(aftn_raw(), TARGET_DATE)
+    fpla_plan, fpla_dynamic = process_fpla_for_analysis(fpla_raw(), TARGET_DATE)
+    fodc_plan, fodc_dynamic = process_fodc_for_analysis(fodc_raw(), TARGET_DATE)
+    return aftn, fpla_plan, fpla_dynamic, fodc_plan, fodc_dynamic
+
+
+# ==============================================================================
+# --- 1. 辅助函数 ---
+# ==============================================================================
+def test_generate_flight_key():
+    assert generate_flight_key(TARGET_DATE, ' CCA1234 ', 'ZBAA ', ' ZLXY') == CCA_KEY
+    assert generate_flight_key(datetime(2025, 8, 26, 23, 59), 'CCA1234', 'ZBAA', 'ZLXY') == CCA_KEY
+    assert generate_flight_key(TARGET_DATE, None, 'ZBAA', 'ZLXY') == 'KEY_GENERATION_FAILED'
+    assert generate_flight_key(TARGET_DATE, 'CCA1234', '', 'ZLXY') == 'KEY_GENERATION_FAILED'
+
+
+def test_parse_core_business_info():
+    body = ('(CHG-CCA1234-ZBAA0800-ZSSS-DOF/250826-7/CES5678-9/A321/M-13/ZBAA0930-16/ZSPD0210 ZSSS ZSHC'
+            '-18/REG/B5678 STS/HOSP)')
+    assert parse_core_business_info(body) == {
+        'New_FlightNo': 'CES5678', 'New_CraftType': 'A321', 'New_Departure_Time': '0930', 'New_Destination': 'ZSPD',
+        'New_Alternate_1': 'ZSSS', 'New_Alternate_2': 'ZSHC', 'New_RegNo': 'B5678', 'New_Mission_STS': 'HOSP'}
+    # 同一编组项出现多次时以最后一次为准
+    assert parse_core_business_info('(CHG-CCA1234-ZBAA0800-ZSSS-DOF/250826-18/REG/B1111-18/REG/B2222)') == {
+        'New_RegNo': 'B2222'}
+    assert parse_core_business_info('(CHG-CCA1234-ZBAA0800-ZSSS-0-15/N0450F300 DCT)') == {'New_Route': 'N0450F300 DCT'}
+
+
+# ==============================================================================
+# --- 2. 预处理 ---
+# ==============================================================================
+def test_process_aftn_for_analysis():
+    aftn = process_aftn_for_analysis(aftn_raw(), TARGET_DATE)
+    assert list(aftn.columns) == ['ReceiveTime', 'MessageType', 'FlightNo', 'RegNo', 'DepAirport', 'ArrAirport',
+                                  'CraftType', 'RawMessage', 'FlightKey', 'New_RegNo', 'New_Departure_Time',
+                                  'New_CraftType', 'New_FlightNo', 'New_Destination', 'New_Route']
+    # 重复副本只保留最早接收的一份；DEP 报与次日报文不进入结果；行序为原始报文顺序
+    assert aftn_duplicates_dropped(aftn) == 1
+    assert aftn['ReceiveTime'].tolist() == pd.to_datetime([
+        '2025-08-25 20:00:00', '2025-08-25 22:00:00', '2025-08-25 23:00:00', '2025-08-26 01:00:00',
+        '2025-08-26 03:10:00', '2025-08-26 02:00:00']).tolist()
+    assert aftn['MessageType'].tolist() == ['FPL', 'CHG', 'DLA', 'FPL', 'CPL', 'CHG']
+    assert aftn['FlightKey'].tolist() == [CCA_KEY] * 3 + [CES_KEY] * 3
+    assert aftn['RegNo'].tolist() == ['B1234'] * 3 + ['B6001'] * 3
+    assert _values(aftn['New_RegNo']) == [None, 'B5678', None, None, 'B6002', None]
+    assert _values(aftn['New_Departure_Time']) == [None, None, '0030', None, None, None]
+    assert _values(aftn['New_CraftType']) == [None, None, None, None, 'A321', None]
+    assert _values(aftn['New_FlightNo']) == [None, None, None, None, 'CES5678', None]
+    assert _values(aftn['New_Destination']) == [None, None, None, None, 'ZSSS', None]
+    assert _values(aftn['New_Route']) == [None, None, None, None, None, 'N0450F300 DCT']
+
+    kept_all = process_aftn_for_analysis(aftn_raw(), TARGET_DATE, dedupe=False)
+    assert len(kept_all) == 7 and aftn_duplicates_dropped(kept_all) == 0
+
+
+def test_process_fpla_for_analysis():
+    plan_df, dynamic_df = process_fpla_for_analysis(fpla_raw(), TARGET_DATE)
+    assert plan_df.equals(dynamic_df)
+    assert list(plan_df.columns) == ['FlightKey', 'ReceiveTime', 'FPLA_Status', 'FlightNo', 'RegNo', 'CraftType',
+                                     'SOBT', 'SIBT', 'DepAirport', 'ArrAirport', 'APTSOBT', 'APTSIBT', 'APTDEPAP',
+                                     'APTARRAP', 'Route']
+    assert plan_df['FlightKey'].tolist() == [CCA_KEY, CCA_KEY, CES_KEY]
+    assert plan_df['RegNo'].tolist() == ['B1234', 'B5678', 'B6001']  # 执飞机号优先
+    assert plan_df['APTSOBT'].tolist() == [20250826080000, 20250826083000, 20250826110000]
+    assert plan_df['FPLA_Status'].tolist() == ['ADD', 'UPD', 'ADD']
+
+    empty_plan, empty_dynamic = process_fpla_for_analysis(fpla_raw(), date(2025, 8, 28))
+    assert empty_plan.empty and empty_dynamic.empty
+
+
+def test_process_fodc_for_analysis():
+    plan_df, dynamic_df = process_fodc_for_analysis(fodc_raw(), TARGET_DATE)
+    pd.testing.assert_frame_equal(plan_df, pd.DataFrame({
+        'FlightKey': [CCA_KEY, CES_KEY], 'ReceiveTime': ['2025-08-26 08:35:00', '2025-08-26 06:00:00'],
+        'FlightNo': ['CCA1234', 'CES5678'], 'RegNo': ['B5678', 'B6002'], 'DepAirport': ['ZBAA', 'ZLXY'],
+        'ArrAirport': ['ZLXY', 'ZSSS'], 'SOBT': ['20250826080000', '20250826110000'], 'CraftType': ['A320', 'A321']}))
+    pd.testing.assert_frame_equal(dynamic_df, pd.DataFrame({
+        'FlightKey': [CCA_KEY], 'ReceiveTime': ['2025-08-26 08:35:00'], 'FlightNo': ['CCA1234'], 'RegNo': ['B5678'],
+        'CraftType': ['A320'], 'DepAirport': ['ZBAA'], 'ArrAirport': ['ZLXY'], 'FODC_ATOT': ['20250826083500']}))
+
+
+# ==============================================================================
+# --- 3. 对比函数 ---
+# ==============================================================================
+def test_run_plan_comparison():
+    aftn, fpla_plan, _, fodc_plan, _ = _prepared()
+    report = run_plan_comparison(aftn, fpla_plan, fodc_plan, TARGET_DATE)
+    pd.testing.assert_frame_equal(report, pd.DataFrame({
+        '航班标识(FlightKey)': [CCA_KEY, CES_KEY],
+        'AFTN-机号(FPL_RegNo)': ['B1234', 'B6001'],
+        'FPLA-机号(FPLA_RegNo)': ['B5678', 'B6001'],
+        'AFTN-离港时间(FPL_SOBT_BJT)': ['08-26 08:00', '08-26 11:00'],
+        'FPLA-离港时间(FPLA_SOBT)': ['08-26 08:00', '08-26 11:00'],
+        'FODC-机号(FODC_RegNo)': ['B5678', 'B6002'],
+        'FODC-离港时间(FODC_SOBT)': ['08-26 08:00', '08-26 11:00'],
+        'AFTN vs FODC 对比': ['机号:不一致, 时刻:一致', '机号:不一致, 时刻:一致'],
+        'FPLA vs FODC 对比': ['机号:一致, 时刻:一致', '机号:不一致, 时刻:一致'],
+        '最终结论(Final_Conclusion)': ['机号:FPLA正确', '机号:三方不一致'],
+    }))
+
+
+def test_run_plan_comparison_without_fpla_or_fodc():
+    aftn, fpla_plan, _, fodc_plan, _ = _prepared()
+    report = run_plan_comparison(aftn, fpla_plan[fpla_plan['FlightKey'] == CCA_KEY],
+                                 fodc_plan[fodc_plan['FlightKey'] == CES_KEY], TARGET_DATE)
+    assert report['FPLA-机号(FPLA_RegNo)'].tolist() == ['B5678', '无FPLA数据']
+    assert report['FODC-机号(FODC_RegNo)'].tolist() == ['无FODC数据', 'B6002']
+    assert report['AFTN vs FODC 对比'].tolist() == ['无FODC数据', 'N/A (无FPLA)']
+    assert report['最终结论(Final_Conclusion)'].tolist() == ['机号不一致', '无FPLA数据']
+
+
+def test_run_dynamic_comparison():
+    aftn, _, fpla_dynamic, _, fodc_dynamic = _prepared()
+    report = run_dynamic_comparison(aftn, fpla_dynamic, fodc_dynamic, TARGET_DATE)
+    cpl_time = pd.Timestamp('2025-08-26 03:10:00')
+    pd.testing.assert_frame_equal(report, pd.DataFrame({
+        '航班标识(FlightKey)': [CCA_KEY, CCA_KEY] + [CES_KEY] * 5,
+        'AFTN事件时间(AFTN_Event_Time)': [pd.Timestamp('2025-08-25 22:00:00'), pd.Timestamp('2025-08-25 23:00:00'),
+                                      pd.Timestamp('2025-08-26 02:00:00')] + [cpl_time] * 4,
+        'AFTN事件类型(AFTN_Event_Type)': ['CHG (机号变更)', 'DLA (时刻变更)', 'CHG (其他变更)', 'CPL (航班号变更)',
+                                      'CPL (机型变更)', 'CPL (机号变更)', 'CPL (航站变更)'],
+        'AFTN变更明细(AFTN_Change_Detail)': ['新机号: B5678', '新离港时刻: 08-25 08:30', '未识别出核心字段变更',
+                                         '新数据: CES5678', '新数据: A321', '新数据: B6002', '新数据: ZSSS'],
+        'FPLA vs AFTN 状态': ['一致', '不一致', 'N/A', '一致', '一致', '不一致', '一致'],
+        'FPLA vs FODC 状态': ['一致', '不一致', 'N/A'] + ['无FODC标杆'] * 4,
+        '数据源佐证(Evidence)': ['FPLA机号: B5678, FODC机号: B5678',
+                             'FPLA保障时刻: 08-26 08:30, FODC实际起飞: 08-26 08:35', 'N/A',
+                             'FPLA数据: CES5678, FODC数据: None', 'FPLA数据: A321, FODC数据: None',
+                             'FPLA数据: B6001, FODC数据: None', 'FPLA数据: ZSSS, FODC数据: None'],
+    }))
+
+
+def test_run_dynamic_comparison_without_fpla():
+    aftn, _, fpla_dynamic, _, fodc_dynamic = _prepared()
+    report = run_dynamic_comparison(aftn, fpla_dynamic[fpla_dynamic['FlightKey'] == CCA_KEY], fodc_dynamic,
+                                    TARGET_DATE)
+    ces = report[report['航班标识(FlightKey)'] == CES_KEY]
+    assert ces['AFTN事件类型(AFTN_Event_Type)'].tolist() == ['CHG (无匹配)', 'CPL (无匹配)']
+    assert ces['AFTN变更明细(AFTN_Change_Detail)'].tolist() == ['N/A', 'N/A']
+    assert ces['FPLA vs AFTN 状态'].tolist() == ['无FPLA数据', '无FPLA数据']
+    assert len(report) == 4 and report['航班标识(FlightKey)'].notna().all()
+
+
+# ==============================================================================
+# --- 4. 准确率统计 ---
+# ==============================================================================
+def _reports(breakdown_keys=None):
+    aftn, fpla_plan, fpla_dynamic, fodc_plan, fodc_dynamic = _prepared()
+    return aftn, run_comparison_reports(aftn, fpla_plan, fpla_dynamic, fodc_plan, fodc_dynamic, TARGET_DATE,
+                                        breakdown_keys=breakdown_keys)
+
+
+def _count_rows(stats_df, item_cols, value_col):
+    """统计表中的计数行 (比例行为文本) 按统计项求和。"""
+    counts = stats_df[stats_df[value_col].map(lambda value: not isinstance(value, str))]
+    return counts.groupby(item_cols)[value_col].sum().astype('int64')
+
+
+PLAN_AFTN_ITEMS = ['总计划航班数 (AFTN FPL)', 'FPLA 匹配航班数', 'FPLA 匹配率', '(对比基数：FPLA匹配的航班)', '机号一致数',
+                   '时刻一致数', '综合一致数', '综合准确率']
+PLAN_AFTN_NOTES = ['以当天AFTN FPL报文为基准', '在FPLA数据中能找到对应航班的数量', 'FPLA匹配数 / 总计划航班数', '', '', '',
+                   '机号和时刻均一致的数量', '综合一致数 / FPLA匹配航班数']
+
+
+def test_run_comparison_reports_sheets():
+    aftn, reports = _reports()
+    assert list(reports) == ['计划对比详情', '动态对比详情', '计划-FPLA vs AFTN', '计划-FPLA vs FODC',
+                             '动态-FPLA vs AFTN', '动态-FPLA vs FODC']
+    _, fpla_plan, fpla_dynamic, fodc_plan, fodc_dynamic = _prepared()
+    pd.testing.assert_frame_equal(reports['计划对比详情'], run_plan_comparison(aftn, fpla_plan, fodc_plan, TARGET_DATE))
+    pd.testing.assert_frame_equal(reports['动态对比详情'],
+                                  run_dynamic_comparison(aftn, fpla_dynamic, fodc_dynamic, TARGET_DATE))
+
+
+def test_calculate_accuracy():
+    _, reports = _reports()
+    plan_aftn, plan_fodc, dyn_aftn, dyn_fodc = calculate_accuracy(reports['计划对比详情'], reports['动态对比详情'])
+    for stats_df, sheet_name in zip([plan_aftn, plan_fodc, dyn_aftn, dyn_fodc], list(reports)[2:]):
+        pd.testing.assert_frame_equal(stats_df, reports[sheet_name])
+    pd.testing.assert_frame_equal(plan_aftn, pd.DataFrame({
+        '分类': ['匹配度'] * 3 + ['准确度'] * 5, '统计项': PLAN_AFTN_ITEMS,
+        '数量/比例': [2, 2, '100.00%', 2, 1, 2, 1, '50.00%'], '备注': PLAN_AFTN_NOTES}))
+    pd.testing.assert_frame_equal(plan_fodc, pd.DataFrame({
+        '分类': ['匹配度'] + ['准确度'] * 4, '统计项': ['FPLA与FODC均存在的计划航班数', '机号一致数', '时刻一致数', '综合一致数', '综合准确率'],
+        '数量/比例': [2, 1, 2, 1, '50.00%'],
+        '备注': ['作为对比基准', '', '', '机号和时刻均一致的数量', '综合一致数 / FPLA与FODC均匹配数']}))
+    event_items = ['AFTN事件数', 'FPLA匹配数', '准确率']
+    pd.testing.assert_frame_equal(dyn_aftn, pd.DataFrame({
+        '事件类型': ['总计'] * 5 + [event for event in ['时刻变更', '机号变更', '航站变更', '机型变更', '航班号变更']
+                                 for _ in range(3)],
+        '统计项': ['AFTN事件数', 'FPLA匹配数', 'FPLA匹配率', '综合准确事件数', '准确率'] + event_items * 5,
+        '数值': [7, 7, '100.00%', 4, '57.14% (4/7)', 1, 1, '0.00% (0/1)', 2, 2, '50.00% (1/2)',
+               1, 1, '100.00% (1/1)', 1, 1, '100.00% (1/1)', 1, 1, '100.00% (1/1)']}))
+    pd.testing.assert_frame_equal(dyn_fodc, pd.DataFrame({
+        '事件类型': ['总计'] * 3 + ['时刻变更'] * 2 + ['机号变更'] * 2,
+        '统计项': ['FODC存在标杆数', '综合准确事件数', '准确率'] + ['FODC存在标杆数', '准确率'] * 2,
+        '数值': [3, 1, '33.33% (1/3)', 1, '0.00% (0/1)', 1, '100.00% (1/1)']}))
+
+
+def test_calculate_accuracy_with_missing_sources():
+    aftn, fpla_plan, fpla_dynamic, fodc_plan, fodc_dynamic = _prepared()
+    plan_report = run_plan_comparison(aftn, fpla_plan[fpla_plan['FlightKey'] == CCA_KEY],
+                                      fodc_plan[fodc_plan['FlightKey'] == CES_KEY], TARGET_DATE)
+    dynamic_report = run_dynamic_comparison(aftn, fpla_dynamic[fpla_dynamic['FlightKey'] == CCA_KEY], fodc_dynamic,
+                                            TARGET_DATE)
+    plan_aftn, plan_fodc, dyn_aftn, dyn_fodc = calculate_accuracy(plan_report, dynamic_report)
+    assert plan_aftn['数量/比例'].tolist() == [2, 1, '50.00%', 1, 0, 1, 0, '0.00%']
+    pd.testing.assert_frame_equal(plan_fodc, pd.DataFrame({
+        '分类': ['匹配度'], '统计项': ['FPLA与FODC均存在的计划航班数'], '数量/比例': [0], '备注': ['作为对比基准']}))
+    assert dyn_aftn[['事件类型', '统计项', '数值']].values.tolist() == [
+        ['总计', 'AFTN事件数', 4], ['总计', 'FPLA匹配数', 2], ['总计', 'FPLA匹配率', '50.00%'],
+        ['总计', '综合准确事件数', 1], ['总计', '准确率', '50.00% (1/2)'],
+        ['时刻变更', 'AFTN事件数', 1], ['时刻变更', 'FPLA匹配数', 1], ['时刻变更', '准确率', '0.00% (0/1)'],
+        ['机号变更', 'AFTN事件数', 1], ['机号变更', 'FPLA匹配数', 1], ['机号变更', '准确率', '100.00% (1/1)']]
+    assert dyn_fodc['数值'].tolist() == [4, 1, '25.00% (1/4)', 1, '0.00% (0/1)', 1, '100.00% (1/1)']
+
+
+@pytest.mark.parametrize('group_keys', [['航空公司'], ['小时'], ['报文类型'], ['航空公司', '小时'],
+                                        ['机型', '机号', '目的机场']])
+def test_breakdown_counts_add_up_to_overall(group_keys):
+    aftn, reports = _reports()
+    overall = calculate_accuracy(reports['计划对比详情'], reports['动态对比详情'])
+    breakdown = calculate_accuracy(reports['计划对比详情'], reports['动态对比详情'], group_keys,
+                                   accuracy_flight_attrs(aftn))
+    for (item_cols, value_col), total_df, group_df in zip(
+            [(['分类', '统计项'], '数量/比例')] * 2 + [(['事件类型', '统计项'], '数值')] * 2, overall, breakdown):
+        assert list(group_df.columns) == group_keys + list(total_df.columns)
+        expected = _count_rows(total_df, item_cols, value_col)
+        summed = _count_rows(group_df, item_cols, value_col)
+        assert set(summed.index) <= set(expected.index)
+        pd.testing.assert_series_equal(summed.reindex(expected.index, fill_value=0), expected)
+
+
+def test_breakdown_by_airline():
+    _, reports = _reports(['航空公司'])
+    assert [name for name in reports if name in dict(BREAKDOWN_SHEETS)] == [name for name, _ in BREAKDOWN_SHEETS]
+    plan_aftn = reports['计划-FPLA vs AFTN 分组']
+    combined = plan_aftn[plan_aftn['统计项'] == '综合一致数']
+    assert combined[['航空公司', '数量/比例']].values.tolist() == [['CCA', 0], ['CES', 1]]
+    dyn_aftn = reports['动态-FPLA vs AFTN 分组']
+    totals = dyn_aftn[(dyn_aftn['事件类型'] == '总计') & (dyn_aftn['统计项'] == 'AFTN事件数')]
+    assert totals[['航空公司', '数值']].values.tolist() == [['CCA', 2], ['CES', 5]]
+
+
+def test_breakdown_by_hour():
+    _, reports = _reports(['小时'])
+    plan_aftn = reports['计划-FPLA vs AFTN 分组']
+    flights = plan_aftn[plan_aftn['统计项'] == '总计划航班数 (AFTN FPL)']
+    assert flights[['小时', '数量/比例']].values.tolist() == [['08', 1], ['11', 1]]  # AFTN 离港时刻 (北京时)
+    dyn_fodc = reports['动态-FPLA vs FODC 分组']
+    bases = dyn_fodc[(dyn_fodc['事件类型'] == '总计') & (dyn_fodc['统计项'] == 'FODC存在标杆数')]
+    assert bases[['小时', '数值']].values.tolist() == [['02', 1], ['22', 1], ['23', 1]]  # AFTN 事件时间
+
+
+def test_flight_attr_dimensions_need_flight_attrs():
+    _, reports = _reports()
+    with pytest.raises(ValueError):
+        calculate_accuracy(reports['计划对比详情'], reports['动态对比详情'], ['机型'])
+
+
+def test_count_only_table_keeps_integer_column():
+    aftn, fpla_plan, _, fodc_plan, _ = _prepared()
+    # 没有 FPLA 与 FODC 均存在的航班：只输出计数行，取值列与原逐行构建的结果一样为整数列
+    plan_report = run_plan_comparison(aftn, fpla_plan[fpla_plan['FlightKey'] == CCA_KEY],
+                                      fodc_plan[fodc_plan['FlightKey'] == CES_KEY], TARGET_DATE)
+    plan_fodc = calculate_accuracy(plan_report, _reports()[1]['动态对比详情'])[1]
+    assert plan_fodc['数量/比例'].dtype == 'int64' and plan_fodc['数量/比例'].tolist() == [0]
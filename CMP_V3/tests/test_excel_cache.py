@@ -0,0 +1,56 @@
+"""excel_cache：缓存读出的数据与 read_excel 完全相同 (含 object 列中的 NaN 与混合类型)，旧缓存按读取参数清理。"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import excel_cache
+from excel_cache import CACHE_DIR_NAME, read_excel_cached
+
+
+def _write_workbook(path):
+    pd.DataFrame({'CALLSIGN': ['CCA1234', 'CES5678', 'CSN9012'],
+                  'REGNO': ['B1234', 4567, np.nan],  # 机号列数字与文本混排
+                  'ARRAP': ['ZSSS', np.nan, 'ZGGG'],
+                  'SOBT': pd.to_datetime(['2025-08-26 08:00', '2025-08-26 09:30', '2025-08-26 23:55'])}) \
+        .to_excel(path, index=False)
+
+
+def _cache_files(tmp_path):
+    return sorted(os.listdir(tmp_path / CACHE_DIR_NAME))
+
+
+def test_cached_frame_matches_read_excel(tmp_path):
+    path = tmp_path / 'fodc.xlsx'
+    _write_workbook(path)
+    expected = pd.read_excel(path)
+    first = read_excel_cached(str(path))
+    messages = []
+    cached = read_excel_cached(str(path), log_callback=messages.append)
+    assert messages == ['使用缓存: fodc.xlsx']
+    assert excel_cache._same_frame(expected, first)
+    assert excel_cache._same_frame(expected, cached)
+    assert np.isnan(cached.loc[1, 'ARRAP'])
+    assert all(name.endswith('.parquet') for name in _cache_files(tmp_path))
+
+
+def test_stale_cache_removed_only_for_same_read_kwargs(tmp_path):
+    path = tmp_path / 'fpla.xlsx'
+    _write_workbook(path)
+    read_excel_cached(str(path))
+    read_excel_cached(str(path), engine='openpyxl')
+    before = _cache_files(tmp_path)
+    assert len(before) == 2
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    read_excel_cached(str(path))
+    after = _cache_files(tmp_path)
+    assert len(after) == 2
+    assert len(set(before) & set(after)) == 1  # openpyxl 读取方式的缓存保留，默认读取方式的旧缓存被替换
+
+
+def test_unsupported_values_are_not_cached(tmp_path):
+    df = pd.DataFrame({'A': [1, [2, 3]]}, dtype=object)
+    cache_dir, stem = str(tmp_path), 'x.xlsx'
+    assert excel_cache._write_cache(df, cache_dir, stem, stem + '.k.', os.path.join(cache_dir, 'x.parquet')) is None
+    assert os.listdir(cache_dir) == []
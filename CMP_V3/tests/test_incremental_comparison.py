@@ -0,0 +1,145 @@
+"""IncrementalComparison：分块、乱序到达的报文逐块处理后，对比结果与一次性批处理相同。"""
+import json
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import run_incremental_comparison
+from core import process_aftn_for_analysis, run_dynamic_comparison, run_plan_comparison
+from run_incremental_comparison import IncrementalComparison
+
+TARGET_DATE = date(2025, 8, 26)
+FLIGHT_COUNT = 30
+
+
+def _flight(i):
+    flight_no, dep, arr = f"CCA{1000 + i}", 'ZLXY', ['ZBAA', 'ZSSS', 'ZGGG'][i % 3]
+    eobt = f"{(i % 20) + 1:02d}00"
+    reg = f"B{6000 + i}"
+    return flight_no, dep, arr, eobt, reg
+
+
+def _aftn_export(seed):
+    """每个航班一份 FPL，部分航班有 CHG/DLA/CPL；约三分之一的报文有接收时间更晚的转发副本。整体打乱顺序。"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(FLIGHT_COUNT):
+        flight_no, dep, arr, eobt, reg = _flight(i)
+        payload = json.dumps({'airlineIcaoCode': flight_no[:3], 'flightNo': flight_no[3:], 'regNo': reg,
+                              'aerocraftTypeIcaoCode': 'A320', 'depAirportIcaoCode': dep, 'arrAirportIcaoCode': arr})
+        base = pd.Timestamp('2025-08-25 12:00:00') + pd.Timedelta(minutes=37 * i)
+        bodies = [f"(FPL-{flight_no}-IS\n-A320/M-S/C\n-{dep}{eobt}\n-N0450F300 DCT\n-{arr}0200\n"
+                  f"-DOF/250826 REG/{reg})"]
+        if i % 2 == 0: bodies.append(f"(CHG-{flight_no}-{dep}{eobt}-{arr}-DOF/250826-18/REG/B{7000 + i})")
+        if i % 3 == 0: bodies.append(f"(DLA-{flight_no}-{dep}{eobt[:2]}30-{arr}-DOF/250826)")
+        if i % 5 == 0:
+            bodies.append(f"(CPL-{flight_no}-IS-A321/M-S/C-{dep}{eobt}-N0450F300 DCT-{arr}0200-REG/B{8000 + i} "
+                          f"DOF/250826)")
+        for n, body in enumerate(bodies):
+            receive_time = base + pd.Timedelta(minutes=5 * n, seconds=i)
+            rows.append((payload, body, receive_time))
+            if rng.random() < 0.35:
+                rows.append((payload, body, receive_time + pd.Timedelta(minutes=int(rng.integers(1, 90)))))
+    rows = [rows[k] for k in rng.permutation(len(rows))]
+    return pd.DataFrame({'ID': range(len(rows)), 'JSON_DATA': [r[0] for r in rows], 'ADDR': 'ZLXYZPZX',
+                         'TELE_BODY': [r[1] for r in rows],
+                         'RECEIVE_TIME': [r[2].strftime('%Y-%m-%d %H:%M:%S') for r in rows]})
+
+
+def _reference_files(tmp_path):
+    """FPLA 只覆盖偶数航班，FODC 覆盖全部航班 (部分机号不同)。"""
+    fpla_rows, fodc_rows = [], []
+    for i in range(FLIGHT_COUNT):
+        flight_no, dep, arr, eobt, reg = _flight(i)
+        sobt = f"20250826{(int(eobt[:2]) + 8) % 24:02d}00"
+        if i % 2 == 0:
+            fpla_rows.append({'航空器识别标志': flight_no, '航空器注册号': reg, '计划离港时间': int(sobt),
+                              '计划起飞机场': dep, '计划目的地机场': arr, '机场保障计划离港时间': int(sobt + '00'),
+                              '执飞航空器注册号': f"B{7000 + i}" if i % 4 == 0 else None,
+                              '预执行计划机型': 'A320', '预执行计划状态': 'ADD', '消息发送时间': '2025-08-26 06:00:00'})
+        fodc_rows.append({'航空器识别标志': flight_no, '计划起飞机场': dep, '计划降落机场': arr,
+                          '计划离港时间': int(sobt + '00'), '航空器注册号': reg if i % 3 else f"B{7000 + i}",
+                          '航空器机型': 'A320', '实际起飞时间': int(sobt + '00') if i % 2 else None,
+                          '实际起飞机场': dep if i % 2 else None, '实际降落机场': arr if i % 2 else None,
+                          '消息发送时间': '2025-08-26 09:00:00'})
+    fpla_file, fodc_file = tmp_path / 'fpla.xlsx', tmp_path / 'fodc.xlsx'
+    pd.DataFrame(fpla_rows).to_excel(fpla_file, index=False)
+    pd.DataFrame(fodc_rows).to_excel(fodc_file, index=False)
+    return str(fpla_file), str(fodc_file)
+
+
+def _canonical(report_df):
+    """增量结果按航班追加，行序与批处理不同：按全部列排序后比较。"""
+    return report_df.sort_values(list(report_df.columns), kind='mergesort').reset_index(drop=True)
+
+
+def _state(tmp_path):
+    state = IncrementalComparison(TARGET_DATE, *_reference_files(tmp_path), log_callback=lambda message: None)
+    state.reload_reference_if_changed()
+    return state
+
+
+def test_chunked_shuffled_export_matches_batch(tmp_path):
+    export = _aftn_export(seed=7)
+    state = _state(tmp_path)
+    for chunk in np.array_split(np.arange(len(export)), 7):
+        state.add_aftn([export.iloc[chunk].reset_index(drop=True)])
+
+    batch_aftn = process_aftn_for_analysis(export, TARGET_DATE)
+    batch_aftn['ReceiveTime'] = pd.to_datetime(batch_aftn['ReceiveTime'])
+    plan_df = run_plan_comparison(batch_aftn, state.fpla_plan_df, state.fodc_plan_df, TARGET_DATE)
+    dynamic_df = run_dynamic_comparison(batch_aftn, state.fpla_dynamic_df, state.fodc_dynamic_df, TARGET_DATE)
+    assert len(plan_df) == FLIGHT_COUNT and len(dynamic_df) > FLIGHT_COUNT
+    pd.testing.assert_frame_equal(_canonical(state.plan_report_df), _canonical(plan_df))
+    pd.testing.assert_frame_equal(_canonical(state.dynamic_report_df), _canonical(dynamic_df))
+    assert len(state.aftn_df) == len(batch_aftn)
+    assert state.duplicates_dropped == len(export) - len(batch_aftn)
+
+
+def test_earlier_copy_arriving_later_replaces_kept_copy(tmp_path):
+    export = _aftn_export(seed=7)
+    state = _state(tmp_path)
+    chg = export['TELE_BODY'].str.startswith('(CHG-CCA1000-')
+    original = export[chg].iloc[[0]]
+    late_copy = original.assign(RECEIVE_TIME='2025-08-26 01:00:00')
+    fpl = export[export['TELE_BODY'].str.startswith('(FPL-CCA1000-')].iloc[[0]]
+
+    # 先收到接收时间较晚的副本，再收到原报文
+    state.add_aftn([pd.concat([fpl, late_copy], ignore_index=True)])
+    flight = state.dynamic_report_df['航班标识(FlightKey)'] == '2025-08-26_CCA1000_ZLXY_ZBAA'
+    assert state.dynamic_report_df.loc[flight, 'AFTN事件时间(AFTN_Event_Time)'].tolist() == [
+        pd.Timestamp('2025-08-26 01:00:00')]
+    raw_count, added, duplicates = state.add_aftn([original.reset_index(drop=True)])
+    assert (raw_count, added, duplicates) == (1, 1, 1)
+
+    chg_rows = state.aftn_df[state.aftn_df['MessageType'] == 'CHG']
+    assert chg_rows['ReceiveTime'].tolist() == pd.to_datetime(original['RECEIVE_TIME']).tolist()
+    flight = state.dynamic_report_df['航班标识(FlightKey)'] == '2025-08-26_CCA1000_ZLXY_ZBAA'
+    assert state.dynamic_report_df.loc[flight, 'AFTN事件时间(AFTN_Event_Time)'].tolist() == pd.to_datetime(
+        original['RECEIVE_TIME']).tolist()
+
+    # 之后再到达的更晚副本不再替换
+    assert state.add_aftn([late_copy.assign(RECEIVE_TIME='2025-08-26 02:00:00').reset_index(drop=True)]) == (1, 0, 1)
+    assert state.duplicates_dropped == 2
+
+
+def test_only_touched_flights_are_recomputed(tmp_path, monkeypatch):
+    export = _aftn_export(seed=3)
+    state = _state(tmp_path)
+    first_flights = export['TELE_BODY'].str.contains('-CCA10(?:0|1)\\d-', regex=True)
+    state.add_aftn([export[first_flights].reset_index(drop=True)])
+    untouched = state.plan_report_df.copy()
+
+    seen = []
+
+    def recording_plan_comparison(aftn_df, *args):
+        seen.append(set(aftn_df['FlightKey']))
+        return run_plan_comparison(aftn_df, *args)
+
+    monkeypatch.setattr(run_incremental_comparison, 'run_plan_comparison', recording_plan_comparison)
+    new = export[export['TELE_BODY'].str.contains('-CCA1025-')].reset_index(drop=True)
+    state.add_aftn([new])
+    assert seen == [{'2025-08-26_CCA1025_ZLXY_ZSSS'}]
+    kept = state.plan_report_df[state.plan_report_df['航班标识(FlightKey)'] != '2025-08-26_CCA1025_ZLXY_ZSSS']
+    pd.testing.assert_frame_equal(kept.reset_index(drop=True), untouched)
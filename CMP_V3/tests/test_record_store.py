@@ -0,0 +1,94 @@
+"""RecordStore：写入后读出的列与列类型不变，重复写入同一分区幂等，跨日期读取与并发写入。"""
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from record_store import RecordStore
+
+DAY_1, DAY_2 = date(2025, 8, 26), date(2025, 8, 27)
+
+
+def _records(day, rows=4):
+    day_str = day.isoformat()
+    return pd.DataFrame({
+        'FlightKey': [f"{day_str}_CCA{1000 + i}_ZBAA_ZLXY" for i in range(rows)],
+        'ReceiveTime': pd.to_datetime([f"{day_str} 0{i}:15:00" for i in range(rows)]),
+        'RawMessage': pd.Categorical([f"(FPL-CCA{1000 + i % 2}-IS)" for i in range(rows)]),
+        'RegNo': ['B1234', None, 'B5678', 'B1234'][:rows],
+        'SOBT': np.arange(rows, dtype='int64') + 202508260800,
+        'Score': [0.5, np.nan, 1.25, 2.0][:rows],
+        'Mixed': [1, 'B2', None, 3.5][:rows],  # 数字与文本混排的 object 列
+    })
+
+
+def test_round_trip_keeps_columns_and_types(tmp_path):
+    df = _records(DAY_1)
+    with RecordStore(str(tmp_path / 'store.sqlite')) as store:
+        assert store.append('fpla_plan', df, DAY_1, airport='ZLXY') == len(df)
+        loaded = store.load('fpla_plan', DAY_1, airport='ZLXY')
+        assert store.load('fpla_plan', DAY_2, airport='ZLXY') is None
+        assert store.load('fpla_plan', DAY_1, airport='ZUUU') is None
+    pd.testing.assert_frame_equal(loaded, df)
+    assert loaded['Mixed'].map(type).tolist() == [int, str, type(None), float]
+
+
+def test_append_same_partition_is_idempotent(tmp_path):
+    path = str(tmp_path / 'store.sqlite')
+    with RecordStore(path) as store:
+        store.append('aftn', _records(DAY_1), DAY_1)
+        store.append('aftn', _records(DAY_1), DAY_1)
+        store.append('aftn', _records(DAY_1, rows=3), DAY_1)  # 重新写入 (行数变化) 覆盖旧分区
+        partitions = store.partitions('aftn')
+        row_count = store.query('SELECT COUNT(*) AS n FROM aftn')['n'].iloc[0]
+    with RecordStore(path) as store:
+        loaded = store.load('aftn', DAY_1)
+    assert partitions[['table_name', 'airport', 'target_date', 'row_count']].values.tolist() == [
+        ['aftn', '', '2025-08-26', 3]]
+    assert row_count == 3
+    pd.testing.assert_frame_equal(loaded, _records(DAY_1, rows=3))
+
+
+def test_load_range(tmp_path):
+    with RecordStore(str(tmp_path / 'store.sqlite')) as store:
+        for day in (DAY_1, DAY_2):
+            store.append('fodc_plan', _records(day), day, airport='ZLXY')
+        store.append('fodc_plan', _records(DAY_1), DAY_1, airport='ZUUU')
+        both_days = store.load_range('fodc_plan', DAY_1, DAY_2, airport='ZLXY')
+        one_day = store.load_range('fodc_plan', DAY_2, date(2025, 8, 31), airport='ZLXY')
+        by_reg = store.load_range('fodc_plan', DAY_1, DAY_2, reg_no='B1234')
+        assert store.load_range('fodc_plan', date(2025, 9, 1), date(2025, 9, 2)).empty
+
+    expected = pd.concat([_records(day).assign(target_date=day.isoformat(), airport='ZLXY') for day in (DAY_1, DAY_2)],
+                         ignore_index=True)
+    pd.testing.assert_frame_equal(both_days, expected)
+    assert one_day['target_date'].unique().tolist() == ['2025-08-27']
+    assert by_reg[['target_date', 'airport']].values.tolist() == [
+        ['2025-08-26', 'ZLXY'], ['2025-08-26', 'ZLXY'], ['2025-08-26', 'ZUUU'], ['2025-08-26', 'ZUUU'],
+        ['2025-08-27', 'ZLXY'], ['2025-08-27', 'ZLXY']]
+    assert (by_reg['RegNo'] == 'B1234').all()
+
+
+def test_concurrent_writers_on_new_store(tmp_path):
+    path = str(tmp_path / 'store.sqlite')
+    airports = [f"Z{chr(ord('A') + i)}XY" for i in range(12)]
+    errors = []
+    start = threading.Barrier(len(airports))
+
+    def write(airport):
+        try:
+            with RecordStore(path) as store:
+                start.wait()
+                store.append('fpla_plan', _records(DAY_1), DAY_1, airport=airport)
+        except Exception as e:  # 在主线程中断言
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(airport,)) for airport in airports]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert errors == []
+    with RecordStore(path) as store:
+        assert store.partitions('fpla_plan')['airport'].tolist() == sorted(airports)
+        for airport in airports:
+            pd.testing.assert_frame_equal(store.load('fpla_plan', DAY_1, airport=airport), _records(DAY_1))
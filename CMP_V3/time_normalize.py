@@ -0,0 +1,74 @@
+"""
+对比用的时间规整：
+    AFTN 编组项中的 HHMM (UTC) + 基准日期 -> 北京时间
+    FPLA/FODC 的 12/14 位时间戳 (或 ISO 文本) -> datetime64
+    datetime -> 对比键 '%m-%d %H:%M'
+各函数 (*_series) 先对取值去重，只对去重值解析/格式化一次再按编码展开：同一航班的各版本计划时刻、
+同一时刻的多条报文大多取值相同。
+"""
+import numpy as np
+import pandas as pd
+
+COMPARE_TIME_FORMAT = '%m-%d %H:%M'
+HHMM_PATTERN = r'\d{4}'
+
+
+# ==============================================================================
+# --- 1. 整列版本 ---
+# ==============================================================================
+def _per_unique(series, func, na_value):
+    """
+    func 作用于去重后的取值 (Series -> 等长数组)，结果按编码展开回原索引；缺失值直接取 na_value。
+    编码 -1 (缺失) 恰好取到追加在末尾的 na_value。
+    """
+    codes, uniques = pd.factorize(series)
+    values = np.append(np.asarray(func(pd.Series(uniques))), na_value)
+    return pd.Series(values[codes], index=series.index)
+
+
+def to_datetime_coerce(series):
+    """整列解析时间；整列推断格式失败的个别值再逐个解析，结果与逐个 pd.to_datetime 一致。"""
+    parsed = pd.to_datetime(series, errors='coerce')
+    retry = parsed.isna() & series.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(series[retry], errors='coerce', format='mixed')
+    return parsed
+
+
+def _parse_fpla_unique(values):
+    time_str = values.astype(str).str.split('.').str[0]
+    result = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    is_iso = time_str.str.contains('-', regex=False) & time_str.str.contains(':', regex=False)
+    is_long = ~is_iso & (time_str.str.len() >= 14)
+    is_short = ~is_iso & ~is_long
+    if is_iso.any(): result[is_iso] = to_datetime_coerce(time_str[is_iso])
+    if is_long.any(): result[is_long] = pd.to_datetime(time_str[is_long], format='%Y%m%d%H%M%S', errors='coerce')
+    if is_short.any(): result[is_short] = pd.to_datetime(time_str[is_short], format='%Y%m%d%H%M', errors='coerce')
+    return result.to_numpy(dtype='datetime64[ns]')
+
+
+def parse_fpla_time_series(series):
+    """整列解析 FPLA/FODC 时间：ISO格式直接解析，14位按 %Y%m%d%H%M%S，其余按 %Y%m%d%H%M。"""
+    return _per_unique(series, _parse_fpla_unique, np.datetime64('NaT', 'ns'))
+
+
+def format_time_series(series):
+    """datetime 列 -> 对比键 '%m-%d %H:%M'，NaT 输出为空字符串。"""
+    return _per_unique(series, lambda values: values.dt.strftime(COMPARE_TIME_FORMAT).to_numpy(dtype=object), '')
+
+
+def _hhmm_offset_unique(values):
+    """HHMM 文本/数值 -> 距当日零点的分钟数 (UTC)，无效值为 NaN。"""
+    hhmm = values.astype(str).str.split('.').str[0].str.zfill(4)
+    valid = hhmm.str.fullmatch(HHMM_PATTERN)
+    hours = pd.to_numeric(hhmm.str[:2].where(valid), errors='coerce')
+    minutes = pd.to_numeric(hhmm.str[2:].where(valid), errors='coerce')
+    return (hours * 60 + minutes).where((hours < 24) & (minutes < 60)).to_numpy(dtype='float64')
+
+
+def convert_utc_series_to_bjt(time_series, base_dates):
+    """HHMM (UTC) + 基准日期 -> 北京时间，无效值为 NaT。HHMM 按去重值解析。"""
+    offset_minutes = _per_unique(time_series, _hhmm_offset_unique, np.nan)
+    bjt = (pd.to_datetime(base_dates).dt.normalize() + pd.to_timedelta(offset_minutes, unit='m') +
+           pd.Timedelta(hours=8))
+    return bjt.where(offset_minutes.notna())
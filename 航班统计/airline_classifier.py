@@ -0,0 +1,61 @@
+"""
+按呼号前缀 (ICAO 航空公司代码) 识别航空公司类别，替代各脚本中的外航正则。
+代码表 airline_codes.csv (列 code, category) 为维护的唯一来源：新增/调整外航只改表，不改代码。
+分类时按代码长度分组，取呼号的前 N 位做集合查找 (str[:N] + isin)；结果按呼号缓存，
+同一进程内的多次分析、多个机场复用同一个分类器 (get_classifier)，已见过的呼号不再计算。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+AIRLINE_TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'airline_codes.csv')
+FOREIGN_CATEGORY = '外航'
+
+_classifiers = {}
+
+
+def load_airline_codes(categories, path=AIRLINE_TABLE_FILE):
+    """代码表中属于 categories 的航空公司代码 (去空格、大写)。"""
+    table = pd.read_csv(path, dtype=str, keep_default_na=False)
+    selected = table[table['category'].str.strip().isin(categories)]
+    return frozenset(code for code in selected['code'].str.strip().str.upper() if code)
+
+
+class AirlineClassifier:
+    """
+    用法:
+        classifier = get_classifier(('外航',))
+        is_foreign = classifier.matches(fodc_df['CALLSIGN'])    # 与 Series 对齐的布尔 Series
+    """
+
+    def __init__(self, codes):
+        # 按代码长度分组：多数为3位ICAO代码，少数为更长的前缀 (如 T7RDJ)
+        self.codes_by_length = {}
+        for code in codes:
+            self.codes_by_length.setdefault(len(code), set()).add(code)
+        self._cache = {}  # 呼号 -> 是否匹配
+
+    def _classify(self, callsigns):
+        callsigns = pd.Series(callsigns, dtype=object).astype(str)
+        matched = np.zeros(len(callsigns), dtype=bool)
+        for length, codes in self.codes_by_length.items():
+            matched |= callsigns.str[:length].isin(codes).to_numpy()
+        return matched
+
+    def matches(self, callsigns):
+        """呼号以代码表中任一代码开头时为 True (与原 str.match('^(...)') 相同)；缺失值为 False。"""
+        codes, uniques = pd.factorize(callsigns)
+        new = [callsign for callsign in uniques if callsign not in self._cache]
+        if new: self._cache.update(zip(new, self._classify(new)))
+        flags = np.array([self._cache[callsign] for callsign in uniques] + [False], dtype=bool)
+        return pd.Series(flags[codes], index=callsigns.index)
+
+
+def get_classifier(categories=(FOREIGN_CATEGORY,), path=AIRLINE_TABLE_FILE):
+    """按 (代码表, 修改时间, 类别) 复用分类器及其呼号缓存；代码表更新后自动重新加载。"""
+    categories = tuple(sorted(categories))
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns, categories)
+    if key not in _classifiers:
+        _classifiers[key] = AirlineClassifier(load_airline_codes(categories, path))
+    return _classifiers[key]
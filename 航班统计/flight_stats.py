@@ -0,0 +1,253 @@
+"""
+航班掌握情况分析：统一的引擎与命令行入口。
+analyze_flights.py / analyze_flights_delay.py / final.py / test.py / 具体分析.py 是同一分析的不同口径，
+这里把口径差异 (匹配键、延长小时数、外航过滤、未执行明细与原因分析等) 收拢为参数，各脚本只保留自己的配置。
+FPLA/FODC 只读取、规范化一次 (load_inputs)，同一进程内的多个口径共用这份数据 (run_variant 不修改输入)。
+
+命令行示例:
+    python flight_stats.py --fpla 23-fpla.xlsx --fodc 23-fodc.xlsx --airport ZGGG --date 2025-09-23 \\
+        --variant final test 具体分析
+    python flight_stats.py ... --date 2025-09-20 --end-date 2025-09-26 --step 5min --variant final
+"""
+import argparse
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from airline_classifier import FOREIGN_CATEGORY, get_classifier
+from snapshot_engine import (DEFAULT_STEP, day_nodes, latest_revisions, plan_day_flags, rolling_snapshots,
+                             summary_frame, sweep_snapshots)
+
+# Excel 读取缓存与 CMP_V3 共用同一模块 (CMP_V3/excel_cache.py)；追加在末尾，不遮蔽本目录的模块
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'CMP_V3'))
+from excel_cache import read_excel_cached  # noqa: E402
+
+# 忽略一些pandas在处理Excel时可能产生的警告
+warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
+
+SUMMARY_SHEET = '航班掌握情况分析'
+DEFAULT_OPTIONS = {
+    'key_col': 'CALLSIGN',  # 匹配键：FLIGHTKEY 或 CALLSIGN
+    'step': DEFAULT_STEP,  # 统计节点间隔
+    'extension_hours': 0,  # 24:00 之后继续统计的小时数
+    'closed_end': True,  # 计划日是否包含次日 00:00
+    'actual_scope': 'plan',  # 见 snapshot_engine.ACTUAL_SCOPES
+    'actual_total': 'union',  # 见 snapshot_engine.ACTUAL_TOTALS
+    'label_day_end': True,  # 次日 00:00 是否显示为 24:00:00
+    'excluded_airlines': (FOREIGN_CATEGORY,),  # 排除的航空公司类别 (见 airline_codes.csv)，() 表示不过滤
+    'details': True,  # 输出最终节点的未执行航班明细及 FPLA/FODC 原始明细
+    'reasons': False,  # 输出未执行原因分析
+}
+# 各脚本的口径 (与原脚本一致)
+VARIANTS = {
+    'analyze_flights': {'key_col': 'FLIGHTKEY', 'closed_end': False, 'actual_scope': 'all', 'actual_total': 'sum',
+                        'excluded_airlines': (FOREIGN_CATEGORY, '国内货运'), 'details': False},
+    'analyze_flights_delay': {'key_col': 'FLIGHTKEY', 'actual_total': 'sum', 'details': False},
+    'final': {'extension_hours': 24, 'label_day_end': False},
+    'test': {},
+    '具体分析': {'extension_hours': 24, 'reasons': True},
+}
+REASON_COLUMNS = ['CALLSIGN', 'DEPAP', 'ARRAP', 'SOBT', 'SIBT', 'PSCHEDULESTATUS', '分析原因']
+# 未执行原因 (按优先级；最后一项为以上均不成立时的原因)
+UNEXECUTED_REASONS = [
+    '计划后续取消 (最终节点之后的FPLA为CNL)',
+    '外航 (FODC已按外航过滤)',
+    'FODC实际起降时间在统计窗口之外',
+    'FODC无本场实际起降时间',
+    '航班号变更 (FODC中同一航班使用其他标识)',
+    'FODC为其他机场的起降',
+    '无实际执行报文 (FODC)',
+]
+
+
+# ==============================================================================
+# --- 1. 数据加载与规范化 (各口径共用) ---
+# ==============================================================================
+def _to_datetime_safe(series):
+    return pd.to_datetime(series, format='%Y%m%d%H%M%S', errors='coerce')
+
+
+def load_inputs(fpla_file, fodc_file, refresh=False):
+    """
+    读取 FPLA/FODC 并规范化：列名大写、CALLSIGN 去空格、时间列转为 datetime，删除没有报文时间的 FPLA。
+    返回 (fpla_df, fodc_df)；fodc_df 未过滤外航 (原因分析需要全部 FODC)。
+    """
+    fpla_df = read_excel_cached(fpla_file, refresh=refresh)
+    fodc_df = read_excel_cached(fodc_file, refresh=refresh)
+    for df in [fpla_df, fodc_df]:
+        df.columns = [col.upper() for col in df.columns]
+        df['CALLSIGN'] = df['CALLSIGN'].astype(str).str.strip()
+
+    msg_time_col = 'SENDTIME' if 'SENDTIME' in fpla_df.columns else 'CREATETIME'
+    fpla_df['MSG_TIME'] = pd.to_datetime(fpla_df[msg_time_col], errors='coerce')
+    fpla_df['SOBT'] = _to_datetime_safe(fpla_df['SOBT'])
+    fpla_df['SIBT'] = _to_datetime_safe(fpla_df['SIBT'])
+    fodc_df['ATOT'] = _to_datetime_safe(fodc_df['ATOT'])
+    fodc_df['ALDT'] = _to_datetime_safe(fodc_df['ALDT'])
+    return fpla_df.dropna(subset=['MSG_TIME']), fodc_df
+
+
+def resolve_options(variant=None, **overrides):
+    """口径预设 + 显式参数 (值为 None 的参数不覆盖预设)。"""
+    if variant is not None and variant not in VARIANTS: raise ValueError(f"未知的口径: {variant}")
+    options = {**DEFAULT_OPTIONS, **VARIANTS.get(variant, {})}
+    options.update({name: value for name, value in overrides.items() if value is not None})
+    unknown = set(options) - set(DEFAULT_OPTIONS)
+    if unknown: raise ValueError(f"未知的参数: {sorted(unknown)}")
+    return options
+
+
+# ==============================================================================
+# --- 2. 未执行航班与原因 ---
+# ==============================================================================
+def unexecuted_flights(fpla_df, fodc_df, airport, analysis_date, final_node_time, key_col, closed_end):
+    """最终节点时仍处于计划执行状态、但截至该节点没有本场实际起降记录的航班 (取该节点的最新一版计划)。"""
+    fpla_latest = latest_revisions(fpla_df, key_col, final_node_time)
+    is_departure, is_arrival, _ = plan_day_flags(fpla_latest, airport, analysis_date, closed_end)
+    fpla_today = fpla_latest[is_departure | is_arrival]
+    plan_exec = fpla_today[fpla_today['PSCHEDULESTATUS'] != 'CNL']
+
+    fodc_of_interest = fodc_df[fodc_df[key_col].isin(plan_exec[key_col])]
+    actual_dep_done = (fodc_of_interest['RDEPAP'] == airport) & (fodc_of_interest['ATOT'] <= final_node_time)
+    actual_arr_done = (fodc_of_interest['RARRAP'] == airport) & (fodc_of_interest['ALDT'] <= final_node_time)
+    executed_keys = fodc_of_interest[actual_dep_done | actual_arr_done][key_col]
+    return plan_exec[~plan_exec[key_col].isin(executed_keys)]
+
+
+def _other_key_links(unexecuted_df, fodc_all_df, key_col):
+    """通过另一标识 (CALLSIGN 匹配时为 FLIGHTKEY，反之亦然) 关联到 FODC、但 FODC 中匹配键不同的航班。"""
+    other_col = 'FLIGHTKEY' if key_col == 'CALLSIGN' else 'CALLSIGN'
+    if other_col not in unexecuted_df.columns or other_col not in fodc_all_df.columns: return pd.Series(dtype=object)
+    links = unexecuted_df[[key_col, other_col]].dropna().merge(
+        fodc_all_df[[other_col, key_col]].dropna().drop_duplicates(), on=other_col, suffixes=('', '_FODC'))
+    return links.loc[links[key_col] != links[f'{key_col}_FODC'], key_col]
+
+
+def classify_unexecuted(unexecuted_df, fpla_df, fodc_all_df, airport, final_node_time, key_col):
+    """
+    未执行航班的可能原因，按 UNEXECUTED_REASONS 的顺序取第一个成立的原因。
+    fodc_all_df 为未过滤外航的全部 FODC；未执行航班在统计所用的 (已过滤的) FODC 中没有截至最终节点的本场起降。
+    每个原因都是"匹配键属于某个键集合"，键集合由整表筛选 / 关联一次得到，与未执行航班数无关。
+    """
+    keys = unexecuted_df[key_col]
+    fpla_latest = latest_revisions(fpla_df, key_col, fpla_df['MSG_TIME'].max())
+    fodc_keys = fodc_all_df[key_col]
+    # 本场的实际起降时间 (离港取 ATOT，进港取 ALDT)
+    dep_time = fodc_all_df['ATOT'].where(fodc_all_df['RDEPAP'] == airport)
+    arr_time = fodc_all_df['ALDT'].where(fodc_all_df['RARRAP'] == airport)
+    at_airport = (fodc_all_df['RDEPAP'] == airport) | (fodc_all_df['RARRAP'] == airport)
+    done = (dep_time <= final_node_time) | (arr_time <= final_node_time)
+    late = (dep_time > final_node_time) | (arr_time > final_node_time)
+
+    conditions = [
+        keys.isin(fpla_latest.loc[fpla_latest['PSCHEDULESTATUS'] == 'CNL', key_col]),
+        keys.isin(fodc_keys[done]),  # 全部FODC中已执行、统计所用的FODC中没有：被外航过滤排除
+        keys.isin(fodc_keys[late]),
+        keys.isin(fodc_keys[at_airport]),
+        keys.isin(_other_key_links(unexecuted_df, fodc_all_df, key_col)),
+        keys.isin(fodc_keys),
+    ]
+    reasons = np.select(conditions, UNEXECUTED_REASONS[:-1], default=UNEXECUTED_REASONS[-1])
+    return unexecuted_df.assign(分析原因=reasons)
+
+
+# ==============================================================================
+# --- 3. 分析 ---
+# ==============================================================================
+def filter_foreign(fodc_df, excluded_airlines):
+    """排除呼号属于 excluded_airlines 类别 (默认为外航) 的 FODC 记录。"""
+    if not excluded_airlines: return fodc_df
+    filtered = fodc_df[~get_classifier(excluded_airlines).matches(fodc_df['CALLSIGN'])]
+    print(f"FODC数据过滤：已从 {len(fodc_df)} 条记录中排除外航航班，剩余 {len(filtered)} 条记录用于分析。")
+    return filtered
+
+
+def run_variant(fpla_df, fodc_df, airport, analysis_date, variant=None, end_date=None, **overrides):
+    """
+    按口径 variant (VARIANTS 的键，None 为 DEFAULT_OPTIONS) 与覆盖参数分析，返回 {Sheet名: DataFrame}。
+    fpla_df / fodc_df 为 load_inputs 的结果，不会被修改，可供多个口径重复使用。
+    给出 end_date 时滚动分析 analysis_date 至 end_date 的每一天，只输出汇总表 (首列为 '分析日期')。
+    """
+    options = resolve_options(variant, **overrides)
+    key_col = options['key_col']
+    analysis_date = pd.Timestamp(analysis_date)
+    fpla = fpla_df.dropna(subset=[key_col])
+    fodc = filter_foreign(fodc_df, options['excluded_airlines']).dropna(subset=[key_col])
+    sweep_options = {name: options[name] for name in ['key_col', 'closed_end', 'actual_scope', 'actual_total']}
+
+    if end_date is not None:
+        summary = rolling_snapshots(fpla, fodc, airport, analysis_date, end_date, options['step'],
+                                    options['extension_hours'], label_day_end=options['label_day_end'],
+                                    **sweep_options)
+        return {SUMMARY_SHEET: summary}
+
+    nodes = day_nodes(analysis_date, options['step'], options['extension_hours'])
+    counts = sweep_snapshots(fpla, fodc, airport, analysis_date, nodes, **sweep_options)
+    sheets = {SUMMARY_SHEET: summary_frame(counts, analysis_date, options['label_day_end'])}
+    if not options['details']: return sheets
+
+    unexecuted_df = unexecuted_flights(fpla, fodc, airport, analysis_date, nodes[-1], key_col,
+                                       options['closed_end'])
+    print(f"识别完成，共找到 {len(unexecuted_df)} 个在 {nodes[-1]:%Y-%m-%d %H:%M} 仍未执行的航班。")
+    if options['reasons']:
+        unexecuted_df = classify_unexecuted(unexecuted_df, fpla, fodc_df, airport, nodes[-1], key_col)
+        sheets['未执行航班明细'] = unexecuted_df
+        sheets['未执行原因分析'] = unexecuted_df[REASON_COLUMNS]
+    else:
+        sheets['未执行航班明细'] = unexecuted_df
+    sheets['FPLA原始明细'] = fpla
+    sheets['FODC原始明细'] = fodc
+    return sheets
+
+
+def write_report(sheets, output_file):
+    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+# ==============================================================================
+# --- 4. 命令行 ---
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="航班掌握情况分析 (FPLA 计划 vs FODC 实际执行)")
+    parser.add_argument('--fpla', required=True, help="FPLA 导出文件 (xlsx)")
+    parser.add_argument('--fodc', required=True, help="FODC 导出文件 (xlsx)")
+    parser.add_argument('--airport', required=True, help="机场 ICAO 代码，如 ZGGG")
+    parser.add_argument('--date', required=True, help="分析日期 YYYY-MM-DD")
+    parser.add_argument('--end-date', default=None, help="滚动分析的结束日期 (含)，只输出汇总表")
+    parser.add_argument('--variant', nargs='+', default=['final'], choices=list(VARIANTS),
+                        help="分析口径，可同时给出多个 (共用一次读取的数据)")
+    parser.add_argument('--key', dest='key_col', choices=['FLIGHTKEY', 'CALLSIGN'], default=None, help="匹配键")
+    parser.add_argument('--extension-hours', type=int, default=None, help="24:00 之后继续统计的小时数")
+    parser.add_argument('--step', default=None, help="统计节点间隔，如 1h、15min、5min")
+    parser.add_argument('--no-foreign-filter', action='store_true', help="不过滤外航 FODC")
+    parser.add_argument('--reasons', action='store_true', default=None, help="输出未执行航班的原因分析")
+    parser.add_argument('--output-dir', default='.', help="输出目录")
+    parser.add_argument('--refresh', action='store_true', help="忽略Excel缓存，重新读取FPLA/FODC文件")
+    args = parser.parse_args(argv)
+
+    try:
+        fpla_df, fodc_df = load_inputs(args.fpla, args.fodc, refresh=args.refresh)
+    except FileNotFoundError as e:
+        print(f"错误：找不到文件 {e.filename}。")
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    date_tag = args.date + (f"_{args.end_date}" if args.end_date else '')
+    for variant in args.variant:
+        print(f"\n===== 口径 {variant}：{args.airport} {date_tag} =====")
+        sheets = run_variant(fpla_df, fodc_df, args.airport, args.date, variant, end_date=args.end_date,
+                             key_col=args.key_col, extension_hours=args.extension_hours, step=args.step,
+                             excluded_airlines=() if args.no_foreign_filter else None, reasons=args.reasons)
+        output_file = os.path.join(args.output_dir, f"航班掌握情况分析_{args.airport}_{date_tag}_{variant}.xlsx")
+        write_report(sheets, output_file)
+        print(f"报告已保存至：{output_file}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
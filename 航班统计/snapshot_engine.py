@@ -0,0 +1,244 @@
+"""
+航班掌握情况的节点快照统计 (事件扫描)。
+每个统计节点 t 需要：截至 t 已收到的 FPLA 中每个航班 (FLIGHTKEY 或 CALLSIGN) 的最新一版计划，按 离港/进港 × 执行/取消 计数；
+以及截至 t 已实际起飞/落地的航班数。逐节点 "筛选 -> 排序 -> 去重" 的代价为 O(节点数 × n log n)。
+
+这里把 FPLA 按 MSG_TIME 只排序一次：同一航班的某一版计划在 [本版 MSG_TIME, 下一版 MSG_TIME) 内是最新一版，
+对应一段连续的节点区间 [起点, 终点)。每个计数在区间起点 +1、终点 -1，对节点做一次累加即得到全部节点的结果；
+实际执行同理 (航班首次起飞/落地之后、且处于计划执行状态的节点区间)。总代价 O(n log n + 节点数)，
+分钟级节点 (1440 个) 与小时级节点开销相当；多天滚动分析时各天共用一次排序，航班按计划日区分 (rolling_snapshots)。同一 MSG_TIME 的多版计划以表中靠后的一版为准 (稳定排序)。
+"""
+import numpy as np
+import pandas as pd
+
+SUMMARY_COLUMNS = ['统计节点', '计划执行离港', '计划取消离港', '计划执行进港', '计划取消进港', '总班次', '总计划执行',
+                   '总取消', '实际执行离港', '实际执行进港', '实际执行', '待执行']
+# actual_scope：'plan' 只统计当前处于计划执行状态的航班；'all' 统计全部FODC记录中当天实际起降的航班
+ACTUAL_SCOPES = ('plan', 'all')
+# actual_total：'union' 按航班去重 (同时有起飞和落地的航班只算一次)；'sum' 为离港、进港之和
+ACTUAL_TOTALS = ('union', 'sum')
+DEFAULT_STEP = '1h'
+# 多天滚动分析的匹配键：(航班键, 计划日)。CALLSIGN 等键每天重复使用，不区分计划日时前一天的计划修订与起降会串入后一天
+PLAN_KEY_COL = '_PLAN_KEY'
+
+
+# ==============================================================================
+# --- 1. 节点与区间 ---
+# ==============================================================================
+def snapshot_nodes(start, end, step=DEFAULT_STEP):
+    """[start, end] 内每隔 step (如 '1h'、'5min') 一个节点，含两端 (end 不在步长上时止于其前的最后一个节点)。"""
+    return pd.date_range(pd.Timestamp(start), pd.Timestamp(end), freq=pd.Timedelta(step))
+
+
+def day_nodes(analysis_date, step=DEFAULT_STEP, extension_hours=0):
+    """一个分析日的节点：当天 00:00 至 24:00，再延长 extension_hours 小时。"""
+    day_start = pd.Timestamp(analysis_date)
+    return snapshot_nodes(day_start, day_start + pd.Timedelta(days=1, hours=extension_hours), step)
+
+
+def _node_index(nodes, times):
+    """每个时间之后 (含) 的第一个节点编号，即该时间开始在哪个节点上可见；NaT 记为 len(nodes) (不在任何节点上)。"""
+    values = pd.Series(times).to_numpy(dtype='datetime64[ns]')
+    index = nodes.searchsorted(values, side='left')
+    return np.where(np.isnat(values), len(nodes), index)
+
+
+def _interval_counts(starts, ends, node_count):
+    """各区间 [起点, 终点) 覆盖每个节点的次数：差分后累加。"""
+    starts, ends = np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+    valid = starts < ends
+    diff = np.bincount(starts[valid], minlength=node_count + 1) - np.bincount(ends[valid], minlength=node_count + 1)
+    return np.cumsum(diff)[:node_count]
+
+
+# ==============================================================================
+# --- 2. 计划 (FPLA) 与实际 (FODC) ---
+# ==============================================================================
+def plan_day_flags(fpla_df, airport, analysis_date, closed_end=False):
+    """
+    每版计划是否为当天本场的离港/进港 (SOBT/SIBT 落在 [当天00:00, 次日00:00) 内，closed_end=True 时含次日00:00)，
+    以及是否为取消 (PSCHEDULESTATUS == 'CNL')。
+    """
+    day_start = pd.Timestamp(analysis_date)
+    day_end = day_start + pd.Timedelta(days=1)
+
+    def in_day(times):
+        return (times >= day_start) & ((times <= day_end) if closed_end else (times < day_end))
+
+    is_departure = (fpla_df['DEPAP'] == airport) & in_day(fpla_df['SOBT'])
+    is_arrival = (fpla_df['ARRAP'] == airport) & in_day(fpla_df['SIBT'])
+    return is_departure, is_arrival, fpla_df['PSCHEDULESTATUS'] == 'CNL'
+
+
+def latest_revisions(fpla_df, key_col, node_time):
+    """截至 node_time 每个航班的最新一版计划 (单个节点的明细，如最终节点的未执行航班)。"""
+    known = fpla_df[fpla_df['MSG_TIME'] <= node_time]
+    return known.sort_values('MSG_TIME', kind='stable').drop_duplicates(key_col, keep='last')
+
+
+def _first_done_times(fodc_df, key_col, airport_col, time_col, airport, window=None):
+    """每个航班在本场首次实际起飞/落地的时间；window 给出时只取落在 [开始, 结束) 内的记录。"""
+    times = fodc_df[time_col]
+    done = (fodc_df[airport_col] == airport) & times.notna()
+    if window is not None: done &= (times >= window[0]) & (times < window[1])
+    return times[done].groupby(fodc_df.loc[done, key_col]).min()
+
+
+def _check_modes(actual_scope, actual_total):
+    if actual_scope not in ACTUAL_SCOPES: raise ValueError(f"actual_scope 应为 {ACTUAL_SCOPES} 之一")
+    if actual_total not in ACTUAL_TOTALS: raise ValueError(f"actual_total 应为 {ACTUAL_TOTALS} 之一")
+
+
+def _revision_intervals(fpla_df, key_col, nodes):
+    """FPLA 按 MSG_TIME 排序一次；每版计划作为"最新一版"的节点区间 [起点, 终点)。"""
+    revisions = fpla_df.sort_values('MSG_TIME', kind='stable')
+    next_time = revisions.groupby(key_col, sort=False, dropna=False)['MSG_TIME'].shift(-1)
+    return revisions, _node_index(nodes, revisions['MSG_TIME']), _node_index(nodes, next_time)
+
+
+def _day_counts(revisions, starts, ends, fodc_df, airport, analysis_date, nodes, key_col, closed_end, actual_scope,
+                actual_total):
+    """一个分析日在全部节点上的各项计数 (区间已由 _revision_intervals 算好，这里只做筛选与累加)。"""
+    node_count = len(nodes)
+    is_departure, is_arrival, is_cancelled = (flag.to_numpy() for flag in
+                                              plan_day_flags(revisions, airport, analysis_date, closed_end))
+
+    def plan_count(mask):
+        return _interval_counts(starts[mask], ends[mask], node_count)
+
+    counts = {'计划执行离港': plan_count(is_departure & ~is_cancelled),
+              '计划取消离港': plan_count(is_departure & is_cancelled),
+              '计划执行进港': plan_count(is_arrival & ~is_cancelled),
+              '计划取消进港': plan_count(is_arrival & is_cancelled)}
+
+    # 实际执行：航班自首次起降的节点起计入；'plan' 范围下还须处于计划执行状态 (与计划区间取交集)
+    window = None
+    if actual_scope == 'all':
+        day_start = pd.Timestamp(analysis_date)
+        window = (day_start, day_start + pd.Timedelta(days=1))
+    first_dep = _first_done_times(fodc_df, key_col, 'RDEPAP', 'ATOT', airport, window)
+    first_arr = _first_done_times(fodc_df, key_col, 'RARRAP', 'ALDT', airport, window)
+    planned = (is_departure | is_arrival) & ~is_cancelled
+    planned_keys = revisions[key_col][planned]
+
+    def actual_count(first_times):
+        if actual_scope == 'all':
+            return _interval_counts(_node_index(nodes, first_times), np.full(len(first_times), node_count), node_count)
+        first_index = _node_index(nodes, planned_keys.map(first_times))
+        return _interval_counts(np.maximum(starts[planned], first_index), ends[planned], node_count)
+
+    counts['实际执行离港'] = actual_count(first_dep)
+    counts['实际执行进港'] = actual_count(first_arr)
+    if actual_total == 'sum':
+        counts['实际执行'] = counts['实际执行离港'] + counts['实际执行进港']
+    else:
+        counts['实际执行'] = actual_count(pd.concat([first_dep, first_arr], axis=1).min(axis=1))
+    return counts
+
+
+def sweep_snapshots(fpla_df, fodc_df, airport, analysis_date, nodes, key_col='FLIGHTKEY', closed_end=False,
+                    actual_scope='plan', actual_total='union'):
+    """
+    一次扫描得到所有节点的计数，返回以节点为索引的 DataFrame：
+        计划执行离港 / 计划取消离港 / 计划执行进港 / 计划取消进港 / 实际执行离港 / 实际执行进港 / 实际执行
+    与逐节点写法等价：节点 t 上按 MSG_TIME <= t 取每个 key_col 的最新一版计划计数；
+    实际执行为 ATOT/ALDT <= t 的航班数 (按 key_col 去重)，actual_scope / actual_total 的含义见模块常量。
+    nodes 可为任意升序时间 (见 snapshot_nodes / day_nodes)，步长不影响扫描的代价。
+    fpla_df 需含 MSG_TIME、SOBT、SIBT (datetime)、DEPAP、ARRAP、PSCHEDULESTATUS；fodc_df 需含 ATOT、ALDT、RDEPAP、RARRAP。
+    """
+    _check_modes(actual_scope, actual_total)
+    nodes = pd.DatetimeIndex(nodes)
+    revisions, starts, ends = _revision_intervals(fpla_df, key_col, nodes)
+    counts = _day_counts(revisions, starts, ends, fodc_df, airport, analysis_date, nodes, key_col, closed_end,
+                         actual_scope, actual_total)
+    return pd.DataFrame(counts, index=nodes)
+
+
+def _schedule_times(fpla_df, airport):
+    """每版计划在本场的计划时间：本场离港取 SOBT，本场进港取 SIBT，其余取 SOBT (缺失时取 SIBT)。"""
+    times = fpla_df['SOBT'].where(fpla_df['SOBT'].notna(), fpla_df['SIBT'])
+    times = times.mask(fpla_df['ARRAP'] == airport, fpla_df['SIBT'])
+    return times.mask(fpla_df['DEPAP'] == airport, fpla_df['SOBT'])
+
+
+def _plan_day_keys(key_codes, times):
+    """(航班键编号, 计划日) -> 单列键 '编号|YYYY-MM-DD' (计划日缺失时为 '编号|')。"""
+    return pd.Series(key_codes, index=times.index).astype(str) + '|' + times.dt.strftime('%Y-%m-%d').fillna('')
+
+
+def _movements_by_plan_day(fodc_df, fodc_codes, plan_codes, plan_times, airport):
+    """
+    FODC 中本场的起飞 (ATOT) 与落地 (ALDT) 各拆为一行，归入同一航班键下计划时间最近的一版计划的计划日
+    (该航班键没有计划时归入起降当天)，返回带 PLAN_KEY_COL 的起降记录，供 _first_done_times 使用。
+    """
+    parts = []
+    for airport_col, time_col in (('RDEPAP', 'ATOT'), ('RARRAP', 'ALDT')):
+        done = ((fodc_df[airport_col] == airport) & fodc_df[time_col].notna()).to_numpy()
+        parts.append(pd.DataFrame({'_code': fodc_codes[done], airport_col: airport, time_col: fodc_df[time_col][done],
+                                   '_time': fodc_df[time_col][done]}))
+    moves = pd.concat(parts, ignore_index=True).sort_values('_time', kind='stable')
+    plans = pd.DataFrame({'_code': plan_codes, '_plan_time': plan_times.to_numpy()}).dropna()
+    plans = plans.drop_duplicates().sort_values('_plan_time')
+    moves = pd.merge_asof(moves, plans, left_on='_time', right_on='_plan_time', by='_code', direction='nearest')
+    moves[PLAN_KEY_COL] = _plan_day_keys(moves['_code'].to_numpy(), moves['_plan_time'].fillna(moves['_time']))
+    return moves
+
+
+def rolling_snapshots(fpla_df, fodc_df, airport, start_date, end_date=None, step=DEFAULT_STEP, extension_hours=0,
+                      key_col='FLIGHTKEY', closed_end=False, actual_scope='plan', actual_total='union',
+                      label_day_end=True):
+    """
+    滚动分析 start_date 至 end_date (含) 的每一天：每天以当天为计划日，节点见 day_nodes。
+    各天的节点合并为一条时间轴，FPLA 只排序一次、区间只计算一次，每天只需一次筛选与累加。
+    航班按 (key_col, 计划日) 区分 (见 PLAN_KEY_COL)：每版计划的计划日为其本场计划时间的日期，
+    只被同一计划日的后续版本取代；FODC 起降按最近的计划时间归入计划日，actual_scope='plan' 时只计入该计划日的航班。
+    每天的结果与只用当天航班的数据单独分析相同；跨零点改期的航班在前后两个计划日各算一个航班。
+    返回各天汇总表按日期拼接的结果 (首列为 '分析日期'，其余列见 SUMMARY_COLUMNS)。
+    """
+    _check_modes(actual_scope, actual_total)
+    days = pd.date_range(pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date or start_date).normalize(),
+                         freq='D')
+    if not len(days): return pd.DataFrame(columns=['分析日期'] + SUMMARY_COLUMNS)
+    nodes_by_day = [day_nodes(day, step, extension_hours) for day in days]
+    nodes = nodes_by_day[0].append(nodes_by_day[1:]).unique().sort_values()
+    key_codes, _ = pd.factorize(pd.concat([fpla_df[key_col], fodc_df[key_col]], ignore_index=True))
+    plan_codes, fodc_codes = key_codes[:len(fpla_df)], key_codes[len(fpla_df):]
+    plan_times = _schedule_times(fpla_df, airport)
+    fpla_scoped = fpla_df.assign(**{PLAN_KEY_COL: _plan_day_keys(plan_codes, plan_times)})
+    if actual_scope == 'plan':
+        fodc_scoped = _movements_by_plan_day(fodc_df, fodc_codes, plan_codes, plan_times, airport)
+    else:  # 'all' 按起降当天统计全部FODC记录，与计划日无关
+        fodc_scoped = fodc_df.assign(**{PLAN_KEY_COL: fodc_df[key_col]})
+    revisions, starts, ends = _revision_intervals(fpla_scoped, PLAN_KEY_COL, nodes)
+    frames = []
+    for day, own_nodes in zip(days, nodes_by_day):
+        counts = _day_counts(revisions, starts, ends, fodc_scoped, airport, day, nodes, PLAN_KEY_COL, closed_end,
+                             actual_scope, actual_total)
+        positions = nodes.get_indexer(own_nodes)
+        day_counts = pd.DataFrame({name: values[positions] for name, values in counts.items()}, index=own_nodes)
+        summary = summary_frame(day_counts, day, label_day_end)
+        summary.insert(0, '分析日期', day.strftime('%Y-%m-%d'))
+        frames.append(summary)
+    return pd.concat(frames, ignore_index=True)
+
+
+# ==============================================================================
+# --- 3. 汇总表 ---
+# ==============================================================================
+def node_label(node, analysis_date, label_day_end=True):
+    """节点显示为 'YYYY-MM-DD HH:MM:SS'；label_day_end=True 时次日 00:00 显示为当天的 24:00:00。"""
+    day_start = pd.Timestamp(analysis_date)
+    if label_day_end and node == day_start + pd.Timedelta(days=1):
+        return f"{day_start:%Y-%m-%d} 24:00:00"
+    return node.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def summary_frame(counts, analysis_date, label_day_end=True):
+    """sweep_snapshots 的结果 -> 航班掌握情况汇总表 (列见 SUMMARY_COLUMNS)。"""
+    summary = counts.reset_index(drop=True)
+    summary.insert(0, '统计节点', [node_label(node, analysis_date, label_day_end) for node in counts.index])
+    summary['总班次'] = summary[['计划执行离港', '计划取消离港', '计划执行进港', '计划取消进港']].sum(axis=1)
+    summary['总计划执行'] = summary['计划执行离港'] + summary['计划执行进港']
+    summary['总取消'] = summary['计划取消离港'] + summary['计划取消进港']
+    summary['待执行'] = summary['总计划执行'] - summary['实际执行']
+    return summary[SUMMARY_COLUMNS]
@@ -0,0 +1,59 @@
+"""AirlineClassifier：3 位与更长前缀的识别、国内货运类别、与原外航正则一致，以及代码表更新后重新加载。"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from airline_classifier import FOREIGN_CATEGORY, AirlineClassifier, get_classifier, load_airline_codes
+
+# 原脚本中的外航正则 (final.py 等)；analyze_flights.py 另含 CAO
+FOREIGN_REGEX = ('^(AAR|AIH|AIQ|ALK|ANA|ATC|AXM|BBC|BDJ|CAL|CNW|CPA|CSG|ETH|FDX|GFA|GTI|HVN|JAL|KAL|KME|KHV|LAO|MAS|'
+                 'MFX|MMA|MSR|MXD|MZT|QNT|QTR|RMY|SIA|SVA|T7RDJ|TAG|TGW|THA|THY|TLM|TNU|TXJ|UAE|VJC|VPCKG)')
+CALLSIGNS = pd.Series(['UAE308', 'KAL851', 'T7RDJ', 'T7RDJ12', 'T7RD1', 'VPCKG', 'VPCK1', 'CAO1041', 'CCA1234',
+                       'CSN3101', 'CSG', 'CS', 'UA', np.nan, 'UAE308', 'cao1041'], index=range(10, 26))
+
+
+def test_foreign_prefixes_of_each_length():
+    codes = load_airline_codes((FOREIGN_CATEGORY,))
+    assert {'UAE', 'KAL', 'T7RDJ', 'VPCKG'} <= codes and 'CAO' not in codes
+    assert AirlineClassifier(codes).codes_by_length.keys() == {3, 5}
+
+    flags = get_classifier().matches(CALLSIGNS)
+    assert flags.index.equals(CALLSIGNS.index)
+    assert CALLSIGNS[flags].tolist() == ['UAE308', 'KAL851', 'T7RDJ', 'T7RDJ12', 'VPCKG', 'CSG', 'UAE308']
+
+
+def test_domestic_cargo_is_a_separate_category():
+    cargo = get_classifier(('国内货运',)).matches(CALLSIGNS)
+    assert CALLSIGNS[cargo].tolist() == ['CAO1041']
+    both = get_classifier(('国内货运', FOREIGN_CATEGORY)).matches(CALLSIGNS)
+    assert both.tolist() == (cargo | get_classifier().matches(CALLSIGNS)).tolist()
+    assert get_classifier((FOREIGN_CATEGORY, '国内货运')) is get_classifier(('国内货运', FOREIGN_CATEGORY))
+
+
+@pytest.mark.parametrize('categories, regex', [
+    ((FOREIGN_CATEGORY,), FOREIGN_REGEX),
+    ((FOREIGN_CATEGORY, '国内货运'), FOREIGN_REGEX.replace('|CAL|', '|CAL|CAO|')),
+], ids=['外航', '外航+国内货运'])
+def test_matches_original_regex(categories, regex):
+    expected = CALLSIGNS.str.match(regex, na=False)
+    classifier = get_classifier(categories)
+    pd.testing.assert_series_equal(classifier.matches(CALLSIGNS), expected)
+    pd.testing.assert_series_equal(classifier.matches(CALLSIGNS), expected)  # 第二次全部来自呼号缓存
+
+
+def test_reloads_after_table_changes(tmp_path):
+    path = tmp_path / 'airline_codes.csv'
+    path.write_text('code,category\nUAE,外航\n', encoding='utf-8')
+    callsigns = pd.Series(['UAE308', 'QTR871'])
+    first = get_classifier(path=str(path))
+    assert first.matches(callsigns).tolist() == [True, False]
+    assert get_classifier(path=str(path)) is first
+
+    path.write_text('code,category\nUAE,外航\nQTR,外航\n', encoding='utf-8')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))  # 保证修改时间变化
+    second = get_classifier(path=str(path))
+    assert second is not first
+    assert second.matches(callsigns).tolist() == [True, True]
@@ -0,0 +1,59 @@
+"""classify_unexecuted：每个未执行原因各用一个航班，检查分到的原因与优先级。"""
+import pandas as pd
+
+from flight_stats import UNEXECUTED_REASONS, classify_unexecuted, run_variant
+
+AIRPORT = 'ZGGG'
+DAY = pd.Timestamp('2025-09-23')
+FINAL_NODE = DAY + pd.Timedelta(hours=48)  # 具体分析口径延长 24 小时
+# 按 UNEXECUTED_REASONS 的顺序，每个原因一个航班；CCA1008 正常执行
+CALLSIGNS = ['CCA1001', 'AAR301', 'CCA1003', 'CCA1004', 'CCA1005', 'CCA1006', 'CCA1007', 'CCA1008']
+
+
+def _inputs():
+    sobt = DAY + pd.Timedelta(hours=10)
+    plan = pd.DataFrame({'FLIGHTKEY': [f"K{i}" for i in range(1, 9)], 'CALLSIGN': CALLSIGNS,
+                         'DEPAP': AIRPORT, 'ARRAP': 'ZSPD', 'SOBT': sobt, 'SIBT': sobt + pd.Timedelta(hours=2),
+                         'PSCHEDULESTATUS': 'SCH', 'MSG_TIME': DAY - pd.Timedelta(hours=4)})
+    # CCA1001 在最终节点之后才取消
+    cancelled = plan.iloc[[0]].assign(PSCHEDULESTATUS='CNL', MSG_TIME=FINAL_NODE + pd.Timedelta(hours=6))
+    fpla = pd.concat([plan, cancelled], ignore_index=True)
+
+    done, late = sobt + pd.Timedelta(minutes=10), FINAL_NODE + pd.Timedelta(hours=2)
+    fodc = pd.DataFrame([
+        ('K2', 'AAR301', AIRPORT, 'ZSPD', done),  # 外航：统计时被过滤
+        ('K3', 'CCA1003', AIRPORT, 'ZSPD', late),  # 最终节点之后才起飞
+        ('K4', 'CCA1004', AIRPORT, 'ZSPD', pd.NaT),  # 本场记录没有实际时间
+        ('K5', 'CCA1905', AIRPORT, 'ZSPD', done),  # 同一 FLIGHTKEY 换了呼号
+        ('K6', 'CCA1006', 'ZBAA', 'ZSPD', done),  # 其他机场的起降
+        ('K8', 'CCA1008', AIRPORT, 'ZSPD', done),
+    ], columns=['FLIGHTKEY', 'CALLSIGN', 'RDEPAP', 'RARRAP', 'ATOT'])
+    fodc['ALDT'] = fodc['ATOT'] + pd.Timedelta(hours=2)
+    return fpla, fodc
+
+
+def test_each_reason_gets_one_flight():
+    fpla, fodc = _inputs()
+    sheets = run_variant(fpla, fodc, AIRPORT, DAY, '具体分析')
+    reasons = sheets['未执行原因分析'].set_index('CALLSIGN')['分析原因']
+    assert reasons.to_dict() == dict(zip(CALLSIGNS[:-1], UNEXECUTED_REASONS))
+
+
+def test_first_matching_reason_wins():
+    fpla, fodc = _inputs()
+    unexecuted = fpla.iloc[:7].drop(columns='MSG_TIME')
+    # CCA1001 同时有最终节点之后的本场起飞：取消优先；CCA1003 另有其他机场的记录：窗口之外优先
+    fodc = pd.concat([fodc, fodc.iloc[[1]].assign(FLIGHTKEY='K1', CALLSIGN='CCA1001'),
+                      fodc.iloc[[4]].assign(FLIGHTKEY='K3', CALLSIGN='CCA1003')], ignore_index=True)
+    classified = classify_unexecuted(unexecuted, fpla, fodc, AIRPORT, FINAL_NODE, 'CALLSIGN')
+    assert classified['分析原因'].tolist() == UNEXECUTED_REASONS
+
+
+def test_flight_key_matching_links_by_callsign():
+    fpla, fodc = _inputs()
+    unexecuted = fpla.iloc[[4]].drop(columns='MSG_TIME')
+    # 按 FLIGHTKEY 匹配时反过来：同一呼号在 FODC 中使用了其他 FLIGHTKEY
+    fodc = fodc.assign(FLIGHTKEY=fodc['FLIGHTKEY'].replace('K5', 'K5-B'), CALLSIGN=fodc['CALLSIGN'].replace(
+        'CCA1905', 'CCA1005'))
+    classified = classify_unexecuted(unexecuted, fpla, fodc, AIRPORT, FINAL_NODE, 'FLIGHTKEY')
+    assert classified['分析原因'].tolist() == [UNEXECUTED_REASONS[4]]
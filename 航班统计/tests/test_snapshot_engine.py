@@ -0,0 +1,120 @@
+"""
+sweep_snapshots：单日各节点的计数与逐节点 "筛选 -> 排序 -> 去重" 的写法相同。
+rolling_snapshots：呼号每天重复使用时，各天的计划修订与起降不串入其他天。
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from flight_stats import SUMMARY_SHEET, run_variant
+from snapshot_engine import day_nodes, sweep_snapshots
+
+AIRPORT = 'ZGGG'
+DAYS = pd.date_range('2025-09-20', periods=3, freq='D')
+FLIGHTS_PER_DAY = 200
+
+
+def _daily_flights(day):
+    """同一组 200 个 CCA 呼号每天执行一次：前一天 20:00 发布计划、当天 02:00 修订一次，全部按计划起降。"""
+    index = pd.RangeIndex(FLIGHTS_PER_DAY)
+    departure = index % 2 == 0
+    sobt = day + pd.Timedelta(hours=6) + pd.to_timedelta(index * 3, unit='min')
+    sibt = sobt + pd.Timedelta(hours=2)
+    plan = pd.DataFrame({'FLIGHTKEY': [f"{day:%Y%m%d}-{i}" for i in index],
+                         'CALLSIGN': [f"CCA{1000 + i}" for i in index],
+                         'DEPAP': pd.Series(departure).map({True: AIRPORT, False: 'ZBAA'}),
+                         'ARRAP': pd.Series(departure).map({True: 'ZSPD', False: AIRPORT}),
+                         'SOBT': sobt, 'SIBT': sibt, 'PSCHEDULESTATUS': 'SCH'})
+    fpla = pd.concat([plan.assign(MSG_TIME=day - pd.Timedelta(hours=4)),
+                      plan.assign(MSG_TIME=day + pd.Timedelta(hours=2))], ignore_index=True)
+    fodc = pd.DataFrame({'FLIGHTKEY': plan['FLIGHTKEY'], 'CALLSIGN': plan['CALLSIGN'],
+                         'RDEPAP': plan['DEPAP'], 'RARRAP': plan['ARRAP'],
+                         'ATOT': sobt + pd.Timedelta(minutes=10), 'ALDT': sibt + pd.Timedelta(minutes=10)})
+    return fpla, fodc
+
+
+@pytest.fixture(scope='module')
+def daily_inputs():
+    return [_daily_flights(day) for day in DAYS]
+
+
+@pytest.mark.parametrize('variant', ['final', 'test', '具体分析'])
+def test_rolling_matches_separate_days(daily_inputs, variant):
+    fpla = pd.concat([fpla for fpla, _ in daily_inputs], ignore_index=True)
+    fodc = pd.concat([fodc for _, fodc in daily_inputs], ignore_index=True)
+    rolling = run_variant(fpla, fodc, AIRPORT, DAYS[0], variant, end_date=DAYS[-1])[SUMMARY_SHEET]
+    for day, (day_fpla, day_fodc) in zip(DAYS, daily_inputs):
+        own = rolling[rolling['分析日期'] == f"{day:%Y-%m-%d}"].drop(columns='分析日期').reset_index(drop=True)
+        separate = run_variant(day_fpla, day_fodc, AIRPORT, day, variant, details=False)[SUMMARY_SHEET]
+        pd.testing.assert_frame_equal(own, separate, check_dtype=False)
+        first, last = own.iloc[0], own.iloc[-1]
+        assert (first['总计划执行'], first['实际执行']) == (FLIGHTS_PER_DAY, 0)
+        assert (last['总计划执行'], last['实际执行'], last['待执行']) == (FLIGHTS_PER_DAY, FLIGHTS_PER_DAY, 0)
+
+
+def _mixed_day(seed, count=80):
+    """单日的小样本：每个呼号 1~3 版计划 (含取消、跨零点、非本场)，FODC 有重复行、缺失时间与其他机场的起降。"""
+    rng = np.random.default_rng(seed)
+    day = DAYS[0]
+    # 报文时间取互不相同的整分钟，部分恰好落在节点上
+    msg_minutes = rng.permutation(np.arange(-6 * 60, 30 * 60))
+    plans, used = [], 0
+    for i in range(count):
+        for _ in range(rng.integers(1, 4)):
+            role = rng.choice(['dep', 'arr', 'other'], p=[0.45, 0.45, 0.1])
+            sobt = day + pd.Timedelta(minutes=int(rng.choice([-90, 24 * 60, *rng.integers(-60, 25 * 60, 5)])))
+            plans.append({'CALLSIGN': f"CCA{1000 + i}", 'DEPAP': AIRPORT if role == 'dep' else 'ZBAA',
+                          'ARRAP': AIRPORT if role == 'arr' else 'ZSPD', 'SOBT': sobt,
+                          'SIBT': sobt + pd.Timedelta(hours=2) if role != 'arr' else sobt,
+                          'PSCHEDULESTATUS': 'CNL' if rng.random() < 0.2 else 'SCH',
+                          'MSG_TIME': day + pd.Timedelta(minutes=int(msg_minutes[used]))})
+            used += 1
+    moves = []
+    for i in rng.choice(count, size=int(count * 0.8), replace=False):
+        for _ in range(rng.integers(1, 3)):
+            atot = day + pd.Timedelta(minutes=int(rng.integers(-60, 32 * 60)))
+            moves.append({'CALLSIGN': f"CCA{1000 + i}", 'RDEPAP': rng.choice([AIRPORT, 'ZBAA']),
+                          'RARRAP': rng.choice([AIRPORT, 'ZSPD']), 'ATOT': atot if rng.random() < 0.8 else pd.NaT,
+                          'ALDT': atot + pd.Timedelta(hours=2) if rng.random() < 0.8 else pd.NaT})
+    return pd.DataFrame(plans), pd.DataFrame(moves)
+
+
+def _node_counts(fpla, fodc, node, closed_end, actual_scope, actual_total):
+    """原脚本的逐节点写法：截至节点的 FPLA 按呼号去重取最新一版，FODC 按呼号去重计数。"""
+    day_start, day_end = DAYS[0], DAYS[0] + pd.Timedelta(days=1)
+    latest = fpla[fpla['MSG_TIME'] <= node].sort_values('MSG_TIME').drop_duplicates('CALLSIGN', keep='last')
+
+    def in_day(times):
+        return (times >= day_start) & ((times <= day_end) if closed_end else (times < day_end))
+
+    is_departure = (latest['DEPAP'] == AIRPORT) & in_day(latest['SOBT'])
+    is_arrival = (latest['ARRAP'] == AIRPORT) & in_day(latest['SIBT'])
+    is_cancelled = latest['PSCHEDULESTATUS'] == 'CNL'
+
+    dep_done = (fodc['RDEPAP'] == AIRPORT) & (fodc['ATOT'] <= node)
+    arr_done = (fodc['RARRAP'] == AIRPORT) & (fodc['ALDT'] <= node)
+    if actual_scope == 'plan':
+        of_interest = fodc['CALLSIGN'].isin(latest.loc[(is_departure | is_arrival) & ~is_cancelled, 'CALLSIGN'])
+        dep_done, arr_done = dep_done & of_interest, arr_done & of_interest
+    else:
+        dep_done &= (fodc['ATOT'] >= day_start) & (fodc['ATOT'] < day_end)
+        arr_done &= (fodc['ALDT'] >= day_start) & (fodc['ALDT'] < day_end)
+    actual_dep, actual_arr = fodc.loc[dep_done, 'CALLSIGN'].nunique(), fodc.loc[arr_done, 'CALLSIGN'].nunique()
+    return {'计划执行离港': (is_departure & ~is_cancelled).sum(), '计划取消离港': (is_departure & is_cancelled).sum(),
+            '计划执行进港': (is_arrival & ~is_cancelled).sum(), '计划取消进港': (is_arrival & is_cancelled).sum(),
+            '实际执行离港': actual_dep, '实际执行进港': actual_arr,
+            '实际执行': actual_dep + actual_arr if actual_total == 'sum' else fodc.loc[
+                dep_done | arr_done, 'CALLSIGN'].nunique()}
+
+
+@pytest.mark.parametrize('closed_end, actual_scope, actual_total', [
+    (True, 'plan', 'union'), (False, 'plan', 'sum'), (False, 'all', 'sum'), (True, 'all', 'union')])
+def test_sweep_matches_per_node_dedup(closed_end, actual_scope, actual_total):
+    fpla, fodc = _mixed_day(seed=11)
+    nodes = day_nodes(DAYS[0], '20min', extension_hours=6)
+    counts = sweep_snapshots(fpla, fodc, AIRPORT, DAYS[0], nodes, key_col='CALLSIGN', closed_end=closed_end,
+                             actual_scope=actual_scope, actual_total=actual_total)
+    expected = pd.DataFrame([_node_counts(fpla, fodc, node, closed_end, actual_scope, actual_total)
+                             for node in nodes], index=nodes)
+    pd.testing.assert_frame_equal(counts, expected, check_dtype=False)
+    assert expected['计划取消离港'].iloc[-1] > 0 and 0 < expected['实际执行'].iloc[-1] < len(fodc)